@@ -3,7 +3,6 @@ import sys
 import os
 from dotenv import load_dotenv
 from PyQt6.QtWidgets import QApplication
-from ui.main_window import MainWindow
 
 def main():
     # Load environment variables
@@ -20,6 +19,8 @@ def main():
 
     # Create and start the application
     app = QApplication(sys.argv)
+    # Imported after the environment check so a misconfigured start fails fast
+    from ui.main_window import MainWindow
     window = MainWindow()
     window.show()
     sys.exit(app.exec())
@@ -0,0 +1,80 @@
+# services/account_profiles.py
+import json
+import os
+import re
+from pathlib import Path
+
+
+class AccountProfile:
+    """One Spotify account and the Plex user its playlists are mirrored into"""
+
+    def __init__(self, name, plex_user=None, plex_token=None, playlists=None):
+        self.name = name
+        # Plex managed/home user to switch to; None writes as the server owner
+        self.plex_user = plex_user
+        # Token of the Plex user, used instead of switching from the owner when given
+        self.plex_token = plex_token
+        # Spotify playlist IDs to sync, None syncs every playlist of the account
+        self.playlists = playlists
+
+    @property
+    def slug(self):
+        """File-name safe version of the profile name"""
+        return re.sub(r'[^A-Za-z0-9_-]+', '_', self.name).strip('_') or 'account'
+
+    @property
+    def spotify_cache_path(self):
+        return f'.spotify_cache_{self.slug}'
+
+    @property
+    def registry_path(self):
+        return f'cache/playlist_registry_{self.slug}.json'
+
+    @property
+    def journal_path(self):
+        return f'cache/sync_journal_{self.slug}.jsonl'
+
+    @property
+    def plans_directory(self):
+        return f'plans/{self.slug}'
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            name=data['name'],
+            plex_user=data.get('plex_user'),
+            plex_token=data.get('plex_token'),
+            playlists=data.get('playlists')
+        )
+
+
+class SyncPlaylist:
+    """Playlist to sync outside the UI list, with the attributes PlaylistSyncWorker reads"""
+    __slots__ = ('playlist_id', 'playlist_name', 'track_total')
+
+    def __init__(self, playlist_id, playlist_name, track_total=0):
+        self.playlist_id = playlist_id
+        self.playlist_name = playlist_name
+        self.track_total = track_total
+
+    @classmethod
+    def from_api(cls, playlist):
+        return cls(playlist['id'], playlist['name'], (playlist.get('tracks') or {}).get('total', 0))
+
+
+def load_account_profiles(path=None):
+    """Read the account profiles file (SYNC_ACCOUNTS_FILE, accounts.json by default)"""
+    path = Path(path or os.getenv('SYNC_ACCOUNTS_FILE', 'accounts.json'))
+    if not path.exists():
+        return []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        profiles = [AccountProfile.from_dict(entry) for entry in data.get('accounts', [])]
+    except Exception as e:
+        print(f"Failed to load account profiles from {path}: {str(e)}")
+        raise
+    slugs = [profile.slug for profile in profiles]
+    if len(set(slugs)) != len(slugs):
+        raise ValueError(f"Account profile names in {path} must be unique")
+    return profiles
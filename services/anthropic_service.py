@@ -0,0 +1,26 @@
+# services/anthropic_service.py
+import os
+import threading
+
+
+class AnthropicService:
+    """Anthropic client created on first use, so the SDK is only imported when the Claude fallback runs"""
+
+    def __init__(self, api_key=None):
+        self.api_key = api_key
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def configured(self):
+        return bool(self.api_key or os.getenv('ANTHROPIC_API_KEY'))
+
+    def get_client(self):
+        with self._lock:
+            if self._client is None:
+                from anthropic import Anthropic
+                self._client = Anthropic(api_key=self.api_key or os.getenv('ANTHROPIC_API_KEY'))
+            return self._client
+
+    def create_message(self, **kwargs):
+        return self.get_client().messages.create(**kwargs)
@@ -0,0 +1,174 @@
+# services/cassette.py
+import atexit
+import base64
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+
+class Cassette:
+    """Recorded HTTP exchanges, stored as gzip-compressed JSON.
+
+    Requests are matched on method, URL (query sorted, tokens stripped) and a digest of the
+    body. Repeated identical requests replay their recorded responses in order, the last one
+    is reused once they run out.
+    """
+
+    MODE_RECORD = 'record'
+    MODE_REPLAY = 'replay'
+    # Query parameters and hosts never written to a cassette
+    SECRET_PARAMS = {'x-plex-token', 'access_token', 'client_secret', 'code', 'refresh_token'}
+    UNRECORDED_HOSTS = {'accounts.spotify.com'}
+    # Response headers that describe the wire encoding rather than the stored body
+    DROPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection', 'set-cookie'}
+
+    def __init__(self, path, mode, speed=0.0):
+        self.path = Path(path)
+        self.mode = mode
+        # 0 replays at full speed, 1.0 at the recorded latency, 2.0 twice as slow
+        self.speed = speed
+        self.interactions = []
+        self._by_key = {}
+        self._positions = {}
+        self._lock = threading.Lock()
+        if mode == self.MODE_REPLAY:
+            self.load()
+
+    @classmethod
+    def key_for(cls, method, url, body):
+        parts = urlsplit(url)
+        query = sorted((name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                       if name.lower() not in cls.SECRET_PARAMS)
+        clean_url = urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ''))
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        digest = hashlib.sha1(body).hexdigest()[:12] if body else ''
+        return f"{method.upper()} {clean_url} {digest}".strip()
+
+    def record(self, request, response):
+        if urlsplit(request.url).hostname in self.UNRECORDED_HOSTS:
+            return
+        content = response.content or b''
+        try:
+            body, encoding = content.decode('utf-8'), 'text'
+        except UnicodeDecodeError:
+            body, encoding = base64.b64encode(content).decode('ascii'), 'base64'
+        interaction = {
+            'key': self.key_for(request.method, request.url, request.body),
+            'status': response.status_code,
+            'reason': response.reason,
+            'headers': {name: value for name, value in response.headers.items()
+                        if name.lower() not in self.DROPPED_HEADERS},
+            'body': body,
+            'encoding': encoding,
+            'elapsed_ms': round(response.elapsed.total_seconds() * 1000, 1)
+        }
+        with self._lock:
+            self.interactions.append(interaction)
+
+    def next_interaction(self, request):
+        key = self.key_for(request.method, request.url, request.body)
+        with self._lock:
+            recorded = self._by_key.get(key)
+            if not recorded:
+                return None
+            position = self._positions.get(key, 0)
+            self._positions[key] = position + 1
+            return recorded[min(position, len(recorded) - 1)]
+
+    def save(self):
+        if self.mode != self.MODE_RECORD:
+            return
+        with self._lock:
+            data = {'version': 1, 'interactions': list(self.interactions)}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+        print(f"Cassette saved: {self.path} ({len(data['interactions'])} requests)")
+
+    def load(self):
+        try:
+            with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+                self.interactions = json.load(f)['interactions']
+        except Exception as e:
+            print(f"Failed to load cassette {self.path}: {str(e)}")
+            raise
+        self._by_key = {}
+        for interaction in self.interactions:
+            self._by_key.setdefault(interaction['key'], []).append(interaction)
+        print(f"Replaying {len(self.interactions)} recorded requests from {self.path}")
+
+
+class CassetteAdapter(HTTPAdapter):
+    """Transport adapter that records real responses into a cassette, or serves them from it"""
+
+    def __init__(self, cassette, **kwargs):
+        super().__init__(**kwargs)
+        self.cassette = cassette
+
+    def send(self, request, **kwargs):
+        if self.cassette.mode == Cassette.MODE_RECORD:
+            response = super().send(request, **kwargs)
+            self.cassette.record(request, response)
+            return response
+
+        interaction = self.cassette.next_interaction(request)
+        if interaction is None:
+            raise requests.ConnectionError(f"No recorded response for {request.method} {request.url}",
+                                           request=request)
+        if self.cassette.speed:
+            time.sleep(interaction['elapsed_ms'] * self.cassette.speed / 1000)
+        response = requests.Response()
+        response.status_code = interaction['status']
+        response.reason = interaction['reason']
+        response.headers = CaseInsensitiveDict(interaction['headers'])
+        response._content = (base64.b64decode(interaction['body']) if interaction['encoding'] == 'base64'
+                             else interaction['body'].encode('utf-8'))
+        response.encoding = 'utf-8' if interaction['encoding'] == 'text' else None
+        response.url = request.url
+        response.request = request
+        return response
+
+
+_cassette = None
+_cassette_lock = threading.Lock()
+
+
+def cassette_from_env():
+    """Cassette configured by SYNC_CASSETTE / SYNC_CASSETTE_MODE / SYNC_CASSETTE_SPEED, or None.
+
+    Every service of the process shares the same cassette, recordings are saved at exit.
+    """
+    global _cassette
+    path = os.getenv('SYNC_CASSETTE')
+    if not path:
+        return None
+    with _cassette_lock:
+        if _cassette is None:
+            mode = os.getenv('SYNC_CASSETTE_MODE', Cassette.MODE_REPLAY)
+            if mode not in (Cassette.MODE_RECORD, Cassette.MODE_REPLAY):
+                raise ValueError(f"SYNC_CASSETTE_MODE must be 'record' or 'replay', not '{mode}'")
+            _cassette = Cassette(path, mode, float(os.getenv('SYNC_CASSETTE_SPEED', '0') or 0))
+            if mode == Cassette.MODE_RECORD:
+                atexit.register(_cassette.save)
+            print(f"HTTP cassette {mode} mode: {path}")
+        return _cassette
+
+
+def mount_cassette(session, cassette, **adapter_kwargs):
+    """Route all of a session's HTTP traffic through the cassette"""
+    adapter = CassetteAdapter(cassette, **adapter_kwargs)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
@@ -0,0 +1,121 @@
+# services/http_metrics.py
+import re
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from services.cassette import cassette_from_env, mount_cassette
+
+
+class RequestMetrics:
+    """Thread-safe per-endpoint request counts and latency histograms"""
+
+    # Upper bounds of the latency buckets in milliseconds, the last bucket is open ended
+    BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+    def __init__(self):
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def endpoint_for(method, url):
+        """Group requests by method and path, with ratingKeys and other IDs collapsed"""
+        path = re.sub(r'^[a-z]+://[^/]+', '', url).split('?', 1)[0]
+        path = re.sub(r'/\d+(,\d+)+(?=/|$)', '/:ids', path)
+        path = re.sub(r'/\d+(?=/|$)', '/:id', path)
+        return f"{method.upper()} {path or '/'}"
+
+    def record(self, endpoint, elapsed_ms, ok=True):
+        bucket = len(self.BUCKETS_MS)
+        for i, bound in enumerate(self.BUCKETS_MS):
+            if elapsed_ms <= bound:
+                bucket = i
+                break
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = {
+                    'count': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                    'histogram': [0] * (len(self.BUCKETS_MS) + 1)
+                }
+            stats['count'] += 1
+            stats['errors'] += 0 if ok else 1
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+            stats['histogram'][bucket] += 1
+
+    def snapshot(self):
+        """Copy of the collected stats: {endpoint: {count, errors, total_ms, max_ms, histogram}}"""
+        with self._lock:
+            return {endpoint: dict(stats, histogram=list(stats['histogram']))
+                    for endpoint, stats in self._endpoints.items()}
+
+    def reset(self):
+        with self._lock:
+            self._endpoints = {}
+
+    def percentile(self, stats, fraction):
+        """Upper bound of the bucket holding the given fraction of requests"""
+        rank = fraction * stats['count']
+        seen = 0
+        for i, count in enumerate(stats['histogram']):
+            seen += count
+            if seen >= rank and count:
+                return self.BUCKETS_MS[i] if i < len(self.BUCKETS_MS) else stats['max_ms']
+        return stats['max_ms']
+
+    def report(self):
+        snapshot = self.snapshot()
+        lines = [f"{'Endpoint':<45}{'Count':>8}{'Errors':>8}{'Mean ms':>10}{'p50 <=':>10}{'p95 <=':>10}{'Max ms':>10}"]
+        for endpoint, stats in sorted(snapshot.items(), key=lambda item: -item[1]['total_ms']):
+            lines.append(
+                f"{endpoint[:44]:<45}{stats['count']:>8}{stats['errors']:>8}"
+                f"{stats['total_ms'] / stats['count']:>10.1f}{self.percentile(stats, 0.5):>10.0f}"
+                f"{self.percentile(stats, 0.95):>10.0f}{stats['max_ms']:>10.0f}"
+            )
+        return "\n".join(lines)
+
+
+class MeteredSession(requests.Session):
+    """requests.Session that records every request in a RequestMetrics instance"""
+
+    def __init__(self, metrics):
+        super().__init__()
+        self.metrics = metrics
+
+    def request(self, method, url, *args, **kwargs):
+        endpoint = self.metrics.endpoint_for(method, url)
+        start = time.perf_counter()
+        ok = False
+        try:
+            response = super().request(method, url, *args, **kwargs)
+            ok = response.status_code < 400
+            return response
+        finally:
+            self.metrics.record(endpoint, (time.perf_counter() - start) * 1000, ok)
+
+
+def create_pooled_session(metrics, pool_size, retries=2):
+    """Metered session with a keep-alive connection pool of pool_size connections per host.
+
+    Only idempotent reads are retried on connection errors and gateway failures, playlist
+    writes are left to the caller.
+    """
+    session = MeteredSession(metrics)
+    retry = Retry(
+        total=retries,
+        backoff_factor=0.3,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({'GET', 'HEAD'}),
+        raise_on_status=False
+    )
+    cassette = cassette_from_env()
+    if cassette:
+        return mount_cassette(session, cassette, pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
@@ -0,0 +1,147 @@
+# services/library_watcher.py
+import json
+import re
+import threading
+
+
+class LibraryWatcher:
+    """Keeps the in-process library index current from the Plex notification websocket.
+
+    Timeline events for music tracks are applied as inserts, updates and deletes; the end of a
+    library scan forgets cached misses. Events sent while the socket was down are lost, so
+    every reconnect resyncs the whole index. Needs the optional websocket-client package.
+    """
+
+    NOTIFICATIONS_PATH = '/:/websockets/notifications'
+    LIBRARY_IDENTIFIER = 'com.plexapp.plugins.library'
+    # Plex metadata type of tracks, and the timeline states of processed and deleted items
+    TRACK_TYPE = 10
+    STATE_FINISHED = 5
+    STATE_DELETED = 9
+    # Activities whose end means a scan or refresh of a section has finished
+    SCAN_ACTIVITIES = ('library.update.section', 'library.refresh.items')
+    # Seconds a receive blocks before the stop flag is checked again
+    RECEIVE_TIMEOUT = 5
+    # Reconnect backoff bounds in seconds
+    RECONNECT_MIN_DELAY = 1
+    RECONNECT_MAX_DELAY = 60
+
+    def __init__(self, plex_service, url=None):
+        self.plex_service = plex_service
+        # Tests and proxies can point the watcher at another websocket
+        self.url = url or self.notifications_url(plex_service.base_url)
+        self.connected = False
+        self.events_applied = 0
+        self._socket = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._section_id = None
+
+    @classmethod
+    def notifications_url(cls, base_url):
+        return re.sub(r'^http', 'ws', base_url.rstrip('/')) + cls.NOTIFICATIONS_PATH
+
+    def start(self):
+        """Start listening in a background thread, returning False when websocket-client is missing"""
+        try:
+            import websocket  # noqa: F401
+        except ImportError:
+            print("Watching the Plex library needs the websocket-client package (pip install websocket-client)")
+            return False
+        if self._thread and self._thread.is_alive():
+            return True
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='plex-library-watch', daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop.set()
+        socket = self._socket
+        if socket is not None:
+            try:
+                socket.close()
+            except Exception:
+                pass
+
+    def _run(self):
+        import websocket
+
+        delay = self.RECONNECT_MIN_DELAY
+        reconnecting = False
+        while not self._stop.is_set():
+            try:
+                headers = [f'X-Plex-Token: {self.plex_service.token}'] if self.plex_service.token else None
+                self._socket = websocket.create_connection(self.url, timeout=self.RECEIVE_TIMEOUT, header=headers)
+                self.connected = True
+                delay = self.RECONNECT_MIN_DELAY
+                print(f"Watching Plex library notifications at {self.url}")
+                if reconnecting:
+                    self.plex_service.resync_library()
+                reconnecting = True
+                self._receive(websocket)
+            except Exception as e:
+                if self._stop.is_set():
+                    break
+                print(f"Plex notification websocket failed: {str(e)}")
+            finally:
+                self.connected = False
+                socket, self._socket = self._socket, None
+                if socket is not None:
+                    try:
+                        socket.close()
+                    except Exception:
+                        pass
+            if self._stop.wait(delay):
+                break
+            delay = min(delay * 2, self.RECONNECT_MAX_DELAY)
+
+    def _receive(self, websocket):
+        while not self._stop.is_set():
+            try:
+                message = self._socket.recv()
+            except websocket.WebSocketTimeoutException:
+                continue
+            if not message:
+                raise ConnectionError("closed by the server")
+            try:
+                self.handle_message(message)
+            except Exception as e:
+                print(f"Failed to apply Plex notification: {str(e)}")
+
+    def music_section_id(self):
+        if self._section_id is None:
+            self._section_id = str(self.plex_service.get_music_library().key)
+        return self._section_id
+
+    def handle_message(self, message):
+        """Apply one notification message"""
+        container = json.loads(message).get('NotificationContainer') or {}
+        if container.get('type') == 'timeline':
+            self.apply_timeline(container.get('TimelineEntry') or [])
+        elif container.get('type') == 'activity':
+            self.apply_activity(container.get('ActivityNotification') or [])
+
+    def apply_timeline(self, entries):
+        updated, deleted = [], []
+        for entry in entries:
+            if entry.get('identifier') != self.LIBRARY_IDENTIFIER or entry.get('type') != self.TRACK_TYPE:
+                continue
+            if str(entry.get('sectionID')) != self.music_section_id():
+                continue
+            if entry.get('state') == self.STATE_DELETED or entry.get('metadataState') == 'deleted':
+                deleted.append(entry['itemID'])
+            elif entry.get('state') == self.STATE_FINISHED:
+                updated.append(entry['itemID'])
+        if updated or deleted:
+            self.plex_service.apply_library_changes(updated, deleted)
+            self.events_applied += len(updated) + len(deleted)
+
+    def apply_activity(self, notifications):
+        for notification in notifications:
+            activity = notification.get('Activity') or {}
+            section_id = str((activity.get('Context') or {}).get('librarySectionID'))
+            if (notification.get('event') == 'ended' and activity.get('type') in self.SCAN_ACTIVITIES and
+                    section_id == self.music_section_id()):
+                forgotten = self.plex_service.match_cache.invalidate_negatives()
+                print(f"Plex library scan finished, retrying {forgotten} unmatched tracks on the next sync")
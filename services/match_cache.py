@@ -0,0 +1,78 @@
+# services/match_cache.py
+import threading
+import time
+from collections import OrderedDict
+
+
+class MatchCache:
+    """Thread-safe LRU cache of Spotify track -> Plex ratingKey results, including misses.
+
+    Misses expire after miss_ttl seconds, so tracks added to Plex since are eventually searched
+    again even when no library change notification says so.
+    """
+
+    def __init__(self, max_entries=50000, miss_ttl=None):
+        self.max_entries = max_entries
+        self.miss_ttl = miss_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key_for(track):
+        # Local files have no Spotify ID, so fall back to their metadata
+        return track.id or f"local:{track.name}|{track.artists}"
+
+    def get(self, track):
+        """Return (True, rating_key_or_None) for a cached result, (False, None) otherwise"""
+        key = self.key_for(track)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry):
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[0]
+            self.misses += 1
+            return False, None
+
+    def _expired(self, entry):
+        rating_key, _, _, stored = entry
+        return rating_key is None and self.miss_ttl is not None and time.monotonic() - stored > self.miss_ttl
+
+    def put(self, track, rating_key):
+        key = self.key_for(track)
+        value = (str(rating_key) if rating_key is not None else None, track.name, track.artists, time.monotonic())
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_negatives(self, predicate=None):
+        """Forget cached misses, optionally only those where predicate(title, artists) is true"""
+        with self._lock:
+            stale = [key for key, (rating_key, title, artists, _) in self._entries.items()
+                     if rating_key is None and (predicate is None or predicate(title, artists))]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def invalidate_rating_key(self, rating_key):
+        """Forget results pointing at a Plex track that no longer exists"""
+        rating_key = str(rating_key)
+        with self._lock:
+            stale = [key for key, value in self._entries.items() if value[0] == rating_key]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
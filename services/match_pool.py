@@ -0,0 +1,65 @@
+# services/match_pool.py
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from utils.song_matcher import MappedTrackIndex, local_match
+
+# Index mapped by each worker process in _init_worker
+_worker_index = None
+
+
+def _init_worker(index_path):
+    global _worker_index
+    _worker_index = MappedTrackIndex(index_path)
+
+
+def _match_shard(shard, max_candidates, artist_threshold):
+    """Match (title, artists) pairs against the mapped index, returning local_match results in order"""
+    return [local_match(_worker_index, title, artists_string, max_candidates, artist_threshold)
+            for title, artists_string in shard]
+
+
+class ProcessMatchPool:
+    """Process pool that matches tracks against a memory-mapped library index.
+
+    The index file is written once and mapped read-only by every worker, so worker
+    start-up does not copy the library and scoring is not limited by the GIL. Each worker
+    runs the whole local step of the cascade (candidate retrieval and scoring), with the same
+    results as local_match over the in-process index.
+    """
+
+    def __init__(self, index_path, processes=None, max_candidates=100, artist_threshold=0.6, source=None):
+        self.index_path = str(index_path)
+        self.processes = processes or os.cpu_count() or 1
+        self.max_candidates = max_candidates
+        self.artist_threshold = artist_threshold
+        # (TrackIndex, version) the index file was written from
+        self.source = source
+        # spawn keeps workers from inheriting the Qt event loop and open sockets
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(self.index_path,)
+        )
+        print(f"Started {self.processes} matching processes on {self.index_path}")
+
+    def match(self, queries):
+        """Match a batch of (title, artists) pairs, returning (ratingKey or None, score, candidate keys) in input order"""
+        if not queries:
+            return []
+        # A few shards per process keeps workers busy when some shards finish early
+        shard_size = max(1, -(-len(queries) // (self.processes * 4)))
+        shards = [queries[i:i + shard_size] for i in range(0, len(queries), shard_size)]
+        results = []
+        for shard_results in self.executor.map(_match_shard, shards, [self.max_candidates] * len(shards),
+                                               [self.artist_threshold] * len(shards)):
+            results.extend(shard_results)
+        return results
+
+    def is_current(self, index):
+        """Whether the index file still matches index, so worker results can be used for it"""
+        return self.source is not None and self.source[0] is index and self.source[1] == index.version
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,90 @@
+# services/playlist_registry.py
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+
+
+class PlaylistRegistry:
+    """Persistent mapping of Spotify playlist IDs to Plex playlist ratingKeys"""
+
+    def __init__(self, path='cache/playlist_registry.json'):
+        self.path = Path(path)
+        self.entries = {}
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+
+    def load(self):
+        """Load the registry from disk, replacing any in-memory entries"""
+        with self._lock:
+            self.entries = {}
+            if not self.path.exists():
+                return self
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f).get('playlists', {})
+                print(f"Loaded {len(self.entries)} playlist mappings from {self.path}")
+            except Exception as e:
+                print(f"Failed to load playlist registry: {str(e)}")
+        return self
+
+    def save(self):
+        """Write the registry atomically so a crash never leaves a half-written file"""
+        # Concurrent playlist writers save too: one at a time, each writing the latest entries,
+        # so an older snapshot can never replace a newer one
+        with self._save_lock:
+            with self._lock:
+                data = {'playlists': {key: dict(entry) for key, entry in self.entries.items()}}
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+    def get_rating_key(self, spotify_id):
+        with self._lock:
+            entry = self.entries.get(spotify_id)
+        return entry['rating_key'] if entry else None
+
+    def set(self, spotify_id, rating_key, title):
+        with self._lock:
+            entry = {
+                'rating_key': str(rating_key),
+                'title': title,
+                'updated': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            }
+            previous = self.entries.get(spotify_id)
+            # The high-water mark only describes the Plex playlist it was recorded for
+            if previous and previous.get('rating_key') == entry['rating_key'] and 'high_water' in previous:
+                entry['high_water'] = previous['high_water']
+                entry['high_water_ids'] = previous.get('high_water_ids', [])
+            self.entries[spotify_id] = entry
+        self.save()
+
+    def get_high_water(self, spotify_id):
+        """(added_at, keys) of the newest tracks already appended by an incremental sync, or (None, None).
+
+        keys are the tracks appended at exactly added_at; bulk likes share one timestamp, so it
+        may be only partly processed.
+        """
+        with self._lock:
+            entry = self.entries.get(spotify_id)
+        if not entry or entry.get('high_water') is None:
+            return None, None
+        return entry['high_water'], set(entry.get('high_water_ids', ()))
+
+    def set_high_water(self, spotify_id, added_at, ids):
+        with self._lock:
+            entry = self.entries.get(spotify_id)
+            if entry is None:
+                return
+            entry['high_water'] = added_at
+            entry['high_water_ids'] = sorted(key for key in ids if key)
+        self.save()
+
+    def remove(self, spotify_id):
+        with self._lock:
+            removed = self.entries.pop(spotify_id, None)
+        if removed:
+            self.save()
@@ -1,25 +1,297 @@
-from plexapi.server import PlexServer
-from plexapi.playlist import Playlist
 import os
 import re
 from difflib import SequenceMatcher
-from anthropic import Anthropic
 from datetime import datetime
-from tenacity import retry, stop_after_attempt, wait_exponential
+import contextlib
+import copy
+import functools
 import json
+import threading
+import time
 from pathlib import Path
+from urllib.parse import urlencode
+from services.anthropic_service import AnthropicService
+from services.cassette import cassette_from_env
+from services.http_metrics import RequestMetrics, create_pooled_session
+from services.library_watcher import LibraryWatcher
+from services.match_cache import MatchCache
+from services.match_pool import ProcessMatchPool
+from services.playlist_registry import PlaylistRegistry
+from services.search_cache import SearchCache
+from services.search_planner import SearchPlanner
+from services.sync_plan import MatchPlan, PlanStore
+from utils import song_matcher
+from utils.song_matcher import (LibraryTrack, TrackIndex, best_candidate, exact_candidate, index_candidates,
+                                is_various_artists_match, local_match, media_part_files, normalize_remix_title,
+                                normalize_string, scoring_stats, title_similarity, write_shared_index)
+from utils.tracing import tracer
+
+
+def lazy_retry(func):
+    """Retry with exponential backoff like tenacity's @retry, importing tenacity on the first call"""
+    retrying = None
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        nonlocal retrying
+        if retrying is None:
+            from tenacity import retry, stop_after_attempt, wait_exponential
+            retrying = retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))(func)
+        return retrying(*args, **kwargs)
+    return wrapper
+
+
+class PlaylistRef:
+    """ratingKey and title of a Plex playlist, read from the raw playlist XML"""
+    __slots__ = ('ratingKey', 'title')
+
+    def __init__(self, ratingKey, title):
+        self.ratingKey = str(ratingKey)
+        self.title = title
+
+    @classmethod
+    def from_element(cls, element):
+        return cls(element.attrib['ratingKey'], element.attrib.get('title', ''))
+
+
+class ProgressivePlaylistWriter:
+    """Writes a new Plex playlist while its Spotify playlist is still being matched.
+
+    The playlist is created as soon as the first matches are known and later matches are
+    appended in playlist order, in chunks that double in size up to PLAYLIST_ADD_CHUNK_SIZE, so
+    listening can start within seconds while the request count stays close to one write at the
+    end. apply_plan still runs once matching finishes and settles the final order.
+    """
+
+    def __init__(self, plex_service, name, spotify_playlist_id):
+        self.plex_service = plex_service
+        self.name = name
+        self.spotify_playlist_id = spotify_playlist_id
+        self.playlist_key = None
+        # Entries of plan.matched already in the Plex playlist
+        self.written = 0
+        self.chunk_size = plex_service.PROGRESSIVE_FIRST_CHUNK
+        self.failed = False
+
+    def update(self, matched):
+        """Write the due part of matched (plan.matched so far), returning True when the playlist was created"""
+        created = False
+        while not self.failed and len(matched) - self.written >= self.chunk_size:
+            rating_keys = [entry['rating_key'] for entry in matched[self.written:self.written + self.chunk_size]]
+            try:
+                with self.plex_service._write_slots, tracer.span('plex.progressive_write', playlist=self.name,
+                                                                 tracks=len(rating_keys)):
+                    if self.playlist_key is None:
+                        self.playlist_key = self.plex_service.create_playlist_from_keys(self.name, rating_keys)
+                        self.plex_service.registry.set(self.spotify_playlist_id, self.playlist_key, self.name)
+                        created = True
+                        print(f"Created playlist '{self.name}' with its first {len(rating_keys)} tracks")
+                    else:
+                        self.plex_service.add_playlist_keys(self.playlist_key, rating_keys)
+            except Exception as e:
+                # Nothing is lost, the write at the end of matching covers the rest
+                print(f"Progressive write to '{self.name}' failed, writing it when matching ends: {str(e)}")
+                self.failed = True
+                break
+            self.written += len(rating_keys)
+            self.chunk_size = min(self.chunk_size * 2, self.plex_service.PLAYLIST_ADD_CHUNK_SIZE)
+        return created
 
 
 class PlexService:
+    # Maximum number of playlists written to Plex at the same time
+    PLAYLIST_WRITE_CONCURRENCY = 2
+    # ratingKeys per playlist write request, keeps the item URI under server URL limits
+    PLAYLIST_ADD_CHUNK_SIZE = 200
+    # Items per request when reading the ratingKeys of an existing playlist
+    PLAYLIST_ITEMS_PAGE_SIZE = 1000
+    # Matches a new playlist is created with during progressive writes, later chunks double in size
+    PROGRESSIVE_FIRST_CHUNK = 10
+    # Candidate tracks scored per lookup
+    MAX_TRACKS_TO_SEARCH = 100
+    # Tracks per search request; pages are scored as they arrive
+    SEARCH_PAGE_SIZE = 25
+    # Tracks requested per page while loading the library index
+    LIBRARY_PAGE_SIZE = 1000
+    # Spotify tracks handed to match_track_keys at a time
+    MATCH_BATCH_SIZE = 200
+    # Search result pages memoized during a sync
+    SEARCH_CACHE_SIZE = 2000
+    SHARED_INDEX_PATH = 'cache/library_index.bin'
+    # Expected (latency ms, hit rate) of each find_track strategy before any stats exist,
+    # chosen so a fresh install tries them in the historical fixed order. The last one is the
+    # final local fallback, which the planner never skips
+    SEARCH_STRATEGY_PRIORS = {
+        'artist_scoped': (150.0, 0.7),
+        'normalized_title': (120.0, 0.5),
+        'raw_title': (120.0, 0.2),
+        'base_title': (120.0, 0.15),
+        'title_index': (10.0, 0.01),
+    }
+    # Minimum name similarity for a fuzzy Plex artist lookup to count as the same artist
+    ARTIST_MATCH_THRESHOLD = 0.8
+    # Title similarity an artist's track needs to be scored by the artist-scoped search, and
+    # artist similarity a title index candidate needs to be scored at all
+    ARTIST_SCOPED_TITLE_THRESHOLD = 0.6
+    INDEX_ARTIST_THRESHOLD = 0.6
+    # Tracks of one Spotify album seen in a sync before the Plex album is resolved as a whole
+    ALBUM_MIN_TRACKS = 2
+    # Minimum album title similarity, and the largest duration difference (ms) of a track
+    # aligned by its disc/track number
+    ALBUM_TITLE_THRESHOLD = 0.8
+    ALBUM_DURATION_TOLERANCE_MS = 3000
+    # Seconds between background /identity checks that keep the pooled connections warm
+    HEALTH_CHECK_INTERVAL = 60
+    HEALTH_CHECK_TIMEOUT = 5
+    # Consecutive failed health checks before the server connection is rebuilt
+    HEALTH_CHECK_FAILURES_TO_RECONNECT = 3
+
     def __init__(self, base_url=None, token=None):
         self.base_url = base_url or os.getenv('PLEX_URL')
         self.token = token or os.getenv('PLEX_TOKEN')
         self.server = None
+        self._music_lib = None
+        self._music_lib_lock = threading.Lock()
+        self.healthy = False
+        self._health_thread = None
+        self._health_stop = threading.Event()
+        # Syncs and speculative matching hold the connection, the health check only replaces it
+        # while nobody does
+        self._connection_cond = threading.Condition()
+        self._connection_users = 0
+        self.library_watcher = None
+        self.registry = PlaylistRegistry()
+        self.plan_store = PlanStore()
+        self._playlists_by_title = None
+        self._playlist_lock = threading.Lock()
+        self._write_slots = threading.BoundedSemaphore(self.PLAYLIST_WRITE_CONCURRENCY)
+        # Resolve the artist first and match against its cached tracks before title searches
+        self.artist_scoped_search = os.getenv('PLEX_ARTIST_SCOPED_SEARCH', '1') != '0'
+        # Create new playlists while they are matched instead of after the last track
+        self.progressive_writes = os.getenv('PLEX_PROGRESSIVE_WRITES', '1') != '0'
+        self._artist_tracks_cache = {}
+        self._artist_cache_lock = threading.Lock()
+        # Spotify album ID -> tracks of the matching Plex album ([] when there is none), and how
+        # many tracks of each album have been seen
+        self._album_tracks_cache = {}
+        self._album_sightings = {}
+        self._album_cache_lock = threading.Lock()
+        # Lazily built matching state, shared with the per-user services created by for_user
+        self._shared = {'library_index': None, 'match_pool': None}
+        self._library_index_lock = threading.Lock()
+        self._match_pool_lock = threading.Lock()
+        # Number of matching processes, 0 or 1 keeps matching in the sync thread
+        self.match_processes = int(os.getenv('MATCH_PROCESSES', '0') or 0)
+        # Shared by the sync worker and speculative matching of the browsed playlist. Misses are
+        # the most expensive results, they are kept until the library watcher reports a change
+        # that may affect them or MATCH_MISS_TTL seconds pass
+        self.match_cache = MatchCache(miss_ttl=int(os.getenv('MATCH_MISS_TTL', '21600')))
+        self.search_planner = SearchPlanner(self.SEARCH_STRATEGY_PRIORS)
+        # Identical title, artist and album searches are sent once per sync, even when concurrent
+        self.search_cache = SearchCache(self.SEARCH_CACHE_SIZE)
+        self.anthropic_service = AnthropicService()
+        # One keep-alive connection per thread that talks to Plex at the same time: the sync
+        # worker, speculative matching, the playlist writers and the health check
+        self.http_metrics = RequestMetrics()
+        self.session = create_pooled_session(self.http_metrics, self.PLAYLIST_WRITE_CONCURRENCY + 3)
         # Create directories if they don't exist
         Path('backups').mkdir(exist_ok=True)
         Path('logs').mkdir(exist_ok=True)
+        Path('cache').mkdir(exist_ok=True)
         self.connect()
 
+    @property
+    def library_index(self):
+        return self._shared['library_index']
+
+    @library_index.setter
+    def library_index(self, index):
+        self._shared['library_index'] = index
+
+    def for_user(self, profile):
+        """PlexService writing playlists as the profile's Plex user.
+
+        The copy keeps its own server connection, playlist registry and plans, and its own search,
+        artist and album caches, since a managed user's library may be restricted. It shares the
+        library index, match cache, search planner and HTTP pool with this service.
+        """
+        user_service = copy.copy(self)
+        try:
+            if profile.plex_token:
+                from plexapi.server import PlexServer
+                user_service.server = PlexServer(self.base_url, profile.plex_token, session=self.session)
+            elif profile.plex_user:
+                user_service.server = self.server.switchUser(profile.plex_user, session=self.session)
+            print(f"Account '{profile.name}' writes playlists as Plex user "
+                  f"'{profile.plex_user or 'server owner'}'")
+        except Exception as e:
+            print(f"Failed to switch to Plex user '{profile.plex_user}': {str(e)}")
+            raise
+        user_service._music_lib = None
+        user_service._music_lib_lock = threading.Lock()
+        user_service._health_thread = None
+        user_service.healthy = True  # Only the owner's service is health checked, this copy just connected
+        user_service.library_watcher = None
+        user_service.registry = PlaylistRegistry(profile.registry_path)
+        user_service.plan_store = PlanStore(profile.plans_directory)
+        user_service._playlists_by_title = None
+        user_service._playlist_lock = threading.Lock()
+        user_service.search_cache = SearchCache(self.SEARCH_CACHE_SIZE)
+        user_service._artist_tracks_cache = {}
+        user_service._artist_cache_lock = threading.Lock()
+        user_service._album_tracks_cache = {}
+        user_service._album_sightings = {}
+        user_service._album_cache_lock = threading.Lock()
+        user_service.registry.load()
+        return user_service
+
+    def begin_sync(self):
+        """Reset per-sync state and load the playlist registry once for the whole sync.
+
+        Unless the library watcher keeps it current, the library index is dropped too, since
+        tracks may have been added to or removed from Plex since it was loaded.
+        """
+        if not self.healthy:
+            # The health check lost the server, a new connection beats failing every request of the sync
+            self.reconnect()
+        self._hold_connection()
+        self.http_metrics.reset()
+        self.registry.load()
+        if not (self.library_watcher and self.library_watcher.connected):
+            with self._library_index_lock:
+                self.library_index = None
+        with self._playlist_lock:
+            self._playlists_by_title = None
+        with self._artist_cache_lock:
+            self._artist_tracks_cache.clear()
+        with self._album_cache_lock:
+            self._album_tracks_cache.clear()
+            self._album_sightings.clear()
+        self.search_cache.clear()
+
+    def end_sync(self):
+        """Release resources held for the duration of a sync"""
+        self._release_connection()
+        self.search_planner.save()
+        print(self.search_planner.report())
+        print(self.http_metrics.report())
+        print(scoring_stats.report())
+        print(self.search_cache.report())
+        cassette = cassette_from_env()
+        if cassette:
+            cassette.save()
+        with self._match_pool_lock:
+            if self._shared['match_pool']:
+                self._shared['match_pool'].close()
+                self._shared['match_pool'] = None
+
+    def shutdown(self):
+        """Stop the health check and library watch threads, called when the application closes"""
+        self.stop_health_check()
+        self.stop_library_watch()
+        if self._health_thread:
+            self._health_thread.join(timeout=self.HEALTH_CHECK_TIMEOUT)
+
     def backup_playlist(self, playlist_name, tracks):
         """Backup playlist data before making changes"""
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -50,16 +322,17 @@ class PlexService:
             json.dump(backup, f, indent=2)
         print(f"Playlist backup created: {backup_file}")
 
-    def log_unmatched_tracks(self, playlist_name, unmatched_tracks):
-        """Save unmatched tracks to a log file"""
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        log_file = f'logs/unmatched_tracks_{playlist_name}_{timestamp}.txt'
+    def log_unmatched_tracks(self, playlist_name, unmatched_tracks, log_file=None):
+        """Save unmatched tracks to a log file, appending to log_file when one is given"""
+        if log_file is None:
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            log_file = f'logs/unmatched_tracks_{playlist_name}_{timestamp}.txt'
+            with open(log_file, 'w', encoding='utf-8') as f:
+                f.write(f"Unmatched tracks for playlist: {playlist_name}\n")
+                f.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+                f.write("-" * 50 + "\n\n")
         
-        with open(log_file, 'w', encoding='utf-8') as f:
-            f.write(f"Unmatched tracks for playlist: {playlist_name}\n")
-            f.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write("-" * 50 + "\n\n")
-            
+        with open(log_file, 'a', encoding='utf-8') as f:
             for track in unmatched_tracks:
                 f.write(f"Title: {track.title}\n")
                 f.write(f"Artists: {track.artists}\n")
@@ -67,19 +340,11 @@ class PlexService:
                 f.write("\n")
         
         print(f"Unmatched tracks logged to: {log_file}")
+        return log_file
 
     def normalize_string(self, s):
         """Normalize a string by removing special characters and extra whitespace"""
-        if s is None:
-            return ""
-        # Handle periods in abbreviations (e.g., "T.N.T")
-        s = s.replace('.', '')  # Remove periods
-        # Remove special characters and replace with space
-        s = re.sub(r'[^\w\s-]', ' ', s)
-        # Replace multiple spaces with single space
-        s = re.sub(r'\s+', ' ', s)
-        # Convert to lowercase and strip
-        return s.lower().strip()
+        return normalize_string(s)
 
     def normalize_featuring(self, s):
         """Normalize featuring artist formats"""
@@ -93,54 +358,373 @@ class PlexService:
 
     def normalize_remix_title(self, title):
         """Normalize remix titles to a standard format"""
-        # First normalize the basic string
-        title = self.normalize_string(title)
-        
-        # Define common remix patterns
-        remix_patterns = [
-            (r'\s*[-–]\s*(.*?mix)', r' \1'),  # Convert "- XXX Mix" to "XXX Mix"
-            (r'\s*[-–]\s*(remix)', r' \1'),    # Convert "- Remix" to "Remix"
-            (r'\s*[-–]\s*(edit)', r' \1'),     # Convert "- Edit" to "Edit"
-            (r'\s*[-–]\s*(version)', r' \1'),  # Convert "- Version" to "Version"
-        ]
-        
-        # Apply each pattern
-        normalized = title
-        for pattern, replacement in remix_patterns:
-            normalized = re.sub(pattern, replacement, normalized, flags=re.IGNORECASE)
-        
-        # Remove parentheses
-        normalized = re.sub(r'[\(\)]', '', normalized)
-        
-        print(f"Normalized remix title: '{title}' -> '{normalized}'")
+        normalized = normalize_remix_title(title)
+        print(f"Normalized remix title: '{self.normalize_string(title)}' -> '{normalized}'")
         return normalized
     
     def title_similarity(self, title1, title2):
         """Calculate similarity between two titles"""
-        return SequenceMatcher(None, title1, title2).ratio()
+        return title_similarity(title1, title2)
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
     def connect(self):
         """Connect to Plex server"""
+        self._use_server(self.open_server())
+        return True
+
+    @lazy_retry
+    def open_server(self):
+        """New PlexServer connection over the pooled session"""
         try:
+            from plexapi.server import PlexServer
             print(f"Connecting to Plex server at {self.base_url}")
-            self.server = PlexServer(self.base_url, self.token)
-            print(f"Successfully connected to Plex server: {self.server.friendlyName}")
-            return True
+            server = PlexServer(self.base_url, self.token, session=self.session)
+            print(f"Successfully connected to Plex server: {server.friendlyName}")
+            return server
         except Exception as e:
             print(f"Failed to connect to Plex server: {str(e)}")
             raise
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
+    def _use_server(self, server):
+        self.server = server
+        with self._music_lib_lock:
+            self._music_lib = None
+        self.healthy = True
+
+    @contextlib.contextmanager
+    def connection_in_use(self):
+        """Keep the health check from replacing the server connection while the block runs"""
+        self._hold_connection()
+        try:
+            yield
+        finally:
+            self._release_connection()
+
+    def _hold_connection(self):
+        with self._connection_cond:
+            self._connection_users += 1
+
+    def _release_connection(self):
+        with self._connection_cond:
+            self._connection_users = max(self._connection_users - 1, 0)
+
+    @lazy_retry
     def get_music_library(self):
-        """Get the music library section"""
+        """Get the music library section, looked up once per connection"""
         try:
-            music_lib = self.server.library.section('Music')
-            return music_lib
+            with self._music_lib_lock:
+                if self._music_lib is None:
+                    self._music_lib = self.server.library.section('Music')
+                return self._music_lib
         except Exception as e:
             print(f"Failed to get music library: {str(e)}")
             raise
     
+    def start_health_check(self):
+        """Start the background thread that pings the server and reconnects when it stops answering"""
+        if self._health_thread and self._health_thread.is_alive():
+            return
+        self._health_stop.clear()
+        self._health_thread = threading.Thread(target=self._health_check_loop, name='plex-health-check', daemon=True)
+        self._health_thread.start()
+
+    def stop_health_check(self):
+        self._health_stop.set()
+
+    def check_health(self):
+        """Request /identity over the pooled session, returning True when the server answered"""
+        try:
+            response = self.session.get(
+                f"{self.base_url.rstrip('/')}/identity",
+                headers={'X-Plex-Token': self.token, 'Accept': 'application/json'},
+                timeout=self.HEALTH_CHECK_TIMEOUT
+            )
+            return response.ok
+        except Exception as e:
+            print(f"Plex health check failed: {str(e)}")
+            return False
+
+    def _health_check_loop(self):
+        failures = 0
+        while not self._health_stop.wait(self.HEALTH_CHECK_INTERVAL):
+            healthy = self.check_health()
+            if not healthy and self.healthy:
+                print("Plex server stopped answering")
+            self.healthy = healthy
+            failures = 0 if healthy else failures + 1
+            # A single missed ping is usually transient, the pooled session reconnects by itself
+            if failures >= self.HEALTH_CHECK_FAILURES_TO_RECONNECT and self.reconnect():
+                failures = 0
+
+    def reconnect(self):
+        """Rebuild the server connection unless a sync is using it, returning whether it was replaced"""
+        if self._connection_users:
+            print("Plex connection is in use, keeping it until the sync finishes")
+            return False
+        try:
+            server = self.open_server()
+        except Exception:
+            return False  # open_server already logged the failure, retry on the next check
+        with self._connection_cond:
+            if self._connection_users:
+                print("Plex connection is in use, keeping it until the sync finishes")
+                return False
+            self._use_server(server)
+        print("Reconnected to the Plex server")
+        return True
+
+    def start_library_watch(self, url=None):
+        """Apply library changes from the Plex notification websocket as they happen"""
+        if self.library_watcher is None:
+            self.library_watcher = LibraryWatcher(self, url)
+        return self.library_watcher.start()
+
+    def stop_library_watch(self):
+        if self.library_watcher:
+            self.library_watcher.stop()
+
+    def apply_library_changes(self, updated_keys=(), deleted_keys=()):
+        """Bring the library index and match caches up to date with added, changed and deleted tracks"""
+        index = self.library_index
+        for rating_key in deleted_keys:
+            if index is not None:
+                index.remove(int(rating_key))
+            self.match_cache.invalidate_rating_key(rating_key)
+
+        tracks = []
+        if updated_keys:
+            keys = ','.join(str(rating_key) for rating_key in updated_keys)
+            with tracer.span('plex.fetch_changed', tracks=len(updated_keys)):
+                tracks = [(LibraryTrack.from_plex(item), media_part_files(item))
+                          for item in self.server.fetchItems(f'/library/metadata/{keys}')
+                          if getattr(item, 'TYPE', None) == 'track']
+        titles = set()
+        with self._artist_cache_lock:
+            for track, files in tracks:
+                if index is not None:
+                    index.add(track, files)
+                titles.add(self.normalize_string(track.title))
+                self._artist_tracks_cache.pop(self.normalize_string(track.grandparentTitle), None)
+        with self._album_cache_lock:
+            self._album_tracks_cache.clear()
+        self.search_cache.clear()
+
+        forgotten = 0
+        if titles:
+            # A Spotify title containing the new track's title may have missed it before
+            forgotten = self.match_cache.invalidate_negatives(
+                lambda title, artists: any(added in self.normalize_string(title) for added in titles))
+        print(f"Library changed: {len(tracks)} tracks added or updated, {len(deleted_keys)} deleted, "
+              f"{forgotten} unmatched tracks will be retried")
+
+    def resync_library(self):
+        """Reload the library index after changes may have been missed"""
+        if self.library_index is not None:
+            index = self.load_library_index()
+            with self._library_index_lock:
+                self.library_index = index
+        with self._artist_cache_lock:
+            self._artist_tracks_cache.clear()
+        with self._album_cache_lock:
+            self._album_tracks_cache.clear()
+        self.search_cache.clear()
+        forgotten = self.match_cache.invalidate_negatives()
+        print(f"Resynced the Plex library, {forgotten} unmatched tracks will be retried")
+
+    def iter_search_pages(self, title, limit=None, music_lib=None):
+        """Yield title search results page by page, never asking the server for more than limit tracks"""
+        music_lib = music_lib or self.get_music_library()
+        limit = limit or self.MAX_TRACKS_TO_SEARCH
+        start = 0
+        while start < limit:
+            size = min(self.SEARCH_PAGE_SIZE, limit - start)
+            with tracer.span('plex.search', query=title, start=start):
+                page = self.search_cache.get_or_fetch(
+                    ('track', title.lower(), start, size),
+                    lambda: music_lib.search(
+                        title=title,
+                        libtype='track',
+                        container_start=start,
+                        container_size=size,
+                        maxresults=size
+                    ) or []
+                )
+            if page:
+                yield page
+            if len(page) < size:
+                return
+            start += len(page)
+
+    def search_tracks(self, title, music_lib=None, limit=None):
+        """Run a bounded title search against the music library"""
+        tracks = []
+        for page in self.iter_search_pages(title, limit, music_lib):
+            tracks.extend(page)
+        return tracks
+
+    def get_library_index(self):
+        """Load every library track into the approximate title index on first use"""
+        with self._library_index_lock:
+            if self.library_index is None:
+                self.library_index = self.load_library_index()
+            return self.library_index
+
+    def load_library_index(self):
+        """Page through all library tracks, keeping only the lightweight attributes used for matching"""
+        music_lib = self.get_music_library()
+        index = TrackIndex()
+        start = 0
+        with tracer.span('plex.load_library'):
+            while True:
+                page = music_lib.search(
+                    libtype='track',
+                    container_start=start,
+                    container_size=self.LIBRARY_PAGE_SIZE,
+                    maxresults=self.LIBRARY_PAGE_SIZE
+                )
+                for track in page:
+                    index.add(LibraryTrack.from_plex(track), media_part_files(track))
+                if len(page) < self.LIBRARY_PAGE_SIZE:
+                    break
+                start += len(page)
+        print(f"Indexed {len(index)} library tracks ({len(index.files)} with media file names)")
+        return index
+
+    def get_match_pool(self):
+        """Start the matching processes on a memory-mapped copy of the library index"""
+        with self._match_pool_lock:
+            if self._shared['match_pool'] is None:
+                index = self.get_library_index()
+                with tracer.span('match.write_shared_index', tracks=len(index)), index.lock:
+                    version = index.version
+                    index_path = write_shared_index(index, self.SHARED_INDEX_PATH)
+                self._shared['match_pool'] = ProcessMatchPool(index_path, self.match_processes,
+                                                              self.MAX_TRACKS_TO_SEARCH, self.INDEX_ARTIST_THRESHOLD,
+                                                              source=(index, version))
+            return self._shared['match_pool']
+
+    def match_track_keys(self, tracks, on_match=None):
+        """Match a batch of Spotify tracks, returning Plex ratingKeys (or None) in input order.
+
+        Results already in the match cache are reused, and Spotify local files are looked up by
+        file name in the library index before any search. Tracks from albums seen more than once
+        are aligned against the whole Plex album. The rest are matched against the library index
+        (across worker processes with MATCH_PROCESSES > 1) and confident matches are taken as
+        they are; only the remainder goes through find_track and its network searches.
+        on_match(position, track, rating_key) is called as each result becomes known.
+        """
+        results = [None] * len(tracks)
+        pending = []
+
+        cached = {}
+        for position, track in enumerate(tracks):
+            found, rating_key = self.match_cache.get(track)
+            if found:
+                cached[position] = rating_key
+            else:
+                pending.append(position)
+
+        # Cached tracks may have been removed from Plex since, those are matched again
+        existing = self.existing_rating_keys({rating_key for rating_key in cached.values() if rating_key})
+        for position, rating_key in cached.items():
+            if rating_key and rating_key not in existing:
+                pending.append(position)
+                continue
+            results[position] = rating_key
+            if on_match:
+                on_match(position, tracks[position], rating_key)
+        pending.sort()
+
+        if any(tracks[position].is_local for position in pending):
+            for position in pending:
+                if not tracks[position].is_local:
+                    continue
+                key = self.match_local_file(tracks[position])
+                if key is not None:
+                    results[position] = key
+                    self.match_cache.put(tracks[position], key)
+                    if on_match:
+                        on_match(position, tracks[position], key)
+            pending = [position for position in pending if results[position] is None]
+
+        if pending:
+            for position, key in self.match_album_tracks(tracks, pending).items():
+                results[position] = key
+                self.match_cache.put(tracks[position], key)
+                if on_match:
+                    on_match(position, tracks[position], key)
+            pending = [position for position in pending if results[position] is None]
+
+        local_results = {}
+        if pending:
+            source, local_results = self.match_locally(tracks, pending)
+            for position in pending:
+                rating_key, score, _ = local_results[position]
+                if rating_key is not None and score >= song_matcher.CONFIDENT_MATCH_SCORE:
+                    results[position] = str(rating_key)
+                    self.match_cache.put(tracks[position], results[position])
+                    if on_match:
+                        on_match(position, tracks[position], results[position])
+            pending = [position for position in pending if results[position] is None]
+            # find_track reuses the rest as its title index strategy while the index is unchanged
+            local_results = {position: (source, local_results[position]) for position in pending}
+
+        for position in pending:
+            track = tracks[position]
+            with tracer.span('match.find_track', title=track.name):
+                plex_track = self.find_track(track.name, track.artists, local_results.get(position))
+            results[position] = str(plex_track.ratingKey) if plex_track else None
+            self.match_cache.put(track, results[position])
+            if on_match:
+                on_match(position, track, results[position])
+        return results
+
+    def match_locally(self, tracks, positions):
+        """Run local_match for the tracks at positions against the library index.
+
+        Returns (source, {position: (ratingKey or None, score, candidate keys)}), where source is
+        the (index, version) the results were computed from. With MATCH_PROCESSES > 1 the batch
+        is split across worker processes while their copy of the index is current.
+        """
+        queries = [(tracks[position].name, tracks[position].artists) for position in positions]
+        if self.match_processes > 1:
+            pool = self.get_match_pool()
+            if pool.is_current(self.library_index):
+                with tracer.span('match.process_pool', tracks=len(queries)):
+                    results = pool.match(queries)
+                return pool.source, dict(zip(positions, results))
+        index = self.get_library_index()
+        with tracer.span('match.local', tracks=len(queries)), index.lock:
+            source = (index, index.version)
+            results = [local_match(index, title, artists_string, self.MAX_TRACKS_TO_SEARCH,
+                                   self.INDEX_ARTIST_THRESHOLD) for title, artists_string in queries]
+        return source, dict(zip(positions, results))
+
+    def existing_rating_keys(self, rating_keys):
+        """The ratingKeys (as strings) that still belong to library tracks.
+
+        Answered from the library index when it is loaded, otherwise by a batched metadata
+        request, so a deleted track's key is never written into a playlist.
+        """
+        if not rating_keys:
+            return set()
+        index = self.library_index
+        if index is not None:
+            return {rating_key for rating_key in rating_keys if int(rating_key) in index}
+
+        from plexapi.exceptions import NotFound
+        existing = set()
+        rating_keys = sorted(rating_keys)
+        with tracer.span('plex.check_keys', tracks=len(rating_keys)):
+            for start in range(0, len(rating_keys), self.PLAYLIST_ADD_CHUNK_SIZE):
+                chunk = rating_keys[start:start + self.PLAYLIST_ADD_CHUNK_SIZE]
+                try:
+                    container = self.server.query(f"/library/metadata/{','.join(chunk)}")
+                except NotFound:
+                    continue  # None of them exists any more
+                existing.update(element.attrib.get('ratingKey') for element in container
+                                if element.attrib.get('type') == 'track')
+        return existing
+
     def is_live_version(self, title):
         """Check if a track is a live version"""
         live_indicators = [
@@ -156,10 +740,266 @@ class PlexService:
         normalized_title = self.normalize_string(title).lower()
         return any(indicator in normalized_title for indicator in live_indicators)
 
-    def find_track(self, title, artists_string):
+    def match_candidates(self, title, artists_string, tracks):
+        """Score candidate Plex tracks against a Spotify title and artists, returning the best match"""
+        return self.best_candidate(title, artists_string, tracks)[0]
+
+    def best_candidate(self, title, artists_string, tracks):
+        """Best match among candidate Plex tracks and its score, as (track or None, score)"""
+        with tracer.span('match.score', candidates=len(tracks)):
+            return best_candidate(title, artists_string, tracks, verbose=True)
+
+    def resolve_artist(self, artist_name):
+        """Find the Plex artist for a Spotify artist name using fuzzy name comparison"""
+        normalized_name = self.normalize_string(artist_name)
+        if not normalized_name:
+            return None
+        with tracer.span('plex.search_artist', query=artist_name):
+            candidates = self.search_cache.get_or_fetch(
+                ('artist', artist_name.lower()),
+                lambda: self.get_music_library().searchArtists(title=artist_name, maxresults=10) or []
+            )
+
+        best_artist, best_score = None, 0.0
+        for artist in candidates:
+            normalized_candidate = self.normalize_string(artist.title)
+            if normalized_candidate == normalized_name:
+                return artist
+            score = self.title_similarity(normalized_candidate, normalized_name)
+            if score > best_score:
+                best_artist, best_score = artist, score
+        return best_artist if best_score > self.ARTIST_MATCH_THRESHOLD else None
+
+    def get_artist_tracks(self, artist_name):
+        """Return all Plex tracks of an artist, fetched once and cached for the rest of the sync"""
+        key = self.normalize_string(artist_name)
+        with self._artist_cache_lock:
+            if key in self._artist_tracks_cache:
+                return self._artist_tracks_cache[key]
+
+        tracks = []
+        try:
+            artist = self.resolve_artist(artist_name)
+            if artist:
+                with tracer.span('plex.artist_tracks', artist=artist.title):
+                    tracks = artist.tracks()
+                print(f"Cached {len(tracks)} tracks for artist '{artist.title}'")
+        except Exception as e:
+            print(f"Failed to load tracks for artist '{artist_name}': {str(e)}")
+
+        with self._artist_cache_lock:
+            self._artist_tracks_cache[key] = tracks
+        return tracks
+
+    def match_local_file(self, track):
+        """ratingKey of the Plex file a Spotify local file refers to, or None.
+
+        Spotify names untagged local files after the file, so "artist - name" is looked up among
+        the media file names of the library index, then the name on its own. A bare name is only
+        accepted when the Plex track is by one of the Spotify artists, since a title like "Intro"
+        says nothing about whose file it is.
+        """
+        if not track.name:
+            return None
+        index = self.get_library_index()
+        artists = [artist.strip() for artist in track.artists.split(',') if artist.strip()]
+        if artists:
+            rating_key = index.find_file(f"{artists[0]} - {track.name}")
+            if rating_key is not None:
+                print(f"✓ Local file '{track.name}' found in Plex by artist and file name")
+                return str(rating_key)
+        rating_key = index.find_file(track.name)
+        if rating_key is None:
+            return None
+        plex_track = index.get(rating_key)
+        if artists and not (plex_track and self.is_artist_match(plex_track, artists)):
+            print(f"✗ Local file '{track.name}' matches a Plex file by another artist, searching instead")
+            return None
+        print(f"✓ Local file '{track.name}' found in Plex by file name")
+        return str(rating_key)
+
+    def is_artist_match(self, plex_track, artists):
+        """Whether a Plex track is credited to one of the Spotify artists"""
+        if is_various_artists_match(plex_track, artists):
+            return True
+        for plex_artist in filter(None, (plex_track.grandparentTitle, plex_track.originalTitle)):
+            plex_artist = self.normalize_string(plex_artist)
+            for artist in filter(None, map(self.normalize_string, artists)):
+                if (artist in plex_artist or plex_artist in artist or
+                        self.title_similarity(artist, plex_artist) > self.ARTIST_MATCH_THRESHOLD):
+                    return True
+        return False
+
+    def match_album_tracks(self, tracks, positions):
+        """Align tracks at positions with their Plex albums, returning {position: ratingKey}.
+
+        An album is only resolved once ALBUM_MIN_TRACKS of its tracks have been seen during the
+        sync, so playlists of unrelated singles do not pay for album lookups.
+        """
+        by_album = {}
+        for position in positions:
+            track = tracks[position]
+            if track.album_id and track.album_name and not track.is_local:
+                by_album.setdefault(track.album_id, []).append(position)
+
+        matched = {}
+        for album_id, album_positions in by_album.items():
+            with self._album_cache_lock:
+                seen = self._album_sightings.get(album_id, 0) + len(album_positions)
+                self._album_sightings[album_id] = seen
+                resolved = album_id in self._album_tracks_cache
+            if not resolved and seen < self.ALBUM_MIN_TRACKS:
+                continue
+            album_tracks = self.get_album_tracks(tracks[album_positions[0]])
+            if not album_tracks:
+                continue
+            aligned = 0
+            for position in album_positions:
+                plex_track = self.align_album_track(tracks[position], album_tracks)
+                if plex_track:
+                    matched[position] = str(plex_track.ratingKey)
+                    aligned += 1
+            print(f"Aligned {aligned}/{len(album_positions)} tracks with album '{album_tracks[0].parentTitle}'")
+        return matched
+
+    def resolve_album(self, album_name, artists_string, total_tracks=0):
+        """Find the Plex album for a Spotify album by title, artist and track count"""
+        base_name = re.sub(r'\s*[-–(\[].*$', '', album_name).strip()
+        normalized_name = self.normalize_string(album_name)
+        normalized_base = self.normalize_string(base_name)
+        artists = [self.normalize_string(artist) for artist in artists_string.split(',') if artist.strip()]
+
+        candidates = []
+        # Editions ("Deluxe", "Remastered 2011") are often filed under the plain album title
+        for query in dict.fromkeys(name for name in (album_name, base_name) if name):
+            with tracer.span('plex.search_album', query=query):
+                candidates = self.search_cache.get_or_fetch(
+                    ('album', query.lower()),
+                    lambda: self.get_music_library().searchAlbums(title=query, maxresults=10) or []
+                )
+            if candidates:
+                break
+
+        best_album, best_score = None, 0.0
+        for album in candidates:
+            normalized_title = self.normalize_string(album.title)
+            title_score = max(self.title_similarity(normalized_title, normalized_name),
+                              self.title_similarity(normalized_title, normalized_base))
+            if title_score < self.ALBUM_TITLE_THRESHOLD:
+                continue
+            album_artist = self.normalize_string(getattr(album, 'parentTitle', '') or '')
+            artist_score = max((self.title_similarity(album_artist, artist) for artist in artists), default=0.0)
+            if album_artist != 'various artists' and artist_score < self.ARTIST_MATCH_THRESHOLD:
+                continue
+            leaf_count = getattr(album, 'leafCount', None) or 0
+            if total_tracks and leaf_count == total_tracks:
+                count_score = 1.0
+            elif total_tracks and leaf_count and abs(leaf_count - total_tracks) <= 2:
+                count_score = 0.5
+            else:
+                count_score = 0.0
+            score = title_score + 0.5 * artist_score + 0.25 * count_score
+            if score > best_score:
+                best_album, best_score = album, score
+        return best_album
+
+    def get_album_tracks(self, spotify_track):
+        """Return the tracks of the Plex album matching a Spotify track's album, cached for the sync"""
+        album_id = spotify_track.album_id
+        with self._album_cache_lock:
+            if album_id in self._album_tracks_cache:
+                return self._album_tracks_cache[album_id]
+
+        tracks = []
+        try:
+            album = self.resolve_album(spotify_track.album_name, spotify_track.artists,
+                                       spotify_track.album_total_tracks)
+            if album:
+                with tracer.span('plex.album_tracks', album=album.title):
+                    tracks = [LibraryTrack.from_plex(track) for track in album.tracks()]
+        except Exception as e:
+            print(f"Failed to load tracks for album '{spotify_track.album_name}': {str(e)}")
+
+        with self._album_cache_lock:
+            self._album_tracks_cache[album_id] = tracks
+        return tracks
+
+    def align_album_track(self, spotify_track, album_tracks):
+        """Pick a Spotify track's counterpart in its Plex album by disc/track number and duration"""
+        def duration_matches(candidate):
+            if not spotify_track.duration_ms or not candidate.duration:
+                return True
+            return abs(candidate.duration - spotify_track.duration_ms) <= self.ALBUM_DURATION_TOLERANCE_MS
+
+        normalized_title = self.normalize_string(spotify_track.name)
+        for candidate in album_tracks:
+            if (candidate.index == spotify_track.track_number and
+                    (candidate.parentIndex or 1) == (spotify_track.disc_number or 1)):
+                if (duration_matches(candidate) and
+                        self.title_similarity(self.normalize_string(candidate.title), normalized_title) >= 0.6):
+                    return candidate
+                break
+
+        # Other editions number their tracks differently, fall back to the title within the album
+        best_track, best_score = None, 0.0
+        for candidate in album_tracks:
+            if not duration_matches(candidate):
+                continue
+            score = self.title_similarity(self.normalize_string(candidate.title), normalized_title)
+            if score > best_score:
+                best_track, best_score = candidate, score
+        return best_track if best_score >= 0.85 else None
+
+    def find_track_by_artist(self, title, artists_string):
+        """Match a track locally against the cached tracks of its artists"""
+        artists = [artist.strip() for artist in artists_string.split(',') if artist.strip()]
+        normalized_search_title = self.normalize_string(title)
+        if not normalized_search_title:
+            # Punctuation-only titles ("?", "...") would be contained in every track title
+            return None
+        base_title = self.normalize_string(re.sub(r'\s*[-–(].*$', '', title))
+
+        candidates = []
+        for artist in artists:
+            candidates.extend(self.get_artist_tracks(artist))
+        # Compilations are filed under "Various Artists" with the performer in originalTitle
+        lowered_artists = [artist.lower() for artist in artists]
+        candidates.extend(
+            track for track in self.get_artist_tracks('Various Artists')
+            if getattr(track, 'originalTitle', None) and
+            any(artist in track.originalTitle.lower() for artist in lowered_artists)
+        )
+        if not candidates:
+            return None
+
+        # Keep only plausible titles so the full scorer runs on a short list
+        scored = {}
+        for track in candidates:
+            track_title = self.normalize_string(track.title)
+            if not track_title:
+                continue
+            if (normalized_search_title in track_title or track_title in normalized_search_title or
+                    (base_title and base_title in track_title)):
+                score = 1.0
+            else:
+                matcher = SequenceMatcher(None, track_title, normalized_search_title)
+                score = matcher.ratio() if matcher.quick_ratio() > self.ARTIST_SCOPED_TITLE_THRESHOLD else 0.0
+            if score > self.ARTIST_SCOPED_TITLE_THRESHOLD:
+                scored[track.ratingKey] = (score, track)
+        if not scored:
+            return None
+
+        shortlist = [track for _, track in sorted(scored.values(), key=lambda x: x[0], reverse=True)]
+        print(f"Artist-scoped search: {len(shortlist)} local candidates from {len(candidates)} artist tracks")
+        return self.match_candidates(title, artists_string, shortlist[:self.MAX_TRACKS_TO_SEARCH])
+
+    def find_track(self, title, artists_string, index_result=None):
+        """Best Plex track for a Spotify title and artists, or None.
+
+        index_result is the (source, local_match result) match_track_keys computed for the track,
+        used as the title index strategy's result while the index is unchanged.
+        """
         try:
-            MAX_TRACKS_TO_SEARCH = 100
-            music_lib = self.get_music_library()
             artists = [artist.strip() for artist in artists_string.split(',')]
             primary_artist = artists[0] if artists else ""
             
@@ -173,188 +1013,25 @@ class PlexService:
             print(f"Normalized remix: '{normalized_remix_title}'")
             print(f"Normalized artist: '{normalized_search_artist}'")
 
-            potential_matches = []
-            
-            # Regular search with retry logic
-            tracks = self.get_music_library().search(title=normalized_search_title, libtype='track') or []
-            if not tracks:
-                tracks = self.get_music_library().search(title=title, libtype='track') or []
-            if not tracks:
-                base_title = re.sub(r'\s*[-–(].*$', '', title).strip()
-                tracks = self.get_music_library().search(title=base_title, libtype='track') or []
-
-            # Limit the number of tracks to search through
-            tracks = tracks[:MAX_TRACKS_TO_SEARCH]
-            print(f"Found {len(tracks)} potential tracks (limited to {MAX_TRACKS_TO_SEARCH})")
-            
-            # Try standard matching first
-            for track in tracks:
-                track_title = self.normalize_string(track.title)
-                track_title_remix = self.normalize_remix_title(track.title)
-                track_artist = self.normalize_string(track.grandparentTitle if hasattr(track, 'grandparentTitle') else '')
-                
-                print(f"\nComparing track:")
-                print(f"  Spotify: '{title}' -> '{normalized_search_title}'")
-                print(f"  Plex:    '{track.title}' -> '{track_title}'")
-                print(f"  Artist (Spotify): '{primary_artist}' -> '{normalized_search_artist}'")
-                print(f"  Artist (Plex):    '{track.grandparentTitle}' -> '{track_artist}'")
-                
-                # Calculate base similarity
-                title_score = max(
-                    self.title_similarity(track_title, normalized_search_title),
-                    self.title_similarity(track_title_remix, normalized_remix_title)
-                )
-                artist_score = max(
-                    self.title_similarity(track_artist, self.normalize_string(artist))
-                    for artist in artists
-                )
-                
-                print(f"  Similarity scores - Title: {title_score:.2f}, Artist: {artist_score:.2f}")
+            # Try the strategies in the order the planner expects to be cheapest for this library
+            context = {'queries': set(), 'index_result': index_result}
+            for name in self.search_planner.plan(self.available_search_strategies()):
+                if name == 'title_index':
+                    self.get_library_index()  # Keep the one-off index load out of the strategy's latency
+                start = time.perf_counter()
+                match = getattr(self, f'_search_{name}')(title, artists_string, context)
+                self.search_planner.record(name, match is not None, (time.perf_counter() - start) * 1000)
+                if match:
+                    print(f"✓ Matched by strategy '{name}'")
+                    return match
 
-                # Direct matches (case-insensitive)
-                direct_title_match = (
-                    title.lower() == track.title.lower() or
-                    normalized_search_title == track_title or
-                    normalized_remix_title == track_title_remix
-                )
-                
-                direct_artist_match = any(
-                    artist.lower() == track.grandparentTitle.lower() 
-                    for artist in artists
-                )
-                            # High similarity matches
-                title_similarity_match = (
-                    title_score > 0.8 or
-                    normalized_search_title in track_title or
-                    track_title in normalized_search_title or
-                    normalized_remix_title in track_title_remix or
-                    track_title_remix in normalized_remix_title
-                )
-                
-                artist_similarity_match = (
-                    artist_score > 0.8 or
-                    any(self.normalize_string(artist) in track_artist for artist in artists) or
-                    any(track_artist in self.normalize_string(artist) for artist in artists) or
-                    (track.grandparentTitle == 'Various Artists' and
-                    hasattr(track, 'originalTitle') and
-                    any(artist.lower() in track.originalTitle.lower() for artist in artists))
-                )
-                
-                # Check for direct match first and return immediately if found
-                if direct_title_match and direct_artist_match:
-                    print(f"  ✓ Direct match found")
-                    return track
-                
-                # If we have a similarity match, add to potential matches
-                if title_similarity_match and artist_similarity_match:
-                    match_score = title_score + artist_score
-                    potential_matches.append({
-                        'track': track,
-                        'score': match_score,
-                        'direct_match': False
-                    })
-                    print(f"  ✓ Potential match found (score: {match_score})")
-                    print(f"    Similarity match: {title_similarity_match and artist_similarity_match}")
-                else:
-                    print(f"  ✗ No match")
-                    print(f"    Direct title match: {direct_title_match}")
-                    print(f"    Direct artist match: {direct_artist_match}")
-                    print(f"    Title similarity match: {title_similarity_match}")
-                    print(f"    Artist similarity match: {artist_similarity_match}")
-
-            # If we found any potential matches, return the best one
-            if potential_matches:
-                best_match = max(potential_matches, key=lambda x: x['score'])
-                print(f"\n✓ Best match found: {best_match['track'].title} by {best_match['track'].grandparentTitle}")
-                return best_match['track']
-
-            # If no matches found, try additional matching strategies
-            print("\nNo matches found through regular matching, trying additional matching...")
-
-            # Try different search approaches for more potential matches
-            search_tracks = []
-            
-            # Try searching with just the letters for abbreviated titles
-            letters_only = ''.join(c for c in title if c.isalnum())
-            print(f"Searching with letters only: {letters_only}")
-            letter_tracks = music_lib.search(title=letters_only, libtype='track') or []
-            
-            # Try searching with first word of title
-            first_word = title.split()[0]
-            print(f"Searching with first word: {first_word}")
-            first_word_tracks = music_lib.search(title=first_word, libtype='track') or []
-            
-            # Try searching with base title (no special characters)
-            base_title = re.sub(r'[^\w\s]', '', title)
-            print(f"Searching with base title: {base_title}")
-            base_tracks = music_lib.search(title=base_title, libtype='track') or []
-
-            # Combine all results and limit the total
-            all_tracks = (letter_tracks + first_word_tracks + base_tracks)[:MAX_TRACKS_TO_SEARCH]
-            
-            # Filter by artist similarity
-            search_tracks = [
-                t for t in all_tracks 
-                if any(
-                    self.title_similarity(
-                        self.normalize_string(artist), 
-                        self.normalize_string(t.grandparentTitle)
-                    ) > 0.6 
-                    for artist in artists
-                )
-            ]
-            
-            # Remove duplicates
-            search_tracks = list({t.ratingKey: t for t in search_tracks}.values())
-
-            if search_tracks:
-                # Check for exact matches first
-                for track in search_tracks:
-                    if track.title.lower() == title.lower():
-                        if (any(artist.lower() in track.grandparentTitle.lower() for artist in artists) or
-                            (track.grandparentTitle == 'Various Artists' and
-                            hasattr(track, 'originalTitle') and
-                            any(artist.lower() in track.originalTitle.lower() for artist in artists))):
-                            print(f"\n✓ Found exact match in additional search: {track.title} by {track.grandparentTitle}")
-                            return track
-
-                # If no exact match found and Claude API is configured, try Claude-assisted matching
-                if os.getenv('ANTHROPIC_API_KEY'):
-                    try:
-                        track_list = [f"{i}: '{t.title}' by '{t.grandparentTitle}'" 
-                                    for i, t in enumerate(search_tracks)]
-                        
-                        anthropic = Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY'))
-                        prompt = (
-                            f"Given the Spotify track '{title}' by '{artists_string}', "
-                            f"find the best matching track from this list and reply ONLY "
-                            f"with the index number. If no good match exists, reply with -1.\n\n"
-                            f"Tracks:\n" + "\n".join(track_list)
-                        )
-
-                        print("\nTrying Claude-assisted matching...")
-                        message = anthropic.messages.create(
-                            model="claude-3-sonnet-20240229",
-                            max_tokens=1,
-                            temperature=0,
-                            system="You are a music matching assistant. Only respond with the index number of the best match.",
-                            messages=[{
-                                "role": "user",
-                                "content": prompt
-                            }]
-                        )
-
-                        response_content = message.content[0].text.strip()
-                        if response_content not in ['-', '-1', 'n/a', 'none']:
-                            try:
-                                match_index = int(response_content)
-                                if 0 <= match_index < len(search_tracks):
-                                    print(f"Claude suggested match: {track_list[match_index]}")
-                                    return search_tracks[match_index]
-                            except ValueError:
-                                print(f"Invalid Claude response: {response_content}")
-                    except Exception as e:
-                        print(f"Claude-assisted matching error: {str(e)}")
+            # If no exact match found and Claude API is configured, try Claude-assisted matching
+            if self.anthropic_service.configured:
+                if 'index_candidates' not in context:
+                    context['index_candidates'] = self.get_index_candidates(title, artists_string)
+                match = self.claude_match(title, artists_string, context['index_candidates'])
+                if match:
+                    return match
 
             print(f"\n✗ No match found for: {title} by {artists_string}")
             return None
@@ -364,8 +1041,300 @@ class PlexService:
             print(f"Title: {title}, Artists: {artists_string}")
             return None
 
-    def create_playlist(self, name, tracks=None):
-        """Create a new playlist"""
+    def available_search_strategies(self):
+        strategies = list(self.SEARCH_STRATEGY_PRIORS)
+        if not self.artist_scoped_search:
+            strategies.remove('artist_scoped')
+        return strategies
+
+    def _search_and_match(self, query, title, artists_string, context):
+        """Run one title search and score its results; identical queries run only once per lookup"""
+        if not query or query.lower() in context['queries']:
+            return None
+        context['queries'].add(query.lower())
+        # Plex returns the most relevant results first, so paging stops at a direct or confident
+        # match; a weaker match only wins once every page up to the limit has been scored
+        searched = 0
+        best, best_score = None, 0.0
+        for page in self.iter_search_pages(query, self.MAX_TRACKS_TO_SEARCH):
+            searched += len(page)
+            match, score = self.best_candidate(title, artists_string, page)
+            if match is not None and score > best_score:
+                best, best_score = match, score
+            if best_score >= song_matcher.CONFIDENT_MATCH_SCORE:
+                print(f"Search '{query}' matched confidently after {searched} tracks")
+                return best
+        if best is not None:
+            print(f"Search '{query}' matched after scoring {searched} tracks")
+        else:
+            print(f"Search '{query}' found no match in {searched} tracks (limited to {self.MAX_TRACKS_TO_SEARCH})")
+        return best
+
+    def _search_artist_scoped(self, title, artists_string, context):
+        """Match locally against the cached tracks of the artist"""
+        return self.find_track_by_artist(title, artists_string)
+
+    def _search_normalized_title(self, title, artists_string, context):
+        return self._search_and_match(self.normalize_string(title), title, artists_string, context)
+
+    def _search_raw_title(self, title, artists_string, context):
+        return self._search_and_match(title, title, artists_string, context)
+
+    def _search_base_title(self, title, artists_string, context):
+        base_title = re.sub(r'\s*[-–(].*$', '', title).strip()
+        return self._search_and_match(base_title, title, artists_string, context)
+
+    def _search_title_index(self, title, artists_string, context):
+        """Approximate lookup in the in-process title index instead of extra network searches"""
+        precomputed = self.precomputed_index_result(context.get('index_result'))
+        if precomputed is not None:
+            match, context['index_candidates'] = precomputed
+            return match
+
+        search_tracks = context['index_candidates'] = self.get_index_candidates(title, artists_string)
+        if not search_tracks:
+            return None
+
+        # Check for exact matches first
+        match = exact_candidate(title, artists_string, search_tracks)
+        if match is not None:
+            print(f"\n✓ Found exact match in additional search: {match.title} by {match.grandparentTitle}")
+            return match
+
+        # Index candidates tolerate typos and reordered words, so score them like search results
+        return self.match_candidates(title, artists_string, search_tracks)
+
+    def precomputed_index_result(self, index_result):
+        """(match, candidates) of a local_match result, or None when the library index has changed since"""
+        index = self.library_index
+        if index_result is None or index is None:
+            return None
+        (source_index, version), (rating_key, _, candidate_keys) = index_result
+        if source_index is not index or version != index.version:
+            return None
+        candidates = [index.get(key) for key in candidate_keys]
+        if not all(candidates):
+            return None
+        return (index.get(rating_key) if rating_key is not None else None), candidates
+
+    def get_index_candidates(self, title, artists_string):
+        """Nearest index entries for a title, filtered by artist similarity"""
+        index = self.get_library_index()
+        with tracer.span('match.index_lookup'):
+            search_tracks = index_candidates(index, title, artists_string, self.MAX_TRACKS_TO_SEARCH,
+                                             self.INDEX_ARTIST_THRESHOLD)
+        print(f"Title index returned {len(search_tracks)} approximate candidates")
+        return search_tracks
+
+    def claude_match(self, title, artists_string, search_tracks):
+        """Ask Claude to pick the best candidate when every strategy failed"""
+        if not search_tracks:
+            return None
+        try:
+            track_list = [f"{i}: '{t.title}' by '{t.grandparentTitle}'" 
+                        for i, t in enumerate(search_tracks)]
+            
+            prompt = (
+                f"Given the Spotify track '{title}' by '{artists_string}', "
+                f"find the best matching track from this list and reply ONLY "
+                f"with the index number. If no good match exists, reply with -1.\n\n"
+                f"Tracks:\n" + "\n".join(track_list)
+            )
+
+            print("\nTrying Claude-assisted matching...")
+            with tracer.span('anthropic.match', candidates=len(search_tracks)):
+                message = self.anthropic_service.create_message(
+                    model="claude-3-sonnet-20240229",
+                    max_tokens=1,
+                    temperature=0,
+                    system="You are a music matching assistant. Only respond with the index number of the best match.",
+                    messages=[{
+                        "role": "user",
+                        "content": prompt
+                    }]
+                )
+
+            response_content = message.content[0].text.strip()
+            if response_content not in ['-', '-1', 'n/a', 'none']:
+                try:
+                    match_index = int(response_content)
+                    if 0 <= match_index < len(search_tracks):
+                        print(f"Claude suggested match: {track_list[match_index]}")
+                        return search_tracks[match_index]
+                except ValueError:
+                    print(f"Invalid Claude response: {response_content}")
+        except Exception as e:
+            print(f"Claude-assisted matching error: {str(e)}")
+        return None
+
+    def library_uri(self, rating_keys):
+        """Server URI addressing library items by ratingKey, as accepted by the playlist endpoints"""
+        return (f"server://{self.server.machineIdentifier}/com.plexapp.plugins.library"
+                f"/library/metadata/{','.join(str(key) for key in rating_keys)}")
+
+    def _playlist_query(self, path, method=None, **params):
+        """Raw request against a playlist endpoint, returning the parsed MediaContainer element"""
+        if params:
+            path = f"{path}?{urlencode(params)}"
+        return self.server.query(path, method=method)
+
+    def get_playlists_by_title(self):
+        """List the server's audio playlists once per sync and index them by title"""
+        with self._playlist_lock:
+            if self._playlists_by_title is None:
+                container = self._playlist_query('/playlists', playlistType='audio')
+                self._playlists_by_title = {}
+                for element in container:
+                    playlist = PlaylistRef.from_element(element)
+                    self._playlists_by_title.setdefault(playlist.title, playlist)
+                print(f"Loaded {len(self._playlists_by_title)} existing Plex playlists")
+            return self._playlists_by_title
+
+    def find_existing_playlist(self, name, spotify_playlist_id=None):
+        """Find the Plex playlist for a Spotify playlist, by registry first and title second"""
+        if spotify_playlist_id:
+            rating_key = self.registry.get_rating_key(spotify_playlist_id)
+            if rating_key:
+                try:
+                    container = self._playlist_query(f'/playlists/{rating_key}')
+                    return PlaylistRef.from_element(container[0])
+                except Exception as e:
+                    print(f"Registered playlist {rating_key} is no longer available: {str(e)}")
+                    self.registry.remove(spotify_playlist_id)
+
+        return self.get_playlists_by_title().get(name)
+
+    def get_playlist_keys(self, playlist_key):
+        """Current ratingKeys of a Plex playlist in playlist order, read from the raw item list"""
+        keys = []
+        start = 0
+        with tracer.span('plex.playlist_items'):
+            while True:
+                container = self._playlist_query(
+                    f'/playlists/{playlist_key}/items',
+                    **{'X-Plex-Container-Start': start, 'X-Plex-Container-Size': self.PLAYLIST_ITEMS_PAGE_SIZE}
+                )
+                page = [element.attrib['ratingKey'] for element in container if 'ratingKey' in element.attrib]
+                keys.extend(page)
+                total = int(container.attrib.get('totalSize', container.attrib.get('size', len(page))))
+                start += len(page)
+                if not page or start >= total:
+                    return keys
+
+    def create_playlist_from_keys(self, name, rating_keys):
+        """Create an audio playlist holding the given ratingKeys, returning its ratingKey"""
+        first_chunk = rating_keys[:self.PLAYLIST_ADD_CHUNK_SIZE]
+        container = self._playlist_query(
+            '/playlists', method=self.server._session.post,
+            type='audio', title=name, smart=0, uri=self.library_uri(first_chunk)
+        )
+        playlist_key = container[0].attrib['ratingKey']
+        with self._playlist_lock:
+            if self._playlists_by_title is not None:
+                self._playlists_by_title[name] = PlaylistRef(playlist_key, name)
+        self.add_playlist_keys(playlist_key, rating_keys[len(first_chunk):])
+        return playlist_key
+
+    def add_playlist_keys(self, playlist_key, rating_keys):
+        """Append ratingKeys to a playlist in chunks that stay under server request limits"""
+        for start in range(0, len(rating_keys), self.PLAYLIST_ADD_CHUNK_SIZE):
+            chunk = rating_keys[start:start + self.PLAYLIST_ADD_CHUNK_SIZE]
+            self._playlist_query(f'/playlists/{playlist_key}/items', method=self.server._session.put,
+                                 uri=self.library_uri(chunk))
+
+    def clear_playlist(self, playlist_key):
+        """Remove every item from a playlist with a single request"""
+        self._playlist_query(f'/playlists/{playlist_key}/items', method=self.server._session.delete)
+
+    def rename_playlist(self, playlist_key, title):
+        self._playlist_query(f'/playlists/{playlist_key}', method=self.server._session.put, title=title)
+
+    def begin_append_sync(self, name, spotify_playlist_id):
+        """Prepare an append-only sync, returning (playlist ratingKey or None, (added_at, keys) high-water mark).
+
+        An existing playlist without a recorded mark is emptied so the whole collection is streamed into it.
+        """
+        playlist = self.find_existing_playlist(name, spotify_playlist_id)
+        if not playlist:
+            return None, (None, None)
+        if playlist.title != name:
+            print(f"Renaming playlist '{playlist.title}' to '{name}'")
+            self.rename_playlist(playlist.ratingKey, name)
+        mark = self.registry.get_high_water(spotify_playlist_id)
+        if mark[0] is None:
+            print(f"No high-water mark for '{name}', rebuilding it from the full collection")
+            self.clear_playlist(playlist.ratingKey)
+            self.registry.set(spotify_playlist_id, playlist.ratingKey, name)
+        return playlist.ratingKey, mark
+
+    def append_to_playlist(self, name, playlist_key, rating_keys, spotify_playlist_id, high_water):
+        """Append one chunk, creating the playlist on the first matched chunk, then advance the high-water mark.
+
+        high_water is (added_at of the newest track in the chunk, keys of every track appended at it).
+        """
+        if rating_keys:
+            with self._write_slots, tracer.span('plex.append_playlist', playlist=name, tracks=len(rating_keys)):
+                if playlist_key is None:
+                    playlist_key = self.create_playlist_from_keys(name, rating_keys)
+                    self.registry.set(spotify_playlist_id, playlist_key, name)
+                    print(f"Created playlist '{name}' with {len(rating_keys)} tracks")
+                else:
+                    self.add_playlist_keys(playlist_key, rating_keys)
+                    print(f"Appended {len(rating_keys)} tracks to playlist '{name}'")
+        if playlist_key is not None:
+            self.registry.set_high_water(spotify_playlist_id, *high_water)
+        return playlist_key
+
+    def progressive_writer(self, name, spotify_playlist_id):
+        """ProgressivePlaylistWriter for a playlist that does not exist in Plex yet, otherwise None.
+
+        Existing playlists stay playable as they are and are updated once matching finishes.
+        """
+        if not self.progressive_writes or self.find_existing_playlist(name, spotify_playlist_id):
+            return None
+        return ProgressivePlaylistWriter(self, name, spotify_playlist_id)
+
+    def diff_plan(self, plan):
+        """Fill in the plan's diff against the current Plex playlist"""
+        playlist = self.find_existing_playlist(plan.playlist_name, plan.spotify_playlist_id)
+        return plan.compute_diff(self.get_playlist_keys(playlist.ratingKey) if playlist else None)
+
+    def apply_plan(self, plan):
+        """Write a saved match plan to Plex, returning the ratingKey of the written playlist.
+
+        The plan's diff is recomputed against the playlist as it is now, since it may have been
+        edited in Plex after the plan was made, and the write works from that fresh state.
+        """
+        try:
+            rating_keys = plan.rating_keys
+            with self._write_slots, tracer.span('plex.create_playlist', playlist=plan.playlist_name,
+                                                tracks=len(rating_keys)):
+                playlist = self.find_existing_playlist(plan.playlist_name, plan.spotify_playlist_id)
+                current_keys = self.get_playlist_keys(playlist.ratingKey) if playlist else None
+                plan.compute_diff(current_keys)
+                if plan.is_noop and playlist.title == plan.playlist_name:
+                    print(f"Playlist '{plan.playlist_name}' is already up to date, nothing to apply")
+                    playlist_key = None
+                elif not rating_keys:
+                    print(f"No tracks to apply for playlist '{plan.playlist_name}'")
+                    return None
+                else:
+                    playlist_key = self._write_playlist(plan.playlist_name, rating_keys, plan.spotify_playlist_id,
+                                                        current=(playlist, current_keys))
+            plan.status = MatchPlan.STATUS_APPLIED
+            plan.applied = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            plan.error = None
+            return playlist_key
+        except Exception as e:
+            plan.status = MatchPlan.STATUS_FAILED
+            plan.error = str(e)
+            print(f"Failed to apply plan for '{plan.playlist_name}': {str(e)}")
+            raise
+        finally:
+            self.plan_store.save(plan)
+
+    def create_playlist(self, name, tracks=None, spotify_playlist_id=None):
+        """Create a new playlist, or update the one already registered for this Spotify playlist"""
         try:
             if tracks is None or len(tracks) == 0:
                 print(f"No tracks provided for playlist '{name}', skipping creation")
@@ -400,24 +1369,9 @@ class PlexService:
 
             if tracks_to_add:
                 try:
-                    # Check for existing playlist
-                    existing = self.server.playlists(title=name)
-                    if existing:
-                        print(f"Found existing playlist '{name}', updating...")
-                        playlist = existing[0]
-                        # Clear existing items
-                        playlist.removeItems(playlist.items())
-                        # Add new items
-                        playlist.addItems(tracks_to_add)
-                        print(f"Updated playlist '{name}' with {len(tracks_to_add)} tracks")
-                    else:
-                        print(f"Creating new playlist '{name}'...")
-                        playlist = self.server.createPlaylist(
-                            title=name,
-                            items=tracks_to_add,
-                            section=self.get_music_library()
-                        )
-                        print(f"Successfully created playlist '{name}' with {len(tracks_to_add)} tracks")
+                    rating_keys = [str(track.ratingKey) for track in tracks_to_add]
+                    with self._write_slots, tracer.span('plex.create_playlist', playlist=name, tracks=len(rating_keys)):
+                        playlist_key = self._write_playlist(name, rating_keys, spotify_playlist_id)
                     
                     if not is_plex_track:
                         print(f"\nMatching Summary:")
@@ -426,7 +1380,7 @@ class PlexService:
                         print(f"Unmatched: {len(unmatched_tracks)}")
                         print(f"Success rate: {(len(matched_tracks)/len(tracks))*100:.1f}%")
                     
-                    return playlist
+                    return playlist_key
                     
                 except Exception as e:
                     print(f"Error during playlist creation/update: {str(e)}")
@@ -440,4 +1394,41 @@ class PlexService:
             print(f"Error creating/updating playlist '{name}': {str(e)}")
             print(f"Number of tracks: {len(tracks) if tracks else 0}")
             print(f"First few tracks: {[t.title for t in tracks[:3]] if tracks else 'None'}")
-            raise
\ No newline at end of file
+            raise
+
+    def _write_playlist(self, name, rating_keys, spotify_playlist_id=None, current=None):
+        """Make the Plex playlist hold exactly rating_keys, in order, and return its ratingKey.
+
+        current is the (playlist or None, its ratingKeys) the caller has just read, if any.
+        """
+        if current is None:
+            playlist = self.find_existing_playlist(name, spotify_playlist_id)
+            current_keys = self.get_playlist_keys(playlist.ratingKey) if playlist else None
+        else:
+            playlist, current_keys = current
+        if playlist:
+            playlist_key = playlist.ratingKey
+            print(f"Found existing playlist '{playlist.title}', updating...")
+            if playlist.title != name:
+                print(f"Renaming playlist '{playlist.title}' to '{name}'")
+                self.rename_playlist(playlist_key, name)
+                playlist.title = name
+            if current_keys == rating_keys:
+                print(f"Playlist '{name}' already holds the {len(rating_keys)} matched tracks")
+            elif rating_keys[:len(current_keys)] == current_keys:
+                # Only new tracks at the end, append them instead of rewriting the playlist
+                self.add_playlist_keys(playlist_key, rating_keys[len(current_keys):])
+                print(f"Appended {len(rating_keys) - len(current_keys)} tracks to playlist '{name}'")
+            else:
+                if current_keys:
+                    self.clear_playlist(playlist_key)
+                self.add_playlist_keys(playlist_key, rating_keys)
+                print(f"Updated playlist '{name}' with {len(rating_keys)} tracks")
+        else:
+            print(f"Creating new playlist '{name}'...")
+            playlist_key = self.create_playlist_from_keys(name, rating_keys)
+            print(f"Successfully created playlist '{name}' with {len(rating_keys)} tracks")
+
+        if spotify_playlist_id:
+            self.registry.set(spotify_playlist_id, playlist_key, name)
+        return playlist_key
@@ -0,0 +1,97 @@
+# services/response_cache.py
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+
+class ResponseCache:
+    """Thread-safe LRU cache of API responses with per-entry TTL and snapshot tags.
+
+    Entries may carry the snapshot (version) of the object they were fetched for; a lookup
+    with a different current snapshot is a miss. Entries also belong to an optional group so
+    everything cached for one playlist can be dropped at once. Values are shared between
+    callers and must be treated as read-only.
+    """
+
+    def __init__(self, max_entries=500, default_ttl=3600, path=None):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        # JSON file the cache is persisted to, None keeps it in memory only
+        self.path = Path(path) if path else None
+        # key -> (expires_at, snapshot, group, value)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if self.path:
+            self.load()
+
+    def get(self, key, snapshot=None, pop=False):
+        """Return (True, value) for a fresh entry, (False, None) otherwise; pop removes a hit"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, entry_snapshot, _, value = entry
+                if expires_at > time.time() and (snapshot is None or entry_snapshot == snapshot):
+                    if pop:
+                        del self._entries[key]
+                    else:
+                        self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value, ttl=None, snapshot=None, group=None):
+        expires_at = time.time() + (ttl if ttl is not None else self.default_ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, snapshot, group, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_group(self, group):
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if entry[2] == group]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def save(self):
+        if not self.path:
+            return
+        now = time.time()
+        with self._lock:
+            entries = [[key, *entry] for key, entry in self._entries.items() if entry[0] > now]
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'entries': entries}, f, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+    def load(self):
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entries = json.load(f).get('entries', [])
+        except Exception as e:
+            print(f"Failed to load response cache {self.path}: {str(e)}")
+            return
+        now = time.time()
+        with self._lock:
+            for key, expires_at, snapshot, group, value in entries[-self.max_entries:]:
+                if expires_at > now:
+                    self._entries[key] = (expires_at, snapshot, group, value)
+        print(f"Loaded {len(self._entries)} cached Spotify responses from {self.path}")
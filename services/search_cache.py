@@ -0,0 +1,96 @@
+# services/search_cache.py
+import threading
+from collections import OrderedDict
+
+
+class _Flight:
+    """A search in progress that other callers of the same query wait for"""
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SearchCache:
+    """Thread-safe LRU memo of Plex search results with single-flight coalescing.
+
+    The first caller of a query runs it; callers asking for the same query while it is in
+    flight wait for that result instead of sending their own request. Failures are passed to
+    the waiting callers but never cached. Results are shared and must be treated as read-only.
+    """
+
+    def __init__(self, max_entries=2000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        # Bumped by clear(), so a search started before it is not memoized afterwards
+        self._generation = 0
+        self.lookups = 0
+        self.hits = 0
+        self.coalesced = 0
+        self.fetches = 0
+
+    def get_or_fetch(self, key, fetch):
+        """Return the memoized result for key, joining or starting fetch() when there is none"""
+        with self._lock:
+            self.lookups += 1
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = _Flight()
+                generation = self._generation
+                self.fetches += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fetch()
+        except Exception as e:
+            flight.error = e
+            raise
+        else:
+            with self._lock:
+                if generation == self._generation:
+                    self._entries[key] = flight.result
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        finally:
+            with self._lock:
+                if self._in_flight.get(key) is flight:
+                    del self._in_flight[key]
+            flight.done.set()
+        return flight.result
+
+    def clear(self):
+        """Forget memoized results; searches already in flight still answer their current waiters"""
+        with self._lock:
+            self._entries.clear()
+            self._in_flight.clear()
+            self._generation += 1
+
+    def reset_stats(self):
+        with self._lock:
+            self.lookups = self.hits = self.coalesced = self.fetches = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def report(self):
+        with self._lock:
+            saved = self.hits + self.coalesced
+            rate = 100.0 * saved / self.lookups if self.lookups else 0.0
+            return (f"Plex searches: {self.lookups} lookups, {self.fetches} sent, {self.hits} memoized, "
+                    f"{self.coalesced} coalesced with an identical search in flight ({rate:.0f}% saved)")
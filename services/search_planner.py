@@ -0,0 +1,111 @@
+# services/search_planner.py
+import json
+import os
+import threading
+from pathlib import Path
+
+
+class SearchPlanner:
+    """Orders find_track's search strategies by their measured cost per successful match.
+
+    Each strategy keeps persistent attempt, hit and latency totals. The expected cost of a
+    strategy is its mean latency divided by its hit rate, both smoothed towards a prior so a
+    new install starts from the historical fixed order. Hit rates only count the lookups that
+    reach a strategy, i.e. the tracks earlier strategies missed, so a strategy is skipped on its
+    marginal yield: the matches it rescues per second spent on it. The last strategy of the
+    default order is the final fallback and always runs. Skipped strategies still run on an
+    occasional exploration lookup that keeps their stats fresh.
+    """
+
+    # Attempts needed before a strategy may be skipped
+    MIN_SAMPLES = 30
+    # Strategies rescuing fewer matches than this per second spent on them are skipped once they
+    # have enough samples; a 120 ms search is kept while it rescues 1 in 160 tracks reaching it
+    MIN_RESCUES_PER_SECOND = 0.05
+    # Every Nth lookup runs skipped strategies anyway
+    EXPLORE_EVERY = 50
+    # Weight of the prior, in pseudo-attempts
+    PRIOR_WEIGHT = 5
+    SAVE_EVERY = 50
+
+    def __init__(self, priors, path='cache/search_strategy_stats.json'):
+        # priors: {name: (expected_latency_ms, expected_hit_rate)} in the default order
+        self.priors = priors
+        self.path = Path(path)
+        self.stats = {}
+        self._lock = threading.Lock()
+        self._lookups = 0
+        self._unsaved = 0
+        self.load()
+
+    def load(self):
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.stats = json.load(f)
+        except Exception as e:
+            print(f"Failed to load search strategy stats: {str(e)}")
+            self.stats = {}
+
+    def save(self):
+        with self._lock:
+            data = {name: dict(stats) for name, stats in self.stats.items()}
+            self._unsaved = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def _estimate(self, name):
+        """Return (mean_latency_ms, hit_rate, attempts) smoothed towards the prior"""
+        prior_ms, prior_rate = self.priors[name]
+        stats = self.stats.get(name, {})
+        attempts = stats.get('attempts', 0)
+        weight = self.PRIOR_WEIGHT
+        mean_ms = (stats.get('total_ms', 0.0) + prior_ms * weight) / (attempts + weight)
+        hit_rate = (stats.get('hits', 0) + prior_rate * weight) / (attempts + weight)
+        return mean_ms, hit_rate, attempts
+
+    def estimated_cost(self, name):
+        mean_ms, hit_rate, _ = self._estimate(name)
+        return mean_ms / max(hit_rate, 1e-3)
+
+    def rescues_per_second(self, name):
+        """Matches a strategy rescues per second spent on it, among the lookups that reach it"""
+        mean_ms, hit_rate, _ = self._estimate(name)
+        return hit_rate * 1000.0 / max(mean_ms, 1e-3)
+
+    def plan(self, available):
+        """Return the strategies to try for one lookup, cheapest expected cost first"""
+        with self._lock:
+            self._lookups += 1
+            explore = self._lookups % self.EXPLORE_EVERY == 0
+        fallback = list(self.priors)[-1]
+        planned = []
+        for name in available:
+            _, _, attempts = self._estimate(name)
+            if (not explore and name != fallback and attempts >= self.MIN_SAMPLES and
+                    self.rescues_per_second(name) < self.MIN_RESCUES_PER_SECOND):
+                continue
+            planned.append(name)
+        return sorted(planned, key=self.estimated_cost)
+
+    def record(self, name, hit, elapsed_ms):
+        with self._lock:
+            stats = self.stats.setdefault(name, {'attempts': 0, 'hits': 0, 'total_ms': 0.0})
+            stats['attempts'] += 1
+            stats['hits'] += 1 if hit else 0
+            stats['total_ms'] += elapsed_ms
+            self._unsaved += 1
+            should_save = self._unsaved >= self.SAVE_EVERY
+        if should_save:
+            self.save()
+
+    def report(self):
+        lines = [f"{'Strategy':<20}{'Attempts':>10}{'Hit rate':>10}{'Mean ms':>10}{'Cost':>10}"]
+        for name in sorted(self.priors, key=self.estimated_cost):
+            mean_ms, hit_rate, attempts = self._estimate(name)
+            lines.append(f"{name:<20}{attempts:>10}{hit_rate:>10.2f}{mean_ms:>10.1f}{self.estimated_cost(name):>10.1f}")
+        return "\n".join(lines)
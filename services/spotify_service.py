@@ -1,27 +1,121 @@
 # services/spotify_service.py
+import atexit
 import os
+import requests
 import spotipy
 from spotipy.oauth2 import SpotifyOAuth
-from PyQt6.QtWidgets import QMessageBox
+from services.cassette import Cassette, cassette_from_env, mount_cassette
+from services.response_cache import ResponseCache
+from utils.tracing import tracer
+
+
+class SpotifyTrack:
+    """Compact projection of a Spotify track holding only the fields used for matching"""
+    __slots__ = ('id', 'name', 'artists', 'duration_ms', 'isrc', 'is_local',
+                 'album_id', 'album_name', 'album_total_tracks', 'track_number', 'disc_number')
+
+    def __init__(self, id, name, artists, duration_ms=0, isrc=None, is_local=False,
+                 album_id=None, album_name='', album_total_tracks=0, track_number=0, disc_number=1):
+        self.id = id
+        self.name = name
+        self.artists = artists  # Comma separated artist names, as find_track expects
+        self.duration_ms = duration_ms
+        self.isrc = isrc
+        self.is_local = is_local
+        # Album position, used to align whole albums at once
+        self.album_id = album_id
+        self.album_name = album_name
+        self.album_total_tracks = album_total_tracks
+        self.track_number = track_number
+        self.disc_number = disc_number
+
+    @property
+    def title(self):
+        return self.name
+
+    @property
+    def url(self):
+        return f"https://open.spotify.com/track/{self.id}" if self.id else 'N/A'
+
+    @classmethod
+    def from_api(cls, track):
+        """Build a record from a (possibly fields= filtered) Spotify track object"""
+        album = track.get('album') or {}
+        return cls(
+            id=track.get('id'),
+            name=track.get('name') or '',
+            artists=", ".join(artist['name'] for artist in track.get('artists') or [] if artist.get('name')),
+            duration_ms=track.get('duration_ms') or 0,
+            isrc=(track.get('external_ids') or {}).get('isrc'),
+            is_local=bool(track.get('is_local')),
+            album_id=album.get('id'),
+            album_name=album.get('name') or '',
+            album_total_tracks=album.get('total_tracks') or 0,
+            track_number=track.get('track_number') or 0,
+            disc_number=track.get('disc_number') or 1
+        )
+
 
 class SpotifyService:
-    def __init__(self):
+    # Only request the track fields we actually use, which keeps pages small to download and decode
+    TRACK_FIELDS = ('id,name,artists(name),duration_ms,external_ids(isrc),is_local,'
+                    'album(id,name,total_tracks),track_number,disc_number')
+    PLAYLIST_PAGE_SIZE = 100
+    # Pseudo playlist ID under which the user's saved tracks appear in the catalog
+    LIKED_SONGS_ID = 'liked-songs'
+    LIKED_SONGS_NAME = 'Liked Songs'
+    # Largest page the saved tracks endpoint accepts
+    SAVED_TRACKS_PAGE_SIZE = 50
+    # Latest likes listed when Liked Songs is browsed; syncs still stream the whole collection
+    LIKED_SONGS_BROWSE_LIMIT = 200
+    # Seconds cached responses stay valid: track pages are also invalidated by playlist snapshot
+    # changes, the catalog and Liked Songs have no snapshot and expire sooner
+    TRACK_PAGE_TTL = int(os.getenv('SPOTIFY_CACHE_TTL', '3600'))
+    CATALOG_TTL = int(os.getenv('SPOTIFY_CATALOG_TTL', '300'))
+    RESPONSE_CACHE_SIZE = 500
+
+    def __init__(self, cache_path='.spotify_cache', show_dialog=False):
         self.client = None
+        # Separate token caches let several accounts be authorized side by side
+        self.cache_path = cache_path
+        # Show Spotify's consent page even when logged in, so another account can be picked
+        self.show_dialog = show_dialog
+        # Shared by the playlist browser and the sync worker, optionally persisted between runs
+        persist_path = f"cache/{os.path.basename(cache_path).lstrip('.')}_responses.json"
+        self.response_cache = ResponseCache(
+            self.RESPONSE_CACHE_SIZE, self.TRACK_PAGE_TTL,
+            persist_path if os.getenv('SPOTIFY_CACHE_PERSIST') == '1' else None
+        )
+        if self.response_cache.path:
+            atexit.register(self.response_cache.save)
+        # Latest known snapshot_id per playlist, from the catalog listing
+        self._snapshots = {}
         self.initialize_client()
 
     def initialize_client(self):
         try:
             print("Initializing Spotify client...")  # Debug print
+            cassette = cassette_from_env()
+            if cassette and cassette.mode == Cassette.MODE_REPLAY:
+                # Replayed responses need no real login
+                self.client = spotipy.Spotify(auth='replay',
+                                              requests_session=mount_cassette(requests.Session(), cassette))
+                return True
+
             auth_manager = SpotifyOAuth(
                 client_id=os.getenv('SPOTIFY_CLIENT_ID'),
                 client_secret=os.getenv('SPOTIFY_CLIENT_SECRET'),
                 redirect_uri='http://localhost:8888/callback',
-                scope='playlist-read-private playlist-read-collaborative user-follow-read user-read-private',
+                scope='playlist-read-private playlist-read-collaborative user-follow-read user-read-private user-library-read',
                 open_browser=True,
-                cache_path='.spotify_cache'
+                cache_path=self.cache_path,
+                show_dialog=self.show_dialog
             )
             
-            self.client = spotipy.Spotify(auth_manager=auth_manager)
+            self.client = spotipy.Spotify(
+                auth_manager=auth_manager,
+                requests_session=mount_cassette(requests.Session(), cassette) if cassette else True
+            )
             
             # Test the connection and print user info
             user = self.client.current_user()
@@ -31,13 +125,16 @@ class SpotifyService:
             print(f"Spotify initialization error: {str(e)}")
             return False
 
-    def get_playlists(self):
+    def get_playlists(self, refresh=False):
+        """The user's playlists, re-read from Spotify when refresh is set instead of served from the catalog cache"""
         try:
             if not self.client:
                 raise Exception("Spotify client not initialized")
             
             print("Fetching playlists from Spotify...")  # Debug print
-            results = self.client.current_user_playlists()
+            results = self.cached_call('current_user_playlists', self.client.current_user_playlists,
+                                       ttl=self.CATALOG_TTL, refresh=refresh)
+            self.update_snapshots(results['items'])
             print(f"Retrieved {len(results['items'])} playlists")  # Debug print
             
             # Print each playlist name for debugging
@@ -49,6 +146,43 @@ class SpotifyService:
             print(f"Error fetching playlists: {str(e)}")
             raise
 
+    def cached_call(self, key, fetch, ttl=None, playlist_id=None, refresh=False, keep=True):
+        """Serve an API response from the response cache, calling fetch() and caching it on a miss.
+
+        Responses cached for a playlist are only reused while its snapshot_id is unchanged. With
+        refresh the cached response is replaced by a fresh one. Without keep a cached response is
+        used once and dropped, and a fetched one is not cached.
+        """
+        snapshot = self._snapshots.get(playlist_id) if playlist_id else None
+        found, value = (False, None) if refresh else self.response_cache.get(key, snapshot, pop=not keep)
+        if found:
+            return value
+        value = fetch()
+        if keep:
+            self.response_cache.put(key, value, ttl=ttl, snapshot=snapshot, group=playlist_id)
+        return value
+
+    def update_snapshots(self, playlists):
+        """Remember the current snapshot_id of each listed playlist"""
+        for playlist in playlists:
+            snapshot = playlist.get('snapshot_id')
+            if snapshot and self._snapshots.get(playlist['id']) not in (None, snapshot):
+                dropped = self.response_cache.invalidate_group(playlist['id'])
+                print(f"Playlist {playlist['name']} changed, dropped {dropped} cached pages")
+            self._snapshots[playlist['id']] = snapshot
+
+    def refresh_snapshots(self):
+        """Re-read the playlist catalog, dropping cached track pages of playlists changed since"""
+        if not self.client:
+            raise Exception("Spotify client not initialized")
+        results = self.cached_call('current_user_playlists', self.client.current_user_playlists,
+                                   ttl=self.CATALOG_TTL, refresh=True)
+        self.update_snapshots(results['items'])
+
+    def clear_response_cache(self):
+        self.response_cache.clear()
+        self._snapshots = {}
+
     def get_featured_playlists(self):
         """Get Spotify's featured playlists"""
         try:
@@ -72,10 +206,11 @@ class SpotifyService:
             
             print("Fetching personalized playlists...")
             # Get the user's ID
-            user_id = self.client.current_user()['id']
+            user_id = self.cached_call('current_user', self.client.current_user, ttl=self.CATALOG_TTL)['id']
             
             # First, get all playlists - regular and followed
-            all_playlists = self.client.current_user_playlists()
+            all_playlists = self.cached_call('current_user_playlists', self.client.current_user_playlists,
+                                             ttl=self.CATALOG_TTL)
             
             # Known "Made For You" playlist names to look for
             made_for_you_names = [
@@ -99,17 +234,24 @@ class SpotifyService:
             print(f"Error fetching Made For You playlists: {str(e)}")
             raise
     
-    def get_all_available_playlists(self):
-        """Get all playlists including user playlists, followed, and Made For You"""
+    def get_all_available_playlists(self, refresh=False):
+        """Get all playlists including user playlists, followed, and Made For You.
+
+        refresh bypasses the catalog cache, for an explicit reload or the start of a sync.
+        """
         try:
             # Get regular user playlists
-            user_playlists = self.get_playlists()
+            user_playlists = self.get_playlists(refresh)
             
-            # Get Made For You playlists
+            # Get Made For You playlists, from the catalog get_playlists has just cached
             made_for_you = self.get_made_for_you_playlists()
             
             # Combine playlists - note some may be duplicated but UI will handle that
             all_playlists = user_playlists['items'] + made_for_you['items']
+            try:
+                all_playlists.insert(0, self.get_liked_songs_playlist(refresh))
+            except Exception as e:
+                print(f"Liked Songs unavailable: {str(e)}")
             
             # Remove duplicates by playlist ID
             unique_playlists = []
@@ -124,24 +266,165 @@ class SpotifyService:
             print(f"Error fetching all playlists: {str(e)}")
             raise
 
-    def get_playlist_tracks(self, playlist_id):
-        try:
-            if not self.client:
-                raise Exception("Spotify client not initialized")
-            
-            print(f"SpotifyService: Fetching tracks for playlist {playlist_id}")  # Debug print
-            
-            tracks = []
-            results = self.client.playlist_tracks(playlist_id)
-            print(f"SpotifyService: Found {len(results['items'])} tracks")  # Debug print
-            tracks.extend(results['items'])
-            
-            while results['next']:
-                results = self.client.next(results)
-                tracks.extend(results['items'])
-                
-            print(f"SpotifyService: Total tracks found: {len(tracks)}")  # Debug print
-            return {'items': tracks}
-        except Exception as e:
-            print(f"SpotifyService Error: {str(e)}")  # Debug print
-            raise
\ No newline at end of file
+    def iter_playlist_tracks(self, playlist_id, keep_pages=True):
+        """Yield compact SpotifyTrack records page by page instead of building the full item list.
+
+        Syncs pass keep_pages=False: pages cached while browsing are still used, but no page
+        stays in the response cache once it has been streamed.
+        """
+        if not self.client:
+            raise Exception("Spotify client not initialized")
+
+        print(f"SpotifyService: Streaming tracks for playlist {playlist_id}")
+        fields = f"items(track({self.TRACK_FIELDS})),next"
+        with tracer.span('spotify.page', playlist=playlist_id):
+            results = self.cached_call(
+                f"playlist_items:{playlist_id}:{fields}:{self.PLAYLIST_PAGE_SIZE}",
+                lambda: self.client.playlist_items(
+                    playlist_id,
+                    fields=fields,
+                    limit=self.PLAYLIST_PAGE_SIZE,
+                    additional_types=('track',)
+                ),
+                playlist_id=playlist_id, keep=keep_pages
+            )
+        count = 0
+        while results:
+            for item in results['items']:
+                track = item.get('track')
+                if not track:  # Skip unavailable tracks
+                    continue
+                count += 1
+                yield SpotifyTrack.from_api(track)
+            # Drop the page before fetching the next one so only one page is held at a time
+            next_url = results.get('next')
+            if not next_url:
+                break
+            with tracer.span('spotify.page', playlist=playlist_id):
+                results = self.cached_call(f"next:{next_url}", lambda: self.client.next({'next': next_url}),
+                                           playlist_id=playlist_id, keep=keep_pages)
+        print(f"SpotifyService: Streamed {count} tracks")
+
+    def iter_tracks(self, playlist_id, keep_pages=True):
+        """Stream the tracks of a playlist, or of Liked Songs oldest first"""
+        if playlist_id == self.LIKED_SONGS_ID:
+            for _, _, track in self.iter_saved_tracks():
+                yield track
+        else:
+            yield from self.iter_playlist_tracks(playlist_id, keep_pages)
+
+    def iter_recent_saved_tracks(self, limit=None):
+        """Yield the most recently saved tracks newest first, from cached pages, for browsing"""
+        if not self.client:
+            raise Exception("Spotify client not initialized")
+        limit = self.LIKED_SONGS_BROWSE_LIMIT if limit is None else limit
+        offset = 0
+        while offset < limit:
+            page = self._saved_tracks_page(offset, self.SAVED_TRACKS_PAGE_SIZE)
+            for item in page['items'][:limit - offset]:
+                if item.get('track'):
+                    yield SpotifyTrack.from_api(item['track'])
+            if not page.get('next') or not page['items']:
+                break
+            offset += len(page['items'])
+
+    def get_liked_songs_playlist(self, refresh=False):
+        """Catalog entry for the user's saved tracks, shaped like a playlist object"""
+        if not self.client:
+            raise Exception("Spotify client not initialized")
+        total = self._saved_tracks_page(0, 1, cached=not refresh)['total']
+        return {'id': self.LIKED_SONGS_ID, 'name': self.LIKED_SONGS_NAME, 'tracks': {'total': total}}
+
+    def _saved_tracks_page(self, offset, limit, cached=True):
+        """One page of saved tracks; syncs pass cached=False so offsets and totals agree.
+
+        Liked Songs has no snapshot_id, so a cached page can be out of step with a fresh one
+        after new likes shift every offset.
+        """
+        fetch = lambda: self.client.current_user_saved_tracks(limit=limit, offset=offset)
+        with tracer.span('spotify.saved_page', offset=offset):
+            if not cached:
+                return fetch()
+            return self.cached_call(
+                f"saved_tracks:{offset}:{limit}",
+                fetch,
+                ttl=self.CATALOG_TTL, playlist_id=self.LIKED_SONGS_ID
+            )
+
+    @staticmethod
+    def saved_track_key(track):
+        """Identity of a saved track within a high-water mark; local files have only a URI"""
+        return track.get('id') or track.get('uri')
+
+    @classmethod
+    def is_before_mark(cls, item, since, since_ids):
+        """Whether a saved track is covered by the (since, since_ids) mark, i.e. already processed.
+
+        Bulk likes share one added_at, so tracks at the mark itself count as processed only when
+        their key was recorded.
+        """
+        if item['added_at'] != since:
+            return item['added_at'] < since
+        return cls.saved_track_key(item.get('track') or {}) in since_ids
+
+    def count_saved_tracks_since(self, since, since_ids):
+        """Offset of the first saved track older than the mark; everything before it may still need processing"""
+        count = 0
+        offset = 0
+        while True:
+            page = self._saved_tracks_page(offset, self.SAVED_TRACKS_PAGE_SIZE, cached=False)
+            for item in page['items']:
+                # Newest first, so everything after the first older track is older too
+                if item['added_at'] < since:
+                    return count
+                count += 1
+            if not page.get('next') or not page['items']:
+                return count
+            offset += len(page['items'])
+
+    def iter_saved_tracks(self, since=None, since_ids=None):
+        """Yield (added_at, key, SpotifyTrack) for saved tracks oldest first, skipping those the mark covers.
+
+        The API lists saved tracks newest first, so pages are requested from the end backwards and
+        reversed. Only one page is held at a time whatever the size of the collection. Pages bypass
+        the response cache, since a cached total or page would skip tracks liked since it was stored.
+
+        Offsets shift while tracks are liked or removed during the stream. Every page therefore
+        also reads the track just past it, which must be one already streamed (or covered by the
+        mark); if it is not, the position of the streamed tracks is looked up again by added_at
+        and key instead of trusting the offset. Tracks streamed once are never yielded again.
+        """
+        if not self.client:
+            raise Exception("Spotify client not initialized")
+
+        # Mark covering everything yielded so far, advanced as tracks stream oldest first
+        mark_at, mark_ids = since, set(since_ids or ())
+        end = (self.count_saved_tracks_since(mark_at, mark_ids) if since
+               else self._saved_tracks_page(0, 1, cached=False)['total'])
+        print(f"SpotifyService: Streaming up to {end} saved tracks" + (f" liked from {since}" if since else ""))
+        count = 0
+        while end > 0:
+            # One item short of the largest page, leaving room for the overlapping track
+            start = max(end - (self.SAVED_TRACKS_PAGE_SIZE - 1), 0)
+            items = self._saved_tracks_page(start, end - start + 1, cached=False)['items']
+            page, overlap = items[:end - start], items[end - start:]
+            if overlap and overlap[0].get('track') and not (mark_at and self.is_before_mark(overlap[0], mark_at,
+                                                                                              mark_ids)):
+                # Tracks were liked since the offsets were counted, the rest of this page moved up
+                end = (self.count_saved_tracks_since(mark_at, mark_ids) if mark_at
+                       else self._saved_tracks_page(0, 1, cached=False)['total'])
+                print(f"SpotifyService: Saved tracks changed while streaming, continuing from offset {end}")
+                continue
+            for item in reversed(page):
+                track = item.get('track')
+                # Covered tracks were streamed already, or by the sync that left the mark
+                if not track or (mark_at and self.is_before_mark(item, mark_at, mark_ids)):
+                    continue
+                key = self.saved_track_key(track)
+                if item['added_at'] != mark_at:
+                    mark_at, mark_ids = item['added_at'], set()
+                mark_ids.add(key)
+                count += 1
+                yield item['added_at'], key, SpotifyTrack.from_api(track)
+            end = start
+        print(f"SpotifyService: Streamed {count} saved tracks")
@@ -0,0 +1,131 @@
+# services/sync_journal.py
+import json
+import threading
+from datetime import datetime
+from pathlib import Path
+
+
+class ResumeState:
+    """What an interrupted sync run had finished, rebuilt from the journal"""
+
+    def __init__(self, mode, playlist_ids):
+        self.mode = mode
+        self.playlist_ids = playlist_ids
+        self.completed = set()
+        self.matched = set()
+        # playlist_id -> {position: (spotify_id, rating_key or None)}
+        self.track_results = {}
+        # playlist_id -> ratingKey of the Plex playlist from the last write
+        self.writes = {}
+
+    def cached_result(self, playlist_id, position, spotify_id):
+        """Return (True, rating_key) when this track was already matched in the interrupted run"""
+        entry = self.track_results.get(playlist_id, {}).get(position)
+        if entry and entry[0] == spotify_id:
+            return True, entry[1]
+        return False, None
+
+
+class SyncJournal:
+    """Append-only checkpoint journal (JSON lines) that lets an interrupted sync resume.
+
+    Track results are buffered and flushed in batches; playlist-level events flush immediately.
+    """
+
+    FLUSH_EVERY = 50
+
+    def __init__(self, path='cache/sync_journal.jsonl'):
+        self.path = Path(path)
+        self._buffer = []
+        self._lock = threading.Lock()
+
+    def start(self, mode, playlist_ids, resume=False):
+        """Begin a run; a fresh run replaces the previous journal, a resumed one appends to it"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self._buffer = []
+            if resume:
+                self._terminate_torn_line()
+            else:
+                with open(self.path, 'w', encoding='utf-8') as f:
+                    f.write(json.dumps({
+                        'event': 'run',
+                        'mode': mode,
+                        'playlists': list(playlist_ids),
+                        'started': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                    }) + '\n')
+
+    def _terminate_torn_line(self):
+        """Make sure appended records start on a fresh line after a crash mid-write"""
+        if not self.path.exists() or self.path.stat().st_size == 0:
+            return
+        with open(self.path, 'rb+') as f:
+            f.seek(-1, 2)
+            if f.read(1) != b'\n':
+                f.write(b'\n')
+
+    def record_track(self, playlist_id, position, spotify_id, rating_key):
+        self._append({
+            'event': 'track', 'playlist': playlist_id, 'pos': position,
+            'id': spotify_id, 'key': str(rating_key) if rating_key is not None else None
+        }, flush=False)
+
+    def record_matched(self, playlist_id):
+        """All tracks of the playlist are matched and its plan is saved"""
+        self._append({'event': 'matched', 'playlist': playlist_id})
+
+    def record_write(self, playlist_id, rating_key):
+        self._append({'event': 'write', 'playlist': playlist_id, 'key': str(rating_key)})
+
+    def record_completed(self, playlist_id):
+        self._append({'event': 'completed', 'playlist': playlist_id})
+
+    def finish(self):
+        """Mark the run finished so it is no longer offered for resume"""
+        self._append({'event': 'finished'})
+
+    def _append(self, record, flush=True):
+        with self._lock:
+            self._buffer.append(json.dumps(record))
+            if flush or len(self._buffer) >= self.FLUSH_EVERY:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._buffer:
+            return
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write('\n'.join(self._buffer) + '\n')
+        self._buffer = []
+
+    def load(self):
+        """Return the ResumeState of an unfinished run, or None if there is nothing to resume"""
+        if not self.path.exists():
+            return None
+        state = None
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # A line torn by a crash, the records around it are still valid
+                event = record.get('event')
+                if event == 'run':
+                    state = ResumeState(record.get('mode'), record.get('playlists', []))
+                elif state is None:
+                    continue
+                elif event == 'track':
+                    state.track_results.setdefault(record['playlist'], {})[record['pos']] = (record['id'], record['key'])
+                elif event == 'matched':
+                    state.matched.add(record['playlist'])
+                elif event == 'write':
+                    state.writes[record['playlist']] = record['key']
+                elif event == 'completed':
+                    state.completed.add(record['playlist'])
+                    state.track_results.pop(record['playlist'], None)
+                elif event == 'finished':
+                    state = None
+        return state
@@ -0,0 +1,131 @@
+# services/sync_plan.py
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+
+class MatchPlan:
+    """Serialized result of matching one Spotify playlist, ready to be applied to Plex later"""
+
+    STATUS_PLANNED = 'planned'
+    STATUS_APPLIED = 'applied'
+    STATUS_FAILED = 'failed'
+
+    def __init__(self, spotify_playlist_id, playlist_name, matched=None, unmatched=None,
+                 diff=None, status=STATUS_PLANNED, created=None, applied=None, error=None):
+        self.spotify_playlist_id = spotify_playlist_id
+        self.playlist_name = playlist_name
+        # [{'spotify_id', 'title', 'artists', 'rating_key'}] in playlist order
+        self.matched = matched or []
+        # [{'spotify_id', 'title', 'artists', 'url'}]
+        self.unmatched = unmatched or []
+        self.diff = diff or {}
+        self.status = status
+        self.created = created or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self.applied = applied
+        self.error = error
+
+    def add_result(self, spotify_track, rating_key):
+        """Record the match result (a Plex ratingKey or None) for one Spotify track"""
+        if rating_key is not None:
+            self.matched.append({
+                'spotify_id': spotify_track.id,
+                'title': spotify_track.name,
+                'artists': spotify_track.artists,
+                'rating_key': str(rating_key)
+            })
+        else:
+            self.unmatched.append({
+                'spotify_id': spotify_track.id,
+                'title': spotify_track.name,
+                'artists': spotify_track.artists,
+                'url': spotify_track.url
+            })
+
+    @property
+    def rating_keys(self):
+        return [entry['rating_key'] for entry in self.matched]
+
+    def compute_diff(self, current_keys):
+        """Compare the planned ratingKeys with the current contents of the Plex playlist"""
+        planned = self.rating_keys
+        planned_set = set(planned)
+        current_set = set(current_keys) if current_keys is not None else set()
+        self.diff = {
+            'playlist_exists': current_keys is not None,
+            'add': [key for key in planned if key not in current_set],
+            'remove': [key for key in (current_keys or []) if key not in planned_set],
+            'unchanged': len(planned_set & current_set),
+            'reordered': current_keys is not None and planned_set == current_set and planned != list(current_keys)
+        }
+        return self.diff
+
+    @property
+    def is_noop(self):
+        """True when the Plex playlist already holds exactly the planned tracks in order"""
+        return (self.diff.get('playlist_exists') and not self.diff.get('add') and
+                not self.diff.get('remove') and not self.diff.get('reordered'))
+
+    def to_dict(self):
+        return {
+            'spotify_playlist_id': self.spotify_playlist_id,
+            'playlist_name': self.playlist_name,
+            'status': self.status,
+            'created': self.created,
+            'applied': self.applied,
+            'error': self.error,
+            'diff': self.diff,
+            'matched': self.matched,
+            'unmatched': self.unmatched
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            spotify_playlist_id=data['spotify_playlist_id'],
+            playlist_name=data['playlist_name'],
+            matched=data.get('matched'),
+            unmatched=data.get('unmatched'),
+            diff=data.get('diff'),
+            status=data.get('status', cls.STATUS_PLANNED),
+            created=data.get('created'),
+            applied=data.get('applied'),
+            error=data.get('error')
+        )
+
+
+class PlanStore:
+    """Keeps the latest plan per Spotify playlist as JSON files in the plans directory"""
+
+    def __init__(self, directory='plans'):
+        self.directory = Path(directory)
+
+    def path_for(self, spotify_playlist_id):
+        return self.directory / f'plan_{spotify_playlist_id}.json'
+
+    def save(self, plan):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.path_for(plan.spotify_playlist_id)
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(plan.to_dict(), f, indent=2)
+        os.replace(tmp_path, path)
+        return path
+
+    def load(self, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return MatchPlan.from_dict(json.load(f))
+
+    def pending(self):
+        """Plans that were never applied or whose apply failed"""
+        plans = []
+        for path in sorted(self.directory.glob('plan_*.json')):
+            try:
+                plan = self.load(path)
+            except Exception as e:
+                print(f"Skipping unreadable plan {path}: {str(e)}")
+                continue
+            if plan.status != MatchPlan.STATUS_APPLIED:
+                plans.append(plan)
+        return plans
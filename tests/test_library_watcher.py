@@ -0,0 +1,165 @@
+# tests/test_library_watcher.py
+import base64
+import hashlib
+import json
+import socket
+import struct
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from services.library_watcher import LibraryWatcher
+from services.match_cache import MatchCache
+
+pytest.importorskip('websocket')
+
+SECTION_ID = 3
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+TIMEOUT = 10
+
+
+class NotificationStub:
+    """Local websocket server that sends each connection its batch of messages, then hangs up"""
+
+    def __init__(self, batches):
+        self.batches = list(batches)
+        self.requests = []
+        self._server = socket.socket()
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind(('127.0.0.1', 0))
+        self._server.listen()
+        self.url = f"ws://127.0.0.1:{self._server.getsockname()[1]}{LibraryWatcher.NOTIFICATIONS_PATH}"
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        for index, messages in enumerate(self.batches):
+            connection, _ = self._server.accept()
+            request = connection.recv(4096).decode()
+            self.requests.append(request)
+            key = next(line.split(':', 1)[1].strip() for line in request.split('\r\n')
+                       if line.lower().startswith('sec-websocket-key'))
+            accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+            connection.sendall(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n"
+                                f"Connection: Upgrade\r\nSec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+            for message in messages:
+                payload = json.dumps(message).encode()
+                header = bytes([0x81, len(payload)]) if len(payload) < 126 else \
+                    bytes([0x81, 126]) + struct.pack('>H', len(payload))
+                connection.sendall(header + payload)
+            if index == len(self.batches) - 1:
+                # Keep the last connection open until the watcher stops
+                connection.recv(1)
+            connection.close()
+
+    def close(self):
+        self._server.close()
+
+
+class FakeLibrary:
+    key = SECTION_ID
+
+
+class FakePlexService:
+    """Records what the watcher asks of PlexService"""
+
+    def __init__(self, expected_changes):
+        self.base_url = 'http://127.0.0.1:32400'
+        self.token = 'secret'
+        self.match_cache = MatchCache()
+        self.changes = []
+        self.resyncs = 0
+        self.expected_changes = expected_changes
+        self.changed = threading.Event()
+        self.resynced = threading.Event()
+
+    def get_music_library(self):
+        return FakeLibrary()
+
+    def apply_library_changes(self, updated_keys, deleted_keys):
+        self.changes.append((list(updated_keys), list(deleted_keys)))
+        if len(self.changes) >= self.expected_changes:
+            self.changed.set()
+
+    def resync_library(self):
+        self.resyncs += 1
+        self.resynced.set()
+
+
+def spotify_track(track_id, name):
+    return SimpleNamespace(id=track_id, name=name, artists='Artist')
+
+
+def timeline(item_id, state, section_id=SECTION_ID, item_type=LibraryWatcher.TRACK_TYPE):
+    return {'NotificationContainer': {'type': 'timeline', 'TimelineEntry': [{
+        'identifier': LibraryWatcher.LIBRARY_IDENTIFIER, 'sectionID': str(section_id),
+        'itemID': str(item_id), 'type': item_type, 'state': state}]}}
+
+
+def scan_ended(section_id=SECTION_ID):
+    return {'NotificationContainer': {'type': 'activity', 'ActivityNotification': [{
+        'event': 'ended',
+        'Activity': {'type': 'library.update.section', 'Context': {'librarySectionID': str(section_id)}}}]}}
+
+
+@pytest.fixture
+def run_watcher():
+    started = []
+
+    def run(plex_service, batches):
+        stub = NotificationStub(batches)
+        watcher = LibraryWatcher(plex_service, url=stub.url)
+        watcher.RECONNECT_MIN_DELAY = 0.05
+        assert watcher.start()
+        started.append((watcher, stub))
+        return watcher, stub
+
+    yield run
+    for watcher, stub in started:
+        watcher.stop()
+        stub.close()
+
+
+def test_timeline_inserts_updates_and_deletes(run_watcher):
+    plex_service = FakePlexService(expected_changes=3)
+    watcher, stub = run_watcher(plex_service, [[
+        timeline(101, LibraryWatcher.STATE_FINISHED),
+        timeline(55, LibraryWatcher.STATE_FINISHED),
+        # Other sections and other item types are ignored
+        timeline(7, LibraryWatcher.STATE_FINISHED, section_id=4),
+        timeline(8, LibraryWatcher.STATE_FINISHED, item_type=9),
+        timeline(55, LibraryWatcher.STATE_DELETED),
+    ]])
+    assert plex_service.changed.wait(TIMEOUT)
+    assert plex_service.changes == [(['101'], []), (['55'], []), ([], ['55'])]
+    assert watcher.events_applied == 3
+    assert 'X-Plex-Token: secret' in stub.requests[0]
+
+
+def test_scan_end_forgets_cached_misses(run_watcher):
+    plex_service = FakePlexService(expected_changes=1)
+    plex_service.match_cache.put(spotify_track('hit', 'Old Song'), 1)
+    plex_service.match_cache.put(spotify_track('miss', 'New Song'), None)
+    run_watcher(plex_service, [[
+        scan_ended(section_id=4),
+        scan_ended(),
+        # Applied after the scan notifications, so waiting for it means both were handled
+        timeline(1, LibraryWatcher.STATE_FINISHED),
+    ]])
+    assert plex_service.changed.wait(TIMEOUT)
+    assert plex_service.match_cache.get(spotify_track('miss', 'New Song')) == (False, None)
+    assert plex_service.match_cache.get(spotify_track('hit', 'Old Song')) == (True, '1')
+
+
+def test_disconnect_reconnects_and_resyncs(run_watcher):
+    plex_service = FakePlexService(expected_changes=2)
+    watcher, stub = run_watcher(plex_service, [
+        [timeline(1, LibraryWatcher.STATE_FINISHED)],
+        [timeline(2, LibraryWatcher.STATE_FINISHED)],
+    ])
+    assert plex_service.resynced.wait(TIMEOUT)
+    assert plex_service.changed.wait(TIMEOUT)
+    assert plex_service.resyncs == 1
+    assert plex_service.changes == [(['1'], []), (['2'], [])]
+    assert len(stub.requests) == 2
@@ -0,0 +1,71 @@
+# tests/test_playlist_registry.py
+import threading
+
+from services.playlist_registry import PlaylistRegistry
+
+
+def test_round_trip(tmp_path):
+    registry = PlaylistRegistry(tmp_path / 'registry.json')
+    registry.set('sp1', 101, 'Road Trip')
+    registry.set('sp2', 102, 'Focus')
+    registry.remove('sp2')
+
+    loaded = PlaylistRegistry(tmp_path / 'registry.json').load()
+    assert loaded.get_rating_key('sp1') == '101'
+    assert loaded.get_rating_key('sp2') is None
+    assert loaded.entries['sp1']['title'] == 'Road Trip'
+
+
+def test_concurrent_saves_keep_every_entry(tmp_path):
+    registry = PlaylistRegistry(tmp_path / 'registry.json')
+    errors = []
+
+    def writer(worker):
+        try:
+            for number in range(25):
+                registry.set(f'sp{worker}-{number}', worker * 100 + number, f'Playlist {worker}-{number}')
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    # The last save on disk holds every entry, not an older snapshot
+    loaded = PlaylistRegistry(tmp_path / 'registry.json').load()
+    assert len(loaded.entries) == 200
+    assert loaded.get_rating_key('sp7-24') == '724'
+    assert not (tmp_path / 'registry.tmp').exists()
+
+
+def test_unreadable_registry_loads_empty(tmp_path):
+    (tmp_path / 'registry.json').write_text('{"playlists": {', encoding='utf-8')
+    assert PlaylistRegistry(tmp_path / 'registry.json').load().entries == {}
+
+
+def test_high_water_mark(tmp_path):
+    registry = PlaylistRegistry(tmp_path / 'registry.json')
+    assert registry.get_high_water('liked-songs') == (None, None)
+    # Only playlists already written to Plex carry a mark
+    registry.set_high_water('liked-songs', '2024-05-01T10:00:00Z', ['a'])
+    assert registry.get_high_water('liked-songs') == (None, None)
+
+    registry.set('liked-songs', 900, 'Liked Songs')
+    registry.set_high_water('liked-songs', '2024-05-01T10:00:00Z', ['b', 'a', None])
+    loaded = PlaylistRegistry(tmp_path / 'registry.json').load()
+    assert loaded.get_high_water('liked-songs') == ('2024-05-01T10:00:00Z', {'a', 'b'})
+
+
+def test_high_water_mark_follows_plex_playlist(tmp_path):
+    registry = PlaylistRegistry(tmp_path / 'registry.json')
+    registry.set('liked-songs', 900, 'Liked Songs')
+    registry.set_high_water('liked-songs', '2024-05-01T10:00:00Z', ['a'])
+    # Rewriting the same Plex playlist keeps the mark
+    registry.set('liked-songs', 900, 'Liked Songs')
+    assert registry.get_high_water('liked-songs') == ('2024-05-01T10:00:00Z', {'a'})
+    # A new Plex playlist starts without one
+    registry.set('liked-songs', 901, 'Liked Songs')
+    assert registry.get_high_water('liked-songs') == (None, None)
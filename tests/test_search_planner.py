@@ -0,0 +1,71 @@
+# tests/test_search_planner.py
+import pytest
+
+from services.search_planner import SearchPlanner
+
+PRIORS = {
+    'artist_scoped': (150.0, 0.7),
+    'normalized_title': (120.0, 0.5),
+    'raw_title': (120.0, 0.2),
+    'base_title': (120.0, 0.15),
+    'title_index': (10.0, 0.01),
+}
+
+
+@pytest.fixture
+def planner(tmp_path):
+    return SearchPlanner(PRIORS, tmp_path / 'search_strategy_stats.json')
+
+
+def record(planner, name, attempts, hits, ms):
+    for i in range(attempts):
+        planner.record(name, i < hits, ms)
+
+
+def test_fresh_planner_keeps_the_default_order(planner):
+    assert planner.plan(list(PRIORS)) == list(PRIORS)
+
+
+def test_plan_orders_by_cost_per_match(planner):
+    # Cheap and usually successful, so it moves ahead of the artist search
+    record(planner, 'raw_title', 100, 90, 20.0)
+    assert planner.plan(list(PRIORS))[0] == 'raw_title'
+
+
+def test_plan_only_returns_available_strategies(planner):
+    available = [name for name in PRIORS if name != 'artist_scoped']
+    assert planner.plan(available) == available
+
+
+def test_low_yield_search_is_skipped_until_exploration(planner):
+    record(planner, 'base_title', 200, 0, 120.0)
+    plans = [planner.plan(list(PRIORS)) for _ in range(planner.EXPLORE_EVERY)]
+    assert all('base_title' not in plan for plan in plans[:-1])
+    assert 'base_title' in plans[-1]
+
+
+def test_search_is_not_skipped_before_enough_samples(planner):
+    record(planner, 'base_title', planner.MIN_SAMPLES - 1, 0, 120.0)
+    assert 'base_title' in planner.plan(list(PRIORS))
+
+
+def test_rare_but_cheap_rescues_are_kept(planner):
+    # 1 in 100 leftover tracks rescued at 2 ms each is 5 rescues per second spent
+    record(planner, 'raw_title', 500, 5, 2.0)
+    assert planner.rescues_per_second('raw_title') > planner.MIN_RESCUES_PER_SECOND
+    assert 'raw_title' in planner.plan(list(PRIORS))
+
+
+def test_final_fallback_is_never_skipped(planner):
+    # Only tracks every other strategy missed reach it, mostly tracks absent from Plex
+    record(planner, 'title_index', 1000, 0, 50.0)
+    for _ in range(planner.EXPLORE_EVERY):
+        assert planner.plan(list(PRIORS))[-1] == 'title_index'
+
+
+def test_stats_survive_a_restart(planner, tmp_path):
+    record(planner, 'raw_title', 10, 7, 30.0)
+    planner.save()
+    reloaded = SearchPlanner(PRIORS, tmp_path / 'search_strategy_stats.json')
+    assert reloaded.stats == planner.stats
+    assert reloaded.plan(list(PRIORS)) == planner.plan(list(PRIORS))
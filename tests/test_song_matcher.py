@@ -0,0 +1,177 @@
+# tests/test_song_matcher.py
+import random
+
+import pytest
+
+from utils.song_matcher import (CONFIDENT_MATCH_SCORE, DIRECT_MATCH_SCORE, SIMILARITY_MATCH_THRESHOLD, FilePathIndex,
+                                 LibraryTrack, MappedTrackIndex, TrackIndex, best_candidate, is_various_artists_match,
+                                 local_match, normalize_remix_title, normalize_string, title_similarity,
+                                 write_shared_index)
+
+WORDS = ('love night dance heart fire light gold river dream city summer shadow rain blue sky home road star '
+         'ocean echo wild silver storm glass paper ghost young electric midnight sun').split()
+ARTISTS = ('Aurora Lane', 'The Midnight Club', 'Kite Runner', 'Neon Harbor', 'Velvet Static', 'Iron Bloom',
+           'Luna Park', 'Pale Waves', 'Cold Spring', 'Echo Valley', 'Red Meridian', 'Blue Orchard')
+
+
+def random_title(rng):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).title()
+
+
+def typo(rng, text):
+    position = rng.randrange(len(text))
+    return text[:position] + text[position + 1:]
+
+
+@pytest.fixture(scope='module')
+def indexes(tmp_path_factory):
+    rng = random.Random(31)
+    index = TrackIndex()
+    # Keys out of insertion order, so ties must be broken by ratingKey like TrackIndex does
+    keys = rng.sample(range(1, 1000000), 500)
+    for key in keys:
+        title = random_title(rng)
+        if rng.random() < 0.3:
+            title += rng.choice((' (Live)', ' - Remastered 2011', ' - Radio Edit'))
+        index.add(LibraryTrack(ratingKey=key, title=title, grandparentTitle=rng.choice(ARTISTS),
+                               originalTitle=rng.choice((None, None, 'Guest Singer'))))
+    path = write_shared_index(index, tmp_path_factory.mktemp('index') / 'library_index.bin')
+    mapped = MappedTrackIndex(path)
+    yield index, mapped
+    mapped.close()
+
+
+def queries(count=300):
+    rng = random.Random(7)
+    for _ in range(count):
+        title = random_title(rng)
+        if rng.random() < 0.3:
+            title = typo(rng, title)
+        yield title, rng.choice(ARTISTS + ('Unknown Performer',))
+
+
+def test_mapped_index_ranks_like_track_index(indexes):
+    index, mapped = indexes
+    assert len(mapped) == len(index)
+    for title, artist in queries():
+        expected = [track.ratingKey for track in index.nearest(title, artist, k=100)]
+        assert [track.ratingKey for track in mapped.nearest(title, artist, k=100)] == expected
+        expected = [track.ratingKey for track in index.nearest(title, k=10)]
+        assert [track.ratingKey for track in mapped.nearest(title, k=10)] == expected
+
+
+def test_mapped_index_matches_like_track_index(indexes):
+    index, mapped = indexes
+    for title, artist in queries(100):
+        assert local_match(mapped, title, artist, 100, 0.6) == local_match(index, title, artist, 100, 0.6)
+
+
+def test_mapped_index_records_round_trip(indexes):
+    index, mapped = indexes
+    track = index.nearest('Midnight Sun', 'Luna Park', k=1)[0]
+    copy = mapped.nearest('Midnight Sun', 'Luna Park', k=1)[0]
+    assert (copy.ratingKey, copy.title, copy.grandparentTitle, copy.originalTitle) == \
+        (track.ratingKey, track.title, track.grandparentTitle, track.originalTitle)
+
+
+def reference_candidate(title, artists_string, tracks):
+    """best_candidate without bounds, ordering or early exit: every candidate is fully scored"""
+    artists = [artist.strip() for artist in artists_string.split(',')]
+    normalized_artists = [normalize_string(artist) for artist in artists]
+    search_title, remix_title = normalize_string(title), normalize_remix_title(title)
+    for track in tracks:
+        track_title, track_remix = normalize_string(track.title), normalize_remix_title(track.title)
+        direct_title = (title.lower() == track.title.lower() or search_title == track_title != '' or
+                        remix_title == track_remix != '')
+        if direct_title and track.grandparentTitle.lower() in [artist.lower() for artist in artists]:
+            return track, DIRECT_MATCH_SCORE
+    if not search_title:
+        return None, 0.0
+    best = None
+    for position, track in enumerate(tracks):
+        track_title, track_remix = normalize_string(track.title), normalize_remix_title(track.title)
+        track_artist = normalize_string(track.grandparentTitle)
+        title_score = max(title_similarity(track_title, search_title), title_similarity(track_remix, remix_title))
+        artist_score = max(title_similarity(track_artist, artist) for artist in normalized_artists)
+        title_contained = bool(track_title) and (search_title in track_title or track_title in search_title or
+                                                 remix_title in track_remix or track_remix in remix_title)
+        artist_contained = (any(artist in track_artist for artist in normalized_artists) or
+                            any(track_artist in artist for artist in normalized_artists) or
+                            is_various_artists_match(track, artists))
+        if ((title_score > SIMILARITY_MATCH_THRESHOLD or title_contained) and
+                (artist_score > SIMILARITY_MATCH_THRESHOLD or artist_contained)):
+            score = title_score + artist_score
+            if best is None or score > best[0]:
+                best = (score, track)
+    return (best[1], best[0]) if best else (None, 0.0)
+
+
+def variant(rng, title):
+    """A title as another catalog might spell it"""
+    choice = rng.randrange(8)
+    if choice == 0:
+        return title.upper()
+    if choice == 1:
+        return typo(rng, title)
+    if choice == 2:
+        return title + rng.choice((' - Remix', ' (Club Mix)', ' - Radio Edit', ' (Live)', ' - Remastered 2011'))
+    if choice == 3:
+        return title.replace(' ', '.', 1)
+    if choice == 4:
+        return ' '.join(title.split()[:-1]) or title
+    if choice == 5:
+        return rng.choice(('!!!', '...', '()'))
+    if choice == 6:
+        return random_title(rng)
+    return title
+
+
+def cascade_cases(count=3000):
+    rng = random.Random(46)
+    for case in range(count):
+        title = random_title(rng)
+        artists = rng.sample(ARTISTS, rng.randint(1, 3))
+        tracks = []
+        for position in range(rng.randint(1, 12)):
+            artist = rng.choice((artists[0], typo(rng, artists[0]), rng.choice(ARTISTS), 'Various Artists'))
+            tracks.append(LibraryTrack(ratingKey=case * 100 + position, title=variant(rng, title),
+                                       grandparentTitle=artist,
+                                       originalTitle=rng.choice((None, artists[-1], 'Guest Singer'))))
+        yield variant(rng, title), ', '.join(artists), tracks
+
+
+def test_best_candidate_agrees_with_unpruned_scorer():
+    for title, artists, tracks in cascade_cases():
+        match, score = best_candidate(title, artists, tracks)
+        expected_match, expected_score = reference_candidate(title, artists, tracks)
+        if expected_score >= CONFIDENT_MATCH_SCORE and expected_score != DIRECT_MATCH_SCORE:
+            # The cascade stops at the first confident candidate, which need not be the best one
+            assert score >= CONFIDENT_MATCH_SCORE
+            assert reference_candidate(title, artists, [match])[1] == score
+        else:
+            assert (match, score) == (expected_match, expected_score), (title, artists)
+
+
+def test_file_path_index_lookups():
+    index = FilePathIndex()
+    index.add(1, '/music/Neon Harbor/Night Drive/01 - Midnight Sun.flac')
+    index.add(2, 'D:\\Music\\Iron Bloom\\1-02. Glass River.mp3')
+    assert index.lookup('01 - Midnight Sun.flac') == 1
+    assert index.lookup('Midnight Sun.mp3') == 1
+    assert index.lookup('midnight sun') == 1
+    assert index.lookup('Glass River.m4a') == 2
+    assert index.lookup('Paper Ghost.mp3') is None
+
+
+def test_file_path_index_never_resolves_ambiguous_names():
+    index = FilePathIndex()
+    index.add(1, '/music/Neon Harbor/01 - Intro.mp3')
+    index.add(2, '/music/Iron Bloom/03 - Intro.flac')
+    index.add(1, '/music/Neon Harbor/01 - Intro.mp3')  # Re-adding a track is not a clash
+    assert index.lookup('Intro.mp3') is None
+    # The full basename is still unique
+    assert index.lookup('01 - Intro.mp3') == 1
+    index.remove(2)
+    assert index.lookup('Intro.mp3') == 1
+    index.remove(1)
+    assert index.lookup('Intro.mp3') is None and len(index) == 0
@@ -0,0 +1,119 @@
+# tests/test_spotify_service.py
+import pytest
+
+from services.response_cache import ResponseCache
+from services.spotify_service import SpotifyService, SpotifyTrack
+
+
+def test_track_from_api():
+    track = SpotifyTrack.from_api({
+        'id': 'abc', 'name': 'Midnight City', 'duration_ms': 243000, 'external_ids': {'isrc': 'FR0000000001'},
+        'artists': [{'name': 'M83'}, {'name': 'Guest'}], 'is_local': False, 'track_number': 2, 'disc_number': 1,
+        'album': {'id': 'alb', 'name': 'Hurry Up', 'total_tracks': 22}
+    })
+    assert (track.id, track.title, track.artists, track.duration_ms, track.isrc) == \
+        ('abc', 'Midnight City', 'M83, Guest', 243000, 'FR0000000001')
+    assert (track.album_id, track.album_name, track.album_total_tracks, track.track_number, track.disc_number) == \
+        ('alb', 'Hurry Up', 22, 2, 1)
+    assert track.url == 'https://open.spotify.com/track/abc'
+
+
+def test_local_track_from_api():
+    # Local files have no ID, album or ISRC, and may list nameless artists
+    track = SpotifyTrack.from_api({'id': None, 'name': None, 'artists': [{'name': None}, {'name': 'Band'}],
+                                   'is_local': True, 'album': None, 'external_ids': None, 'duration_ms': None})
+    assert (track.id, track.name, track.artists, track.duration_ms, track.isrc, track.is_local) == \
+        (None, '', 'Band', 0, None, True)
+    assert (track.album_id, track.album_name, track.album_total_tracks, track.disc_number) == (None, '', 0, 1)
+    assert track.url == 'N/A'
+
+
+def saved_item(number, added_at=None):
+    return {'added_at': added_at or f'2024-01-01T00:{number // 60:02d}:{number % 60:02d}Z',
+            'track': {'id': f't{number}', 'name': f'Song {number}', 'artists': [{'name': 'Artist'}]}}
+
+
+class SavedTracksClient:
+    """Saved tracks endpoint over a list kept newest first, changed by on_page after each request"""
+
+    def __init__(self, items, on_page=None):
+        self.items = items
+        self.on_page = on_page
+        self.requests = 0
+
+    def current_user_saved_tracks(self, limit, offset):
+        page = {'items': self.items[offset:offset + limit], 'total': len(self.items),
+                'next': 'more' if offset + limit < len(self.items) else None}
+        self.requests += 1
+        if self.on_page:
+            self.on_page(self)
+        return page
+
+
+def offline_service(client):
+    service = SpotifyService.__new__(SpotifyService)
+    service.client = client
+    service.response_cache = ResponseCache()
+    service._snapshots = {}
+    return service
+
+
+def streamed_ids(service, since=None, since_ids=None):
+    return [key for _, key, _ in service.iter_saved_tracks(since, since_ids)]
+
+
+def test_saved_tracks_stream_oldest_first():
+    items = [saved_item(number) for number in reversed(range(120))]
+    assert streamed_ids(offline_service(SavedTracksClient(items))) == [f't{number}' for number in range(120)]
+
+
+@pytest.mark.parametrize('change', ['like', 'unlike'])
+def test_saved_tracks_changed_while_streaming(change):
+    items = [saved_item(number) for number in reversed(range(200))]
+
+    def on_page(client):
+        if client.requests == 3:
+            if change == 'like':
+                client.items.insert(0, saved_item(500))
+            else:
+                client.items.remove(client.items[-1])
+
+    streamed = streamed_ids(offline_service(SavedTracksClient(items, on_page)))
+    # Every track present throughout is streamed exactly once, in order
+    expected = [f't{number}' for number in range(200)]
+    assert [key for key in streamed if key != 't500'] == [key for key in expected if key in streamed]
+    assert len(set(streamed)) == len(streamed)
+    assert set(expected[1:]) <= set(streamed)
+
+
+def test_saved_tracks_resume_inside_bulk_like():
+    # Bulk likes share one added_at, the mark records which of them were appended
+    bulk = [saved_item(number, '2024-02-01T00:00:00Z') for number in range(10)]
+    items = [saved_item(number, f'2024-03-01T00:00:{number - 100:02d}Z') for number in reversed(range(100, 105))]
+    items += bulk[::-1]
+    items += [saved_item(number) for number in reversed(range(10, 20))]
+    service = offline_service(SavedTracksClient(items))
+    streamed = streamed_ids(service, '2024-02-01T00:00:00Z', {'t0', 't1', 't2'})
+    assert streamed == [f't{number}' for number in range(3, 10)] + [f't{number}' for number in range(100, 105)]
+
+
+class PlaylistClient:
+    def __init__(self):
+        self.requests = 0
+
+    def playlist_items(self, playlist_id, fields, limit, additional_types):
+        self.requests += 1
+        return {'items': [{'track': {'id': 'p1', 'name': 'Song', 'artists': [{'name': 'Artist'}]}}, {'track': None}],
+                'next': None}
+
+
+def test_sync_uses_browsed_pages_once_without_keeping_them():
+    service = offline_service(PlaylistClient())
+    assert [track.id for track in service.iter_tracks('pl')] == ['p1']
+    assert [track.id for track in service.iter_tracks('pl')] == ['p1']
+    assert (service.client.requests, len(service.response_cache)) == (1, 1)
+    # The sync reads the page cached while browsing, then drops it and caches nothing itself
+    assert [track.id for track in service.iter_tracks('pl', keep_pages=False)] == ['p1']
+    assert (service.client.requests, len(service.response_cache)) == (1, 0)
+    assert [track.id for track in service.iter_tracks('pl', keep_pages=False)] == ['p1']
+    assert (service.client.requests, len(service.response_cache)) == (2, 0)
@@ -0,0 +1,70 @@
+# tests/test_sync_journal.py
+from services.sync_journal import SyncJournal
+
+
+def test_load_without_journal(tmp_path):
+    assert SyncJournal(tmp_path / 'journal.jsonl').load() is None
+
+
+def test_load_rebuilds_interrupted_run(tmp_path):
+    journal = SyncJournal(tmp_path / 'journal.jsonl')
+    journal.start('sync', ['a', 'b', 'c'])
+    journal.record_track('a', 0, 'sp1', 101)
+    journal.record_track('a', 1, 'sp2', None)
+    journal.record_matched('a')
+    journal.record_write('a', 900)
+    journal.record_completed('a')
+    journal.record_track('b', 0, 'sp3', 103)
+    journal.record_matched('b')
+
+    state = SyncJournal(tmp_path / 'journal.jsonl').load()
+    assert (state.mode, state.playlist_ids) == ('sync', ['a', 'b', 'c'])
+    assert state.completed == {'a'} and state.matched == {'a', 'b'}
+    assert state.writes == {'a': '900'}
+    # Results of completed playlists are not needed to resume
+    assert 'a' not in state.track_results
+    assert state.cached_result('b', 0, 'sp3') == (True, '103')
+    # The playlist changed at this position since, so the result does not apply
+    assert state.cached_result('b', 0, 'sp4') == (False, None)
+    assert state.cached_result('c', 0, 'sp5') == (False, None)
+
+
+def test_track_results_are_buffered_until_flushed(tmp_path):
+    journal = SyncJournal(tmp_path / 'journal.jsonl')
+    journal.start('sync', ['a'])
+    for position in range(SyncJournal.FLUSH_EVERY - 1):
+        journal.record_track('a', position, f'sp{position}', position)
+    assert journal.load().track_results == {}
+    journal.record_track('a', SyncJournal.FLUSH_EVERY - 1, 'last', None)
+    assert len(journal.load().track_results['a']) == SyncJournal.FLUSH_EVERY
+
+
+def test_resume_after_torn_line(tmp_path):
+    path = tmp_path / 'journal.jsonl'
+    journal = SyncJournal(path)
+    journal.start('sync', ['a'])
+    journal.record_track('a', 0, 'sp1', 101)
+    journal.flush()
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"event": "track", "playlist": "a", "po')  # Crash mid-write
+
+    resumed = SyncJournal(path)
+    resumed.start('sync', ['a'], resume=True)
+    resumed.record_track('a', 1, 'sp2', 102)
+    resumed.record_matched('a')
+
+    state = resumed.load()
+    assert state.track_results['a'] == {0: ('sp1', '101'), 1: ('sp2', '102')}
+    assert state.matched == {'a'}
+
+
+def test_finished_and_restarted_runs_are_not_resumed(tmp_path):
+    journal = SyncJournal(tmp_path / 'journal.jsonl')
+    journal.start('sync', ['a'])
+    journal.record_matched('a')
+    journal.finish()
+    assert journal.load() is None
+
+    journal.start('plan', ['b'])
+    state = journal.load()
+    assert (state.mode, state.playlist_ids, state.matched) == ('plan', ['b'], set())
@@ -0,0 +1,94 @@
+# tests/test_sync_plan.py
+import threading
+from types import SimpleNamespace
+
+from services.plex_service import PlexService
+from services.spotify_service import SpotifyTrack
+from services.sync_plan import MatchPlan, PlanStore
+
+
+def make_plan(keys, playlist_id='sp1', name='Road Trip'):
+    plan = MatchPlan(playlist_id, name)
+    for position, key in enumerate(keys):
+        plan.add_result(SpotifyTrack(id=f'track{position}', name=f'Song {position}', artists='Artist'), key)
+    return plan
+
+
+def offline_service(tmp_path, playlist, current_keys):
+    """PlexService reading the given playlist and keys instead of a server, recording its writes"""
+    service = PlexService.__new__(PlexService)
+    service.plan_store = PlanStore(tmp_path / 'plans')
+    service._write_slots = threading.BoundedSemaphore(1)
+    service.writes = []
+    service.find_existing_playlist = lambda name, spotify_playlist_id=None: playlist
+    service.get_playlist_keys = lambda rating_key: list(current_keys)
+
+    def write_playlist(name, rating_keys, spotify_playlist_id=None, current=None):
+        service.writes.append((rating_keys, current))
+        return 77
+    service._write_playlist = write_playlist
+    return service
+
+
+def test_results_keep_playlist_order():
+    plan = make_plan([11, None, 12])
+    assert plan.rating_keys == ['11', '12']
+    assert [entry['spotify_id'] for entry in plan.unmatched] == ['track1']
+
+
+def test_compute_diff():
+    plan = make_plan([1, 2, 3])
+    assert plan.compute_diff(None) == {'playlist_exists': False, 'add': ['1', '2', '3'], 'remove': [],
+                                       'unchanged': 0, 'reordered': False}
+    assert not plan.is_noop
+    assert plan.compute_diff(['1', '4', '2']) == {'playlist_exists': True, 'add': ['3'], 'remove': ['4'],
+                                                  'unchanged': 2, 'reordered': False}
+    assert plan.compute_diff(['3', '2', '1'])['reordered'] and not plan.is_noop
+    plan.compute_diff(['1', '2', '3'])
+    assert plan.is_noop
+
+
+def test_plan_store_round_trip_and_pending(tmp_path):
+    store = PlanStore(tmp_path / 'plans')
+    planned = make_plan([1, None], 'a')
+    planned.compute_diff(['1'])
+    applied = make_plan([2], 'b')
+    applied.status = MatchPlan.STATUS_APPLIED
+    failed = make_plan([3], 'c')
+    failed.status, failed.error = MatchPlan.STATUS_FAILED, 'timeout'
+    for plan in (planned, applied, failed):
+        store.save(plan)
+    (tmp_path / 'plans' / 'plan_d.json').write_text('{"spotify_playlist_id": ', encoding='utf-8')
+
+    loaded = store.load(store.path_for('a'))
+    assert loaded.to_dict() == planned.to_dict()
+    # Unreadable plans are skipped, applied ones are not pending
+    assert [(plan.spotify_playlist_id, plan.error) for plan in store.pending()] == [('a', None), ('c', 'timeout')]
+
+
+def test_diff_plan_reads_current_playlist(tmp_path):
+    playlist = SimpleNamespace(ratingKey=5, title='Road Trip')
+    plan = make_plan([1, 2])
+    assert offline_service(tmp_path, playlist, ['2', '9']).diff_plan(plan)['add'] == ['1']
+    assert offline_service(tmp_path, None, []).diff_plan(plan)['playlist_exists'] is False
+
+
+def test_apply_plan_rechecks_playlist_edited_since_planning(tmp_path):
+    playlist = SimpleNamespace(ratingKey=5, title='Road Trip')
+    plan = make_plan([1, 2])
+    plan.compute_diff(['1', '2'])
+    assert plan.is_noop
+    # A track was removed in Plex after the plan was made
+    service = offline_service(tmp_path, playlist, ['1'])
+    assert service.apply_plan(plan) == 77
+    assert service.writes == [(['1', '2'], (playlist, ['1']))]
+    assert plan.diff['add'] == ['2']
+    assert service.plan_store.load(service.plan_store.path_for('sp1')).status == MatchPlan.STATUS_APPLIED
+
+
+def test_apply_plan_skips_up_to_date_playlist(tmp_path):
+    playlist = SimpleNamespace(ratingKey=5, title='Road Trip')
+    plan = make_plan([1, 2])
+    service = offline_service(tmp_path, playlist, ['1', '2'])
+    assert service.apply_plan(plan) is None
+    assert service.writes == [] and plan.status == MatchPlan.STATUS_APPLIED
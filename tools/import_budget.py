@@ -0,0 +1,120 @@
+# tools/import_budget.py
+"""Measure start-up import cost with `python -X importtime` and enforce a budget.
+
+Each target module is imported in a fresh interpreter, several times, keeping the fastest
+run. The script fails when a target exceeds its budget or pulls in a module that must only
+load on first use.
+
+    python tools/import_budget.py
+    python tools/import_budget.py --repeat 5 --top 25 --report logs/import_time.txt
+    python tools/import_budget.py --budget ui.main_window=900
+"""
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Cumulative import time allowed per target, in milliseconds
+BUDGETS_MS = {
+    'main': 400,
+    'ui.main_window': 1500,
+    'services.spotify_service': 600,
+    'services.plex_service': 400,
+}
+# Modules that are loaded on first use and must not be imported by any target
+DEFERRED_MODULES = ('anthropic', 'plexapi', 'tenacity')
+
+
+def measure(module):
+    """Import module in a fresh interpreter, returning ({imported module: (self_us, cumulative_us)}, error)"""
+    code = f"import {module}" if module else "pass"
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=ROOT, capture_output=True, text=True, env=dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    )
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    error = None
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'import failed'
+    return timings, error
+
+
+def best_of(module, repeat):
+    """Fastest of repeat runs, which filters out disk cache and scheduling noise"""
+    best = None
+    for _ in range(repeat):
+        timings, error = measure(module)
+        if error:
+            return timings, error
+        total = timings.get(module, (0, 0))[1]
+        if best is None or total < best[0].get(module, (0, 0))[1]:
+            best = (timings, None)
+    return best
+
+
+def format_report(module, timings, top, startup):
+    lines = [f"{module}: {timings.get(module, (0, 0))[1] / 1000:.1f} ms cumulative",
+             f"  {'self ms':>9}{'cumul ms':>10}  module"]
+    heaviest = sorted(((name, timing) for name, timing in timings.items() if name not in startup),
+                      key=lambda item: -item[1][1])[:top]
+    for name, (self_us, cumulative_us) in heaviest:
+        lines.append(f"  {self_us / 1000:>9.1f}{cumulative_us / 1000:>10.1f}  {name}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('modules', nargs='*', help='modules to measure (default: every budgeted module)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per module, the fastest is kept')
+    parser.add_argument('--top', type=int, default=15, help='heaviest imports listed per module')
+    parser.add_argument('--budget', action='append', default=[], metavar='MODULE=MS',
+                        help='override or add a budget')
+    parser.add_argument('--report', help='also write the report to this file')
+    args = parser.parse_args()
+
+    budgets = dict(BUDGETS_MS)
+    for entry in args.budget:
+        module, ms = entry.split('=', 1)
+        budgets[module] = float(ms)
+
+    # Modules the interpreter loads before running any code are not charged to the targets
+    startup = set(measure(None)[0])
+    failures = []
+    sections = []
+    for module in args.modules or list(budgets):
+        timings, error = best_of(module, args.repeat)
+        if error:
+            sections.append(f"{module}: could not be imported ({error})")
+            failures.append(f"{module} failed to import")
+            continue
+        sections.append(format_report(module, timings, args.top, startup))
+        total_ms = timings.get(module, (0, 0))[1] / 1000
+        budget = budgets.get(module)
+        if budget is not None and total_ms > budget:
+            failures.append(f"{module} took {total_ms:.1f} ms, budget is {budget:.0f} ms")
+        eager = sorted({name.split('.')[0] for name in timings} & set(DEFERRED_MODULES))
+        if eager:
+            failures.append(f"{module} eagerly imports {', '.join(eager)}")
+
+    report = "\n\n".join(sections)
+    if failures:
+        report += "\n\nBudget exceeded:\n" + "\n".join(f"  - {failure}" for failure in failures)
+    else:
+        report += "\n\nAll imports within budget"
+    print(report)
+    if args.report:
+        Path(args.report).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.report).write_text(report + "\n", encoding='utf-8')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
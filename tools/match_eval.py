@@ -0,0 +1,384 @@
+# tools/match_eval.py
+"""Measure matcher accuracy and cost together over a labeled corpus.
+
+Each configuration runs find_track for every corpus case against an in-memory library that
+stands in for the Plex server, and is scored on precision and recall against the expected
+ratingKeys together with the searches it sent, its CPU time and per-track latency. Pages
+loaded for the library index are counted apart from the per-track searches.
+
+The default corpus is built from the playlists in backups/*.json plus a synthetic library of
+decoys, near misses and filler tracks; --save-corpus writes it out so it can be reviewed or hand-labeled
+and passed back with --corpus.
+
+    python tools/match_eval.py
+    python tools/match_eval.py --config strict:SIMILARITY_MATCH_THRESHOLD=0.85 \\
+        --config narrow:MAX_TRACKS_TO_SEARCH=50,SEARCH_PAGE_SIZE=50
+    python tools/match_eval.py --search-latency-ms 40 --report logs/match_eval.txt
+    python tools/match_eval.py --save-corpus cache/match_corpus.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from services.plex_service import PlexService  # noqa: E402
+from services.search_planner import SearchPlanner  # noqa: E402
+from utils import song_matcher  # noqa: E402
+from utils.song_matcher import LibraryTrack  # noqa: E402
+
+# Vocabulary of the synthetic filler library
+WORDS = ('love night dance heart fire light gold river dream city summer shadow rain blue sky home '
+         'road star ocean echo wild silver storm glass paper ghost young electric midnight sun').split()
+# Filler artists combine two word lists, so each has a catalog of a realistic size
+ARTISTS = tuple(f"{first} {second}" for first in
+                ('Copper', 'Hollow', 'Amber', 'Crimson', 'Quiet', 'Velvet', 'Northern', 'Marble', 'Neon', 'Iron',
+                 'Lunar', 'Golden', 'Static', 'Frozen', 'Pale', 'Broken', 'Distant', 'Cosmic', 'Scarlet', 'Hidden')
+                for second in
+                ('Foxes', 'Harbor', 'Tides', 'Machines', 'Orchard', 'Parade', 'Lanterns', 'Sisters', 'Engines',
+                 'Saints', 'Ravens', 'Arcade', 'Signals', 'Kites', 'Choir', 'Canyon', 'Rivals', 'Wolves', 'Atlas',
+                 'Season'))
+# Ways a Spotify title differs from the Plex title of the same recording
+TITLE_VARIANTS = (
+    lambda title: title,
+    lambda title: f"{title} - Remastered 2011",
+    lambda title: f"{title} - Radio Edit",
+    lambda title: title.upper(),
+    lambda title: re.sub(r"[^\w\s]", '', title),
+    lambda title: f"{title} (feat. Guest Singer)",
+)
+
+
+class SyntheticArtist:
+    def __init__(self, title, tracks):
+        self.title = title
+        self._tracks = tracks
+
+    def tracks(self):
+        return list(self._tracks)
+
+
+class SyntheticLibrary:
+    """Music section stand-in that answers searches from memory and counts them.
+
+    Searches return tracks whose title contains every word of the query, in library order,
+    which is close to how Plex answers title searches.
+    """
+
+    def __init__(self, tracks):
+        self.tracks = tracks
+        self.searches = 0
+        # Pages of the one-off library index load, counted apart from per-track searches
+        self.index_pages = 0
+        self._words = {}
+        for track in tracks:
+            for word in set(self.words(track.title)):
+                self._words.setdefault(word, []).append(track)
+        self._artists = {}
+        for track in tracks:
+            self._artists.setdefault(track.grandparentTitle, []).append(track)
+
+    @staticmethod
+    def words(text):
+        return re.findall(r'\w+', (text or '').lower())
+
+    def search(self, title=None, libtype='track', container_start=0, container_size=None, maxresults=None, **kwargs):
+        if title is None:
+            self.index_pages += 1
+            matches = self.tracks
+        else:
+            self.searches += 1
+            query = self.words(title)
+            if not query:
+                return []
+            candidates = min((self._words.get(word, []) for word in query), key=len)
+            matches = [track for track in candidates if set(query) <= set(self.words(track.title))]
+        size = container_size or maxresults or len(matches)
+        return matches[container_start:container_start + size]
+
+    def searchArtists(self, title, maxresults=10, **kwargs):
+        self.searches += 1
+        query = set(self.words(title))
+        return [SyntheticArtist(name, tracks) for name, tracks in self._artists.items()
+                if query and query <= set(self.words(name))][:maxresults]
+
+    def searchAlbums(self, title, maxresults=10, **kwargs):
+        self.searches += 1
+        return []
+
+
+class OfflinePlexService(PlexService):
+    """PlexService whose music library is a SyntheticLibrary instead of a server section"""
+
+    def __init__(self, library, planner_path):
+        self.library = library
+        super().__init__(base_url='http://offline.invalid', token='offline')
+        # Strategy statistics of real syncs must neither steer nor absorb the evaluation
+        self.search_planner = SearchPlanner(self.SEARCH_STRATEGY_PRIORS, planner_path)
+
+    def connect(self):
+        self.healthy = True
+        return True
+
+    def get_music_library(self):
+        return self.library
+
+
+def load_backup_tracks(directory):
+    """(title, artist) pairs of every track in the playlist backups"""
+    seen = {}
+    for path in sorted(Path(directory).glob('*.json')):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                backup = json.load(f)
+        except Exception as e:
+            print(f"Skipping backup {path}: {str(e)}")
+            continue
+        for track in backup.get('tracks', []):
+            artist = track.get('artist') or (track.get('artists') or '').split(',')[0].strip()
+            if track.get('title') and artist:
+                seen[(track['title'], artist)] = None
+    return list(seen)
+
+
+def similar_title(title, rng):
+    """Another title one word away from title"""
+    words = title.split()
+    position = rng.randrange(len(words))
+    words[position] = rng.choice([word for word in WORDS if word != words[position].lower()]).title()
+    return ' '.join(words)
+
+
+def artist_typo(artist, rng):
+    """artist with one letter dropped or two neighbouring letters swapped"""
+    position = rng.randrange(1, len(artist) - 1)
+    if rng.random() < 0.5:
+        return artist[:position] + artist[position + 1:]
+    return artist[:position - 1] + artist[position] + artist[position - 1] + artist[position + 1:]
+
+
+def build_corpus(seed_tracks, library_size, targets, negatives, near_misses, rng):
+    """Synthetic library around the seed tracks, and labeled cases: {library: [...], cases: [...]}
+
+    Besides plain title variants the cases include near misses that sit close to the matching
+    thresholds: a track next to another version of itself (remaster, edit), a track next to a
+    title one word away by the same artist, an absent title one word away from one in the
+    library, and an artist name with a typo.
+    """
+    library = []
+
+    def add(title, artist, original_title=None):
+        library.append({'ratingKey': 100000 + len(library), 'title': title, 'artist': artist,
+                        'original_title': original_title})
+        return library[-1]['ratingKey']
+
+    labeled = []
+    taken = {(title.lower(), artist) for title, artist in seed_tracks}
+    for title, artist in seed_tracks:
+        labeled.append((title, artist, add(title, artist)))
+        # Decoys: the same title by someone else, and another recording by the same artist
+        add(title, rng.choice(ARTISTS))
+        add(f"{title} (Live)", artist)
+    while len(library) < library_size:
+        title = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).title()
+        artist = rng.choice(ARTISTS)
+        # A duplicate (title, artist) would make its label ambiguous
+        if (title.lower(), artist) in taken:
+            continue
+        taken.add((title.lower(), artist))
+        key = add(title, artist)
+        if len(labeled) < len(seed_tracks) + targets and rng.random() < 0.2:
+            labeled.append((title, artist, key))
+
+    cases = []
+    # Near misses need a second word to change and a name long enough for a typo
+    eligible = [entry for entry in labeled if len(entry[0].split()) >= 2 and len(entry[1]) >= 4]
+    chosen = rng.sample(eligible, min(len(eligible), near_misses * 3))
+    for title, artist, key in chosen[0::3]:
+        # Both versions are in the library, each must find its own
+        version = rng.choice(TITLE_VARIANTS[1:3])(title)
+        cases.append({'title': title, 'artists': artist, 'expected': key})
+        cases.append({'title': version, 'artists': artist, 'expected': add(version, artist)})
+    for title, artist, key in chosen[1::3]:
+        neighbour, absent = similar_title(title, rng), similar_title(title, rng)
+        names = {(neighbour.lower(), artist), (absent.lower(), artist)}
+        # Two new titles, or the labels would be ambiguous
+        if len(names) < 2 or names & taken:
+            continue
+        taken |= names
+        cases.append({'title': title, 'artists': artist, 'expected': key})
+        cases.append({'title': neighbour, 'artists': artist, 'expected': add(neighbour, artist)})
+        cases.append({'title': absent, 'artists': artist, 'expected': None})
+    for title, artist, key in chosen[2::3]:
+        cases.append({'title': title, 'artists': artist_typo(artist, rng), 'expected': key})
+
+    near_miss_keys = {key for _, _, key in chosen}
+    for title, artist, key in labeled:
+        if key in near_miss_keys:
+            continue
+        make_variant = rng.choice(TITLE_VARIANTS)
+        variant = make_variant(title)
+        # Spotify lists featured artists alongside the main one
+        artists = f"{artist}, Guest Singer" if make_variant is TITLE_VARIANTS[-1] else artist
+        cases.append({'title': variant, 'artists': artists, 'expected': key})
+    for _ in range(negatives):
+        # Titles absent from the library, and known titles by an artist the library lacks
+        if rng.random() < 0.5:
+            title = ' '.join(rng.choice(WORDS) for _ in range(3)).title() + ' Interlude'
+        else:
+            title = rng.choice(labeled)[0]
+        cases.append({'title': title, 'artists': 'Unknown Performer', 'expected': None})
+    rng.shuffle(cases)
+    return {'library': library, 'cases': cases}
+
+
+def library_tracks(corpus):
+    return [LibraryTrack(ratingKey=entry['ratingKey'], title=entry['title'], grandparentTitle=entry['artist'],
+                         originalTitle=entry.get('original_title'), parentTitle=entry.get('album', ''))
+            for entry in corpus['library']]
+
+
+def parse_config(spec):
+    """'name:NAME=value,NAME=value' -> (name, {NAME: value})"""
+    name, _, assignments = spec.partition(':')
+    overrides = {}
+    for assignment in filter(None, assignments.split(',')):
+        key, value = assignment.split('=', 1)
+        try:
+            overrides[key.strip()] = json.loads(value)
+        except ValueError:
+            overrides[key.strip()] = value
+    return name, overrides
+
+
+@contextlib.contextmanager
+def applied(service, overrides):
+    """Apply overrides to song_matcher module constants or the service, restoring them afterwards"""
+    saved = {}
+    try:
+        for key, value in overrides.items():
+            if hasattr(song_matcher, key):
+                saved[key] = getattr(song_matcher, key)
+                setattr(song_matcher, key, value)
+            elif hasattr(service, key):
+                setattr(service, key, value)
+            else:
+                raise ValueError(f"Unknown setting '{key}'")
+        yield
+    finally:
+        for key, value in saved.items():
+            setattr(song_matcher, key, value)
+
+
+def evaluate(corpus, overrides, search_latency_ms, planner_path):
+    """Run one configuration over the corpus, returning its metrics"""
+    library = SyntheticLibrary(library_tracks(corpus))
+    service = OfflinePlexService(library, planner_path)
+    true_positives = false_positives = expected_matches = 0
+    latencies = []
+    cpu_start = time.process_time()
+    with applied(service, overrides):
+        for case in corpus['cases']:
+            searches_before = library.searches
+            start = time.process_time()
+            # find_track narrates every lookup, which would drown the report
+            with contextlib.redirect_stdout(io.StringIO()):
+                match = service.find_track(case['title'], case['artists'])
+            cpu_ms = (time.process_time() - start) * 1000
+            latencies.append(cpu_ms + (library.searches - searches_before) * search_latency_ms)
+
+            expected = case['expected']
+            expected_matches += expected is not None
+            if match is not None:
+                if expected is not None and int(match.ratingKey) == int(expected):
+                    true_positives += 1
+                else:
+                    false_positives += 1
+    cpu_seconds = time.process_time() - cpu_start
+
+    returned = true_positives + false_positives
+    latencies.sort()
+    return {
+        'precision': true_positives / returned if returned else 1.0,
+        'recall': true_positives / expected_matches if expected_matches else 1.0,
+        'false_positives': false_positives,
+        'searches_per_track': library.searches / len(corpus['cases']),
+        'index_pages': library.index_pages,
+        'cpu_seconds': cpu_seconds,
+        'p50_ms': statistics.median(latencies),
+        'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+    }
+
+
+def format_report(corpus, results, search_latency_ms):
+    lines = [f"{len(corpus['cases'])} cases over a {len(corpus['library'])} track library"
+             + (f", {search_latency_ms:g} ms modeled per search" if search_latency_ms else ''),
+             f"{'Config':<20}{'Precision':>10}{'Recall':>8}{'FP':>5}{'Searches':>10}{'Index pages':>13}"
+             f"{'CPU s':>8}{'p50 ms':>9}{'p99 ms':>9}"]
+    for name, metrics in results:
+        lines.append(f"{name[:19]:<20}{metrics['precision']:>10.3f}{metrics['recall']:>8.3f}"
+                     f"{metrics['false_positives']:>5}{metrics['searches_per_track']:>10.2f}"
+                     f"{metrics['index_pages']:>13}{metrics['cpu_seconds']:>8.2f}{metrics['p50_ms']:>9.1f}{metrics['p99_ms']:>9.1f}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--corpus', help='labeled corpus JSON to evaluate instead of generating one')
+    parser.add_argument('--save-corpus', help='write the evaluated corpus to this file')
+    parser.add_argument('--backups', default=str(ROOT / 'backups'), help='playlist backups seeding the corpus')
+    parser.add_argument('--library-size', type=int, default=5000, help='tracks in the generated library')
+    parser.add_argument('--targets', type=int, default=300, help='generated cases expected to match')
+    parser.add_argument('--negatives', type=int, default=100, help='generated cases expected not to match')
+    parser.add_argument('--near-misses', type=int, default=40,
+                        help='generated near-miss groups of each kind (versions, similar titles, artist typos)')
+    parser.add_argument('--seed', type=int, default=7, help='random seed of the generated corpus')
+    parser.add_argument('--config', action='append', default=[], metavar='NAME:SETTING=VALUE,...',
+                        help='configuration to compare with the defaults; settings are PlexService '
+                             'attributes or utils.song_matcher constants')
+    parser.add_argument('--search-latency-ms', type=float, default=0.0,
+                        help='latency added per search sent, to model a real server')
+    parser.add_argument('--report', help='also write the report to this file')
+    args = parser.parse_args()
+
+    # Only the local matcher is measured, Claude-assisted matching stays off
+    os.environ.pop('ANTHROPIC_API_KEY', None)
+
+    if args.corpus:
+        with open(args.corpus, 'r', encoding='utf-8') as f:
+            corpus = json.load(f)
+    else:
+        corpus = build_corpus(load_backup_tracks(args.backups), args.library_size, args.targets,
+                              args.negatives, args.near_misses, random.Random(args.seed))
+    if args.save_corpus:
+        Path(args.save_corpus).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.save_corpus, 'w', encoding='utf-8') as f:
+            json.dump(corpus, f, indent=2)
+
+    configs = [('default', {})] + [parse_config(spec) for spec in args.config]
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for i, (name, overrides) in enumerate(configs):
+            planner_path = Path(directory) / f'search_strategy_stats_{i}.json'
+            results.append((name, evaluate(corpus, overrides, args.search_latency_ms, planner_path)))
+
+    report = format_report(corpus, results, args.search_latency_ms)
+    print(report)
+    if args.report:
+        Path(args.report).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.report).write_text(report + "\n", encoding='utf-8')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
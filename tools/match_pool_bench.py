@@ -0,0 +1,126 @@
+# tools/match_pool_bench.py
+"""Measure how sync matching throughput scales with MATCH_PROCESSES.
+
+Each run matches the same Spotify tracks through PlexService.match_track_keys, the path a sync
+takes, against a synthetic library that answers searches after a modeled server latency. Most
+tracks are in the library under a variant title, the rest are absent and fall through to the
+network search strategies. Index loading and worker start-up are part of the timed sync, as
+they are for a real one; the speedup can only approach the process count on as many free cores.
+
+    python tools/match_pool_bench.py
+    python tools/match_pool_bench.py --processes 0,2,4,8 --library-size 50000 --tracks 5000
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from match_eval import ARTISTS, TITLE_VARIANTS, WORDS, OfflinePlexService, SyntheticLibrary  # noqa: E402
+from services.spotify_service import SpotifyTrack  # noqa: E402
+from utils.song_matcher import LibraryTrack  # noqa: E402
+
+
+class SlowLibrary(SyntheticLibrary):
+    """SyntheticLibrary whose searches and index pages take latency_ms, like requests to a server"""
+
+    def __init__(self, tracks, latency_ms):
+        super().__init__(tracks)
+        self.latency = latency_ms / 1000
+
+    def search(self, *args, **kwargs):
+        time.sleep(self.latency)
+        return super().search(*args, **kwargs)
+
+    def searchArtists(self, *args, **kwargs):
+        time.sleep(self.latency)
+        return super().searchArtists(*args, **kwargs)
+
+    def searchAlbums(self, *args, **kwargs):
+        time.sleep(self.latency)
+        return super().searchAlbums(*args, **kwargs)
+
+
+def build_library(size, rng):
+    tracks, seen = [], set()
+    while len(tracks) < size:
+        title = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).title()
+        artist = rng.choice(ARTISTS)
+        if (title.lower(), artist) in seen:
+            continue
+        seen.add((title.lower(), artist))
+        tracks.append(LibraryTrack(ratingKey=len(tracks) + 1, title=title, grandparentTitle=artist))
+    return tracks
+
+
+def build_tracks(library, count, absent_share, rng):
+    tracks = []
+    for i in range(count):
+        if rng.random() < absent_share:
+            title = ' '.join(rng.choice(WORDS) for _ in range(3)).title() + ' Interlude'
+            artists = rng.choice(ARTISTS)
+        else:
+            track = rng.choice(library)
+            title, artists = rng.choice(TITLE_VARIANTS[:-1])(track.title), track.grandparentTitle
+        tracks.append(SpotifyTrack(id=f"bench{i}", name=title, artists=artists))
+    return tracks
+
+
+def run_sync(library_tracks, tracks, processes, latency_ms, directory):
+    """Seconds one sync of tracks takes with the given number of matching processes"""
+    library = SlowLibrary(library_tracks, latency_ms)
+    service = OfflinePlexService(library, Path(directory) / f'search_strategy_stats_{processes}.json')
+    service.match_processes = processes
+    service.SHARED_INDEX_PATH = str(Path(directory) / f'library_index_{processes}.bin')
+    # find_track narrates every lookup, which would drown the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        service.begin_sync()
+        try:
+            for batch_start in range(0, len(tracks), service.MATCH_BATCH_SIZE):
+                service.match_track_keys(tracks[batch_start:batch_start + service.MATCH_BATCH_SIZE])
+        finally:
+            service.end_sync()
+        elapsed = time.perf_counter() - start
+    return elapsed, library.searches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--processes', default=None,
+                        help='comma separated MATCH_PROCESSES values (default 0 and 2 up to the CPU count)')
+    parser.add_argument('--library-size', type=int, default=20000)
+    parser.add_argument('--tracks', type=int, default=2000)
+    parser.add_argument('--absent-share', type=float, default=0.1, help='share of tracks missing from the library')
+    parser.add_argument('--search-latency-ms', type=float, default=20.0, help='modeled latency of each request')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    cpus = os.cpu_count() or 1
+    sizes = ([int(size) for size in args.processes.split(',')] if args.processes
+             else [0] + sorted({2, 4, cpus} & set(range(2, cpus + 1))))
+    rng = random.Random(args.seed)
+    library_tracks = build_library(args.library_size, rng)
+    tracks = build_tracks(library_tracks, args.tracks, args.absent_share, rng)
+
+    print(f"Syncing {args.tracks} tracks against a {args.library_size} track library on {cpus} CPUs, "
+          f"{args.search_latency_ms:g} ms per request")
+    print(f"{'Processes':>10}{'Seconds':>10}{'Tracks/s':>10}{'Searches':>10}{'Speedup':>10}")
+    baseline = None
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            elapsed, searches = run_sync(library_tracks, tracks, size, args.search_latency_ms, directory)
+            baseline = baseline or elapsed
+            print(f"{size:>10}{elapsed:>10.2f}{len(tracks) / elapsed:>10.0f}{searches:>10}{baseline / elapsed:>10.2f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,14 +1,20 @@
 # ui/main_window.py
 import os
 import sys
+import threading
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                             QHBoxLayout, QLabel, QPushButton, QListWidget, 
                             QProgressBar, QMessageBox, QListWidgetItem, QDialog,
-                            QFormLayout, QLineEdit, QDialogButtonBox, QMenu, QFrame)
+                            QFormLayout, QLineEdit, QDialogButtonBox, QMenu, QFrame,
+                            QCheckBox)
 from PyQt6.QtCore import Qt, QThread, pyqtSignal
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from services.plex_service import PlexService
 from services.spotify_service import SpotifyService
+from services.account_profiles import SyncPlaylist, load_account_profiles
+from services.sync_journal import SyncJournal
+from services.sync_plan import MatchPlan
+from utils.tracing import tracer
 from ui.config_dialog import ConfigDialog
 from ui.themes import ThemeManager
 
@@ -18,97 +24,417 @@ class PlaylistSyncWorker(QThread):
     finished = pyqtSignal()
     error = pyqtSignal(str)
 
-    def __init__(self, spotify_service, plex_service, playlists):
+    MODE_SYNC = 'sync'  # Match, save the plan and write it to Plex
+    MODE_PLAN = 'plan'  # Match and save the plan for review, without touching Plex playlists
+
+    def __init__(self, spotify_service, plex_service, playlists, mode=MODE_SYNC, resume_state=None, journal=None,
+                 stop_event=None):
         super().__init__()
         self.spotify_service = spotify_service
         self.plex_service = plex_service
         self.playlists = playlists
-        self.should_stop = False
+        self.mode = mode
+        # Checkpoints of an interrupted run to continue from, see SyncJournal
+        self.resume_state = resume_state
+        self.journal = journal or SyncJournal()
+        # Shared with the AccountSyncWorker that runs this worker, so one Stop reaches every account
+        self.stop_event = stop_event or threading.Event()
+
+    @property
+    def should_stop(self):
+        return self.stop_event.is_set()
 
     def run(self):
         try:
-            total_playlists = len(self.playlists)
+            tracer.begin_run()
+            self.plex_service.begin_sync()
+            # Track pages are cached per playlist snapshot, a stale catalog would keep outdated ones
+            self.spotify_service.refresh_snapshots()
+            self.sync_playlists()
+            self.status.emit("Sync completed")
+            self.finished.emit()
+
+        except Exception as e:
+            error_msg = f"Sync error: {str(e)}"
+            print(error_msg)
+            self.error.emit(error_msg)
+        finally:
+            self.journal.flush()
+            self.plex_service.end_sync()
+            tracer.end_run('sync')
+
+    def sync_playlists(self):
+        """Match and write every playlist of this worker, called by run or by AccountSyncWorker"""
+        self.journal.start(self.mode, [playlist.playlist_id for playlist in self.playlists],
+                           resume=self.resume_state is not None)
+        # Plex writes run in the background so matching of the next playlist can continue
+        write_executor = ThreadPoolExecutor(max_workers=self.plex_service.PLAYLIST_WRITE_CONCURRENCY)
+        pending_writes = []
             
-            for playlist_index, playlist in enumerate(self.playlists):
+        for playlist_index, playlist in enumerate(self.playlists):
+            if self.should_stop:
+                break
+
+            if self.resume_state and playlist.playlist_id in self.resume_state.completed:
+                print(f"Skipping completed playlist: {playlist.playlist_name}")
+                self.progress.emit(int(((playlist_index + 1) / len(self.playlists)) * 100))
+                continue
+
+            if self.resume_state and playlist.playlist_id in self.resume_state.matched:
+                # Matching finished before the interruption, only the saved plan is left to write
+                try:
+                    plan = self.plex_service.plan_store.load(
+                        self.plex_service.plan_store.path_for(playlist.playlist_id))
+                except Exception as e:
+                    # Match it again below, its track results are reused from the journal
+                    print(f"Saved plan of {playlist.playlist_name} is unavailable, "
+                          f"rebuilding it from the journal: {str(e)}")
+                else:
+                    print(f"Resuming from saved plan: {playlist.playlist_name}")
+                    if self.mode == self.MODE_SYNC and plan.matched:
+                        pending_writes.append(write_executor.submit(self.write_playlist, plan))
+                    else:
+                        self.journal.record_completed(playlist.playlist_id)
+                    continue
+
+            status_msg = f"Processing playlist: {playlist.playlist_name}"
+            self.status.emit(status_msg)
+            print(status_msg)
+
+            if playlist.playlist_id == self.spotify_service.LIKED_SONGS_ID and self.mode == self.MODE_SYNC:
+                # Too large to plan in memory, stream it into Plex chunk by chunk instead
+                self.sync_saved_tracks(playlist, playlist_index)
                 if self.should_stop:
                     break
+                self.journal.record_completed(playlist.playlist_id)
+                continue
+
+            # Stream compact track records from Spotify and match them in batches
+            self.total_tracks = max(playlist.track_total, 1)
+            self.playlist_index = playlist_index
+            self.tracks_done = 0
+            self.position = 0
+            batch = []
+            plan = MatchPlan(playlist.playlist_id, playlist.playlist_name)
+            # Batch only when matching processes can use it, single tracks keep stop responsive
+            batch_size = self.plex_service.MATCH_BATCH_SIZE if self.plex_service.match_processes > 1 else 1
+            writer = (self.plex_service.progressive_writer(playlist.playlist_name, playlist.playlist_id)
+                      if self.mode == self.MODE_SYNC else None)
+
+            for track in self.spotify_service.iter_tracks(playlist.playlist_id, keep_pages=False):
+                if self.should_stop:
+                    break
+                batch.append(track)
+                if len(batch) >= batch_size:
+                    self.match_batch(batch, plan, playlist.playlist_id, writer)
+                    batch = []
+            if batch and not self.should_stop:
+                self.match_batch(batch, plan, playlist.playlist_id, writer)
+
+            if self.should_stop:
+                break
 
-                status_msg = f"Processing playlist: {playlist.playlist_name}"
+            # Save the plan first so the matching work survives a failed write
+            self.plex_service.diff_plan(plan)
+            plan_path = self.plex_service.plan_store.save(plan)
+            print(f"Match plan saved: {plan_path} ({len(plan.matched)} matched, "
+                  f"{len(plan.unmatched)} unmatched, {len(plan.diff['add'])} to add, "
+                  f"{len(plan.diff['remove'])} to remove)")
+            self.journal.record_matched(playlist.playlist_id)
+
+            # Create/update playlist in Plex if we found any tracks
+            if plan.matched and self.mode == self.MODE_SYNC:
+                pending_writes.append(write_executor.submit(self.write_playlist, plan))
+            else:
+                self.journal.record_completed(playlist.playlist_id)
+
+        # Wait for the outstanding Plex writes before reporting completion
+        for future in pending_writes:
+            future.result()
+        write_executor.shutdown(wait=True)
+        if not self.should_stop:
+            self.journal.finish()
+
+    def match_batch(self, batch, plan, playlist_id, writer=None):
+        """Match a batch of Spotify tracks and add their Plex ratingKeys to the plan in playlist order,
+        passing the matches so far to a progressive writer when one is given"""
+        start = self.position
+        self.position += len(batch)
+        results = [None] * len(batch)
+
+        # Reuse results checkpointed by an interrupted run
+        to_match = []
+        for offset, track in enumerate(batch):
+            found, rating_key = (self.resume_state.cached_result(playlist_id, start + offset, track.id)
+                                 if self.resume_state else (False, None))
+            if found:
+                results[offset] = rating_key
+                self.on_track_matched(offset, track, rating_key)
+            else:
+                to_match.append(offset)
+
+        if to_match:
+            matched = self.plex_service.match_track_keys([batch[offset] for offset in to_match],
+                                                         on_match=self.on_track_matched)
+            for offset, rating_key in zip(to_match, matched):
+                results[offset] = rating_key
+                self.journal.record_track(playlist_id, start + offset, batch[offset].id, rating_key)
+
+        for track, rating_key in zip(batch, results):
+            plan.add_result(track, rating_key)
+        if writer and writer.update(plan.matched):
+            self.journal.record_write(playlist_id, writer.playlist_key)
+            self.status.emit(f"Playlist '{plan.playlist_name}' is playable in Plex while matching continues")
+
+    def sync_saved_tracks(self, playlist, playlist_index):
+        """Match Liked Songs oldest first and append them to Plex one chunk at a time.
+
+        Only tracks liked after the stored high-water mark are processed, which advances with
+        every appended chunk so an interrupted run continues where it stopped.
+        """
+        self.total_tracks = max(playlist.track_total, 1)
+        self.playlist_index = playlist_index
+        self.tracks_done = 0
+        playlist_key, (since, since_ids) = self.plex_service.begin_append_sync(playlist.playlist_name,
+                                                                                playlist.playlist_id)
+        chunk_size = self.plex_service.PLAYLIST_ADD_CHUNK_SIZE
+        chunk = []
+        # Bulk likes share one added_at, so the mark also keeps which tracks at it were appended
+        newest, newest_ids = since, set(since_ids or ())
+        log_file = None
+
+        for added_at, key, track in self.spotify_service.iter_saved_tracks(since, since_ids):
+            if self.should_stop:
+                break
+            chunk.append(track)
+            if added_at != newest:
+                newest, newest_ids = added_at, set()
+            newest_ids.add(key)
+            if len(chunk) >= chunk_size:
+                playlist_key, log_file = self.append_saved_chunk(playlist, playlist_key, chunk,
+                                                                 (newest, newest_ids), log_file)
+                chunk = []
+        # A chunk cut short by stop is dropped, the high-water mark still points before it
+        if chunk and not self.should_stop:
+            playlist_key, log_file = self.append_saved_chunk(playlist, playlist_key, chunk,
+                                                             (newest, newest_ids), log_file)
+
+    def append_saved_chunk(self, playlist, playlist_key, chunk, high_water, log_file):
+        """Match one chunk of saved tracks and append the matches, returning (playlist_key, log_file)"""
+        rating_keys = self.plex_service.match_track_keys(chunk, on_match=self.on_track_matched)
+        unmatched = [track for track, key in zip(chunk, rating_keys) if key is None]
+        if unmatched:
+            log_file = self.plex_service.log_unmatched_tracks(playlist.playlist_name, unmatched, log_file)
+        playlist_key = self.plex_service.append_to_playlist(
+            playlist.playlist_name, playlist_key, [key for key in rating_keys if key is not None],
+            playlist.playlist_id, high_water)
+        return playlist_key, log_file
+
+    def on_track_matched(self, position, track, rating_key):
+        status_msg = f"Searching for track: {track.name} - {track.artists}"
+        self.status.emit(status_msg)
+        if rating_key:
+            print(f"✓ Found match: {track.name} by {track.artists} (ratingKey {rating_key})")
+        else:
+            print(f"✗ No match found for: {track.name} - {track.artists}")
+
+        # Update progress
+        self.tracks_done += 1
+        track_fraction = min(self.tracks_done, self.total_tracks) / self.total_tracks
+        current_progress = int(((self.playlist_index + track_fraction) / len(self.playlists)) * 100)
+        self.progress.emit(current_progress)
+
+    def write_playlist(self, plan):
+        track_count = len(plan.matched)
+        status_msg = f"Creating playlist in Plex: {plan.playlist_name} with {track_count} tracks"
+        self.status.emit(status_msg)
+        print(status_msg)
+        
+        try:
+            playlist_key = self.plex_service.apply_plan(plan)
+            if playlist_key:
+                print(f"✓ Successfully created playlist: {plan.playlist_name}")
+                print(f"Playlist ID: {playlist_key}")
+                print(f"Track count: {track_count}")
+                self.journal.record_write(plan.spotify_playlist_id, playlist_key)
+            elif plan.is_noop:
+                print(f"✓ Playlist already up to date: {plan.playlist_name}")
+            else:
+                print(f"⚠ Playlist creation returned None for: {plan.playlist_name}")
+            self.journal.record_completed(plan.spotify_playlist_id)
+        except Exception as e:
+            print(f"✗ Failed to create playlist: {str(e)}")
+            print(f"Tracks found: {track_count}")
+            print(f"The match plan was kept, use 'Apply Plans' or 'Resume' to retry without re-matching")
+
+    def stop(self):
+        self.stop_event.set()
+        self.status.emit("Stopping sync...")
+        print("Sync stop requested")
+
+class PlanApplyWorker(QThread):
+    progress = pyqtSignal(int)
+    status = pyqtSignal(str)
+    finished = pyqtSignal()
+    error = pyqtSignal(str)
+
+    def __init__(self, plex_service, plans):
+        super().__init__()
+        self.plex_service = plex_service
+        self.plans = plans
+        self.should_stop = False
+
+    def run(self):
+        try:
+            tracer.begin_run()
+            self.plex_service.begin_sync()
+            failed = []
+            for plan_index, plan in enumerate(self.plans):
+                if self.should_stop:
+                    break
+                status_msg = f"Applying plan: {plan.playlist_name} ({len(plan.matched)} tracks)"
                 self.status.emit(status_msg)
                 print(status_msg)
+                try:
+                    self.plex_service.apply_plan(plan)
+                except Exception as e:
+                    failed.append(plan.playlist_name)
+                self.progress.emit(int(((plan_index + 1) / len(self.plans)) * 100))
 
-                # Get tracks from Spotify
-                spotify_tracks = self.spotify_service.get_playlist_tracks(playlist.playlist_id)
-                total_tracks = len(spotify_tracks['items'])
-                found_tracks = []
+            if failed:
+                self.error.emit(f"Failed to apply {len(failed)} plan(s): {', '.join(failed)}")
+            else:
+                self.status.emit("Plans applied")
+                self.finished.emit()
+        except Exception as e:
+            error_msg = f"Apply error: {str(e)}"
+            print(error_msg)
+            self.error.emit(error_msg)
+        finally:
+            self.plex_service.end_sync()
+            tracer.end_run('apply')
 
-                # Process each track
-                for track_index, track_item in enumerate(spotify_tracks['items']):
-                    if self.should_stop:
-                        break
+    def stop(self):
+        self.should_stop = True
 
-                    track = track_item['track']
-                    if not track:  # Skip unavailable tracks
-                        continue
+class AccountSyncWorker(QThread):
+    """Syncs several account profiles at once, sharing one PlexService for matching"""
+    progress = pyqtSignal(int)
+    status = pyqtSignal(str)
+    finished = pyqtSignal()
+    error = pyqtSignal(str)
 
-                    track_name = track['name']
-                    artists = ", ".join([artist['name'] for artist in track['artists']])
-                    
-                    status_msg = f"Searching for track: {track_name} - {artists}"
-                    self.status.emit(status_msg)
-                    print(status_msg)
-
-                    # Search for track in Plex
-                    plex_track = self.plex_service.find_track(track_name, artists)
-                    if plex_track:
-                        print(f"✓ Found match: {plex_track.title} by {plex_track.originalTitle}")
-                        found_tracks.append(plex_track)
-                    else:
-                        print(f"✗ No match found for: {track_name} - {artists}")
-
-                    # Update progress
-                    current_progress = int(((playlist_index * total_tracks + track_index + 1) / 
-                                         (total_playlists * total_tracks)) * 100)
-                    self.progress.emit(current_progress)
-
-                # Create/update playlist in Plex if we found any tracks
-                if found_tracks:
-                    status_msg = f"Creating playlist in Plex: {playlist.playlist_name} with {len(found_tracks)} tracks"
-                    self.status.emit(status_msg)
-                    print(status_msg)
-                    print(f"First few tracks to be added: {[t.title for t in found_tracks[:3]]}")
-                    
+    def __init__(self, plex_service, profiles):
+        super().__init__()
+        self.plex_service = plex_service
+        self.profiles = profiles
+        self.account_workers = []
+        self.account_progress = {}
+        self.stop_event = threading.Event()
+
+    @property
+    def should_stop(self):
+        return self.stop_event.is_set()
+
+    def run(self):
+        try:
+            tracer.begin_run()
+            self.plex_service.begin_sync()
+            # Authorize accounts one at a time, OAuth logins share the local callback port
+            accounts = []
+            for profile in self.profiles:
+                self.status.emit(f"Connecting account: {profile.name}")
+                spotify_service = SpotifyService(cache_path=profile.spotify_cache_path, show_dialog=True)
+                if not spotify_service.client:
+                    raise Exception(f"Failed to initialize Spotify for account '{profile.name}'")
+                accounts.append((profile, spotify_service, self.plex_service.for_user(profile)))
+
+            failed = []
+            with ThreadPoolExecutor(max_workers=len(accounts)) as executor:
+                futures = {executor.submit(self.sync_account, *account): account[0] for account in accounts}
+                for future, profile in futures.items():
                     try:
-                        created_playlist = self.plex_service.create_playlist(playlist.playlist_name, found_tracks)
-                        if created_playlist:
-                            print(f"✓ Successfully created playlist: {playlist.playlist_name}")
-                            print(f"Playlist ID: {created_playlist.ratingKey}")
-                            print(f"Track count: {len(created_playlist.items())}")
-                        else:
-                            print(f"⚠ Playlist creation returned None for: {playlist.playlist_name}")
+                        future.result()
                     except Exception as e:
-                        print(f"✗ Failed to create playlist: {str(e)}")
-                        print(f"Tracks found: {len(found_tracks)}")
-                        print(f"Track details: {[(t.title, t.grandparentTitle) for t in found_tracks[:3]]}")
-
-            self.status.emit("Sync completed")
-            self.finished.emit()
+                        print(f"Account '{profile.name}' failed: {str(e)}")
+                        failed.append(profile.name)
 
+            if failed:
+                self.error.emit(f"Sync failed for {len(failed)} account(s): {', '.join(failed)}")
+            else:
+                self.status.emit("All accounts synced")
+                self.finished.emit()
         except Exception as e:
-            error_msg = f"Sync error: {str(e)}"
+            error_msg = f"Account sync error: {str(e)}"
             print(error_msg)
             self.error.emit(error_msg)
+        finally:
+            for worker in self.account_workers:
+                worker.journal.flush()
+            self.plex_service.end_sync()
+            tracer.end_run('accounts')
+
+    def sync_account(self, profile, spotify_service, plex_service):
+        """Run one account's playlists through a PlaylistSyncWorker on this pool thread"""
+        if profile.playlists is None:
+            playlists = [SyncPlaylist.from_api(playlist)
+                         for playlist in spotify_service.get_all_available_playlists(refresh=True)['items']]
+        else:
+            playlists = [SyncPlaylist.from_api(playlist)
+                         for playlist in spotify_service.get_all_available_playlists(refresh=True)['items']
+                         if playlist['id'] in profile.playlists]
+        print(f"Account '{profile.name}': syncing {len(playlists)} playlists")
+        if not playlists:
+            return
+
+        worker = PlaylistSyncWorker(spotify_service, plex_service, playlists,
+                                    journal=SyncJournal(profile.journal_path), stop_event=self.stop_event)
+        worker.status.connect(lambda message: self.status.emit(f"[{profile.name}] {message}"))
+        worker.progress.connect(lambda value: self.on_account_progress(profile.name, value))
+        self.account_workers.append(worker)
+        worker.sync_playlists()
+
+    def on_account_progress(self, name, value):
+        self.account_progress[name] = value
+        self.progress.emit(int(sum(self.account_progress.values()) / len(self.profiles)))
 
     def stop(self):
-        self.should_stop = True
+        # Workers share the event, including those of accounts that have not started yet
+        self.stop_event.set()
         self.status.emit("Stopping sync...")
-        print("Sync stop requested")
+
+class SpeculativeMatchWorker(QThread):
+    """Pre-matches the tracks of the browsed playlist into the match cache at low priority"""
+    track_matched = pyqtSignal(str, int, bool)
+
+    def __init__(self, plex_service, playlist_id, tracks):
+        super().__init__()
+        self.plex_service = plex_service
+        self.playlist_id = playlist_id
+        self.tracks = tracks
+        self.should_stop = False
+
+    def run(self):
+        try:
+            with self.plex_service.connection_in_use():
+                for position, track in enumerate(self.tracks):
+                    if self.should_stop:
+                        return
+                    rating_key = self.plex_service.match_track_keys([track])[0]
+                    self.track_matched.emit(self.playlist_id, position, rating_key is not None)
+            print(f"Speculative matching finished for playlist {self.playlist_id}")
+        except Exception as e:
+            print(f"Speculative matching error: {str(e)}")
+
+    def stop(self):
+        self.should_stop = True
 
 class PlaylistItem(QListWidgetItem):
     def __init__(self, playlist):
         super().__init__()
         self.playlist_id = playlist['id']
         self.playlist_name = playlist['name']
+        self.track_total = (playlist.get('tracks') or {}).get('total', 0)
         
         # Identify if this is a "Made For You" playlist
         made_for_you_names = [
@@ -121,8 +447,12 @@ class PlaylistItem(QListWidgetItem):
         ]
         is_made_for_you = any(name in playlist['name'] for name in made_for_you_names)
         
+        is_liked_songs = self.playlist_id == SpotifyService.LIKED_SONGS_ID
+
         # Add an icon/prefix for Made For You playlists
-        if is_made_for_you:
+        if is_liked_songs:
+            display_text = f"❤ {self.playlist_name}"
+        elif is_made_for_you:
             display_text = f"✨ {self.playlist_name}"  # Star emoji to indicate special playlist
         else:
             display_text = self.playlist_name
@@ -132,7 +462,9 @@ class PlaylistItem(QListWidgetItem):
         self.setCheckState(Qt.CheckState.Unchecked)
         
         # Set tooltip with additional information for Made For You playlists
-        if is_made_for_you:
+        if is_liked_songs:
+            self.setToolTip("Your saved tracks, synced incrementally: only newly liked tracks are added")
+        elif is_made_for_you:
             self.setToolTip(f"Made For You: {self.playlist_name}")
             # Optional: You could use a different background color too
             # self.setBackground(QColor(230, 230, 250))  # Light purple background
@@ -142,10 +474,18 @@ class MainWindow(QMainWindow):
         super().__init__()
         self.current_theme = "dark"  # Default to dark theme
         self.spotify_service = None
+        self.selected_playlist_id = None
+        self.sync_mode = PlaylistSyncWorker.MODE_SYNC
+        self.plex_service = None
+        self.worker = None
+        self.speculative_worker = None
+        self.retired_workers = []
+        self.browsed_tracks = []
         self.init_spotify()
         self.init_ui()
         self.setStyleSheet(ThemeManager.DARK_THEME)
         self.load_playlists()
+        self.update_resume_button()
         self.theme_button.setText("☀️")
 
     def init_spotify(self):
@@ -330,6 +670,32 @@ class MainWindow(QMainWindow):
         self.sync_all_button.clicked.connect(self.sync_all)
         self.sync_all_button.setStyleSheet(button_common_style)
         
+        self.plan_selected_button = QPushButton("Plan Selected")
+        self.plan_selected_button.setToolTip("Match the checked playlists and save the plans without writing to Plex")
+        self.plan_selected_button.clicked.connect(self.plan_selected)
+        self.plan_selected_button.setStyleSheet(button_common_style)
+        
+        self.apply_plans_button = QPushButton("Apply Plans")
+        self.apply_plans_button.setToolTip("Write saved plans that were not applied yet to Plex")
+        self.apply_plans_button.clicked.connect(self.apply_plans)
+        self.apply_plans_button.setStyleSheet(button_common_style)
+        
+        self.resume_button = QPushButton("Resume")
+        self.resume_button.setToolTip("Continue the last interrupted sync from its checkpoint")
+        self.resume_button.clicked.connect(self.resume_sync)
+        self.resume_button.setStyleSheet(button_common_style)
+        
+        self.sync_accounts_button = QPushButton("Sync Accounts")
+        self.sync_accounts_button.setToolTip("Sync every account profile from the accounts file into its Plex user")
+        self.sync_accounts_button.clicked.connect(self.sync_accounts)
+        self.sync_accounts_button.setStyleSheet(button_common_style)
+        self.sync_accounts_button.setVisible(bool(load_account_profiles()))
+        
+        self.prematch_checkbox = QCheckBox("Pre-match")
+        self.prematch_checkbox.setToolTip("Match the browsed playlist against Plex in the background")
+        self.prematch_checkbox.setChecked(os.getenv('SPECULATIVE_MATCHING') == '1')
+        self.prematch_checkbox.toggled.connect(self.on_prematch_toggled)
+        
         self.refresh_button = QPushButton("🔄")
         self.refresh_button.setFixedSize(30, 30)
         self.refresh_button.clicked.connect(self.load_playlists)
@@ -337,7 +703,12 @@ class MainWindow(QMainWindow):
 
         button_layout.addWidget(self.sync_selected_button)
         button_layout.addWidget(self.sync_all_button)
+        button_layout.addWidget(self.plan_selected_button)
+        button_layout.addWidget(self.apply_plans_button)
+        button_layout.addWidget(self.resume_button)
+        button_layout.addWidget(self.sync_accounts_button)
         button_layout.addStretch()
+        button_layout.addWidget(self.prematch_checkbox)
         button_layout.addWidget(self.refresh_button)
         layout.addLayout(button_layout)
     
@@ -353,8 +724,9 @@ class MainWindow(QMainWindow):
             self.playlist_list.clear()
             print("Fetching playlists...")  # Debug print
             
-            # Use the new method to get all available playlists including Made For You
-            playlists = self.spotify_service.get_all_available_playlists()
+            # Use the new method to get all available playlists including Made For You, always
+            # re-read so a reload shows playlists created or changed since the catalog was cached
+            playlists = self.spotify_service.get_all_available_playlists(refresh=True)
             
             print(f"Found {len(playlists['items'])} playlists")  # Debug print
             
@@ -374,7 +746,10 @@ class MainWindow(QMainWindow):
             
             # Sort playlists into categories
             for playlist in playlists['items']:
-                if any(name in playlist['name'] for name in made_for_you_names):
+                if playlist['id'] == self.spotify_service.LIKED_SONGS_ID:
+                    # Liked Songs goes above everything else
+                    self.playlist_list.addItem(PlaylistItem(playlist))
+                elif any(name in playlist['name'] for name in made_for_you_names):
                     made_for_you_playlists.append(playlist)
                 else:
                     regular_playlists.append(playlist)
@@ -396,19 +771,109 @@ class MainWindow(QMainWindow):
             print(f"Error loading playlists: {str(e)}")  # Debug print
             QMessageBox.critical(self, "Error", f"Failed to load playlists: {str(e)}")
 
-    def sync_selected(self):
+    def checked_playlists(self):
         selected_playlists = []
         for i in range(self.playlist_list.count()):
             item = self.playlist_list.item(i)
             if item.checkState() == Qt.CheckState.Checked:
                 selected_playlists.append(item)  # Pass the entire PlaylistItem object
-        
+        return selected_playlists
+
+    def sync_selected(self):
+        selected_playlists = self.checked_playlists()
         if not selected_playlists:
             QMessageBox.warning(self, "Warning", "No playlists selected!")
             return
         
         self.start_sync(selected_playlists)
 
+    def plan_selected(self):
+        selected_playlists = self.checked_playlists()
+        if not selected_playlists:
+            QMessageBox.warning(self, "Warning", "No playlists selected!")
+            return
+        
+        self.start_sync(selected_playlists, mode=PlaylistSyncWorker.MODE_PLAN)
+
+    def apply_plans(self):
+        try:
+            self.set_sync_buttons_enabled(False)
+            self.stop_speculative_matching()
+            plans = self.get_plex_service().plan_store.pending()
+            if not plans:
+                self.set_sync_buttons_enabled(True)
+                QMessageBox.information(self, "Apply Plans", "There are no pending plans to apply.")
+                return
+            
+            self.progress_bar.show()
+            self.sync_mode = 'apply'
+            self.worker = PlanApplyWorker(plex_service=self.get_plex_service(), plans=plans)
+            self.worker.progress.connect(self.progress_bar.setValue)
+            self.worker.status.connect(self.update_status)
+            self.worker.finished.connect(self.sync_finished)
+            self.worker.error.connect(self.sync_error)
+            self.worker.start()
+            
+        except Exception as e:
+            self.sync_error(str(e))
+
+    def sync_accounts(self):
+        """Sync all account profiles concurrently into their Plex users"""
+        try:
+            profiles = load_account_profiles()
+            if not profiles:
+                QMessageBox.information(self, "Sync Accounts", "No account profiles were found in the accounts file.")
+                return
+
+            self.progress_bar.show()
+            self.set_sync_buttons_enabled(False)
+            self.sync_mode = 'accounts'
+            self.stop_speculative_matching()
+            self.worker = AccountSyncWorker(plex_service=self.get_plex_service(), profiles=profiles)
+            self.worker.progress.connect(self.progress_bar.setValue)
+            self.worker.status.connect(self.update_status)
+            self.worker.finished.connect(self.sync_finished)
+            self.worker.error.connect(self.sync_error)
+            self.worker.start()
+
+        except Exception as e:
+            self.sync_error(str(e))
+
+    def resume_sync(self):
+        resume_state = SyncJournal().load()
+        if not resume_state:
+            QMessageBox.information(self, "Resume", "There is no interrupted sync to resume.")
+            self.update_resume_button()
+            return
+        
+        items_by_id = {}
+        for i in range(self.playlist_list.count()):
+            item = self.playlist_list.item(i)
+            items_by_id[item.playlist_id] = item
+        playlists = [items_by_id[playlist_id] for playlist_id in resume_state.playlist_ids
+                     if playlist_id in items_by_id]
+        missing = len(resume_state.playlist_ids) - len(playlists)
+        if missing:
+            print(f"{missing} playlists of the interrupted sync are no longer available")
+        if not playlists:
+            QMessageBox.warning(self, "Warning", "None of the interrupted playlists are available anymore.")
+            return
+        
+        print(f"Resuming sync: {len(resume_state.completed)} of {len(resume_state.playlist_ids)} playlists already done")
+        self.start_sync(playlists, mode=resume_state.mode or PlaylistSyncWorker.MODE_SYNC, resume_state=resume_state)
+
+    def update_resume_button(self):
+        self.resume_button.setEnabled(SyncJournal().load() is not None)
+
+    def set_sync_buttons_enabled(self, enabled):
+        for button in (self.sync_selected_button, self.sync_all_button, self.plan_selected_button,
+                       self.apply_plans_button, self.sync_accounts_button):
+            button.setEnabled(enabled)
+        if enabled:
+            self.update_resume_button()
+        else:
+            self.resume_button.setEnabled(False)
+
     def sync_all(self):
         playlists = []
         for i in range(self.playlist_list.count()):
@@ -417,20 +882,23 @@ class MainWindow(QMainWindow):
         
         self.start_sync(playlists)
 
-    def start_sync(self, playlist_items):
+    def start_sync(self, playlist_items, mode=PlaylistSyncWorker.MODE_SYNC, resume_state=None):
         try:
             self.progress_bar.show()
-            self.sync_selected_button.setEnabled(False)
-            self.sync_all_button.setEnabled(False)
+            self.set_sync_buttons_enabled(False)
+            self.sync_mode = mode
             
-            # Initialize Plex service
-            self.plex_service = PlexService()
+            # Matching for the sync takes precedence over speculation
+            self.stop_speculative_matching()
+            plex_service = self.get_plex_service()
             
             # Create and start worker
             self.worker = PlaylistSyncWorker(
                 spotify_service=self.spotify_service,
-                plex_service=self.plex_service,
-                playlists=playlist_items
+                plex_service=plex_service,
+                playlists=playlist_items,
+                mode=mode,
+                resume_state=resume_state
             )
             self.worker.progress.connect(self.progress_bar.setValue)
             self.worker.status.connect(self.update_status)
@@ -441,21 +909,92 @@ class MainWindow(QMainWindow):
         except Exception as e:
             self.sync_error(str(e))
 
+    def get_plex_service(self):
+        """Reuse one PlexService so its caches survive between syncs and speculative matching"""
+        if self.plex_service is None:
+            # Imported here so the window opens without loading the Plex stack
+            from services.plex_service import PlexService
+            self.plex_service = PlexService()
+            self.plex_service.start_health_check()
+            if os.getenv('PLEX_LIBRARY_WATCH') == '1':
+                self.plex_service.start_library_watch(os.getenv('PLEX_NOTIFICATIONS_URL'))
+        return self.plex_service
+
+    def on_prematch_toggled(self, checked):
+        if checked:
+            self.start_speculative_matching()
+        else:
+            self.stop_speculative_matching()
+
+    def start_speculative_matching(self):
+        self.stop_speculative_matching()
+        if not self.prematch_checkbox.isChecked() or not self.browsed_tracks:
+            return
+        if self.worker is not None and self.worker.isRunning():
+            return  # A sync is running, it will match these tracks itself
+        try:
+            plex_service = self.get_plex_service()
+        except Exception as e:
+            print(f"Speculative matching unavailable: {str(e)}")
+            return
+        self.speculative_worker = SpeculativeMatchWorker(plex_service, self.selected_playlist_id,
+                                                         list(self.browsed_tracks))
+        self.speculative_worker.track_matched.connect(self.on_speculative_match)
+        self.speculative_worker.start(QThread.Priority.LowestPriority)
+
+    def stop_speculative_matching(self):
+        if self.speculative_worker is not None:
+            # Stopping is cooperative, the worker exits after its current track
+            worker = self.speculative_worker
+            worker.stop()
+            worker.track_matched.disconnect(self.on_speculative_match)
+            # Keep a reference until the thread has actually exited
+            self.retired_workers.append(worker)
+            worker.finished.connect(lambda: self.retired_workers.remove(worker))
+            self.speculative_worker = None
+
+    def on_speculative_match(self, playlist_id, position, matched):
+        if playlist_id != self.selected_playlist_id or position >= self.track_list.count():
+            return
+        list_item = self.track_list.item(position)
+        marker = "✓" if matched else "✗"
+        list_item.setText(f"{marker} {list_item.text()}")
+        list_item.setToolTip(f"{list_item.toolTip()}\n{'Matched in Plex' if matched else 'No Plex match'}")
+
     def update_status(self, message):
         self.statusBar().showMessage(message)
 
     def sync_finished(self):
         self.progress_bar.hide()
-        self.sync_selected_button.setEnabled(True)
-        self.sync_all_button.setEnabled(True)
-        QMessageBox.information(self, "Success", "Playlist sync completed!")
+        self.set_sync_buttons_enabled(True)
+        messages = {
+            PlaylistSyncWorker.MODE_PLAN: "Match plans saved to the plans folder.",
+            'apply': "Saved plans applied to Plex!",
+            'accounts': "All accounts synced to Plex!"
+        }
+        QMessageBox.information(self, "Success", messages.get(self.sync_mode, "Playlist sync completed!"))
 
     def sync_error(self, error_message):
         self.progress_bar.hide()
-        self.sync_selected_button.setEnabled(True)
-        self.sync_all_button.setEnabled(True)
+        self.set_sync_buttons_enabled(True)
         QMessageBox.critical(self, "Error", f"Sync failed: {error_message}")
 
+    def closeEvent(self, event):
+        """Stop running workers and the Plex background threads before the window closes"""
+        self.stop_speculative_matching()
+        for worker in [self.worker] + self.retired_workers:
+            if worker is not None and worker.isRunning():
+                if worker is self.worker:
+                    # Closing is not a finished sync, skip the completion dialog
+                    worker.finished.disconnect(self.sync_finished)
+                    worker.error.disconnect(self.sync_error)
+                    worker.stop()
+                # Workers stop after their current track and save their journal on the way out
+                worker.wait()
+        if self.plex_service is not None:
+            self.plex_service.shutdown()
+        super().closeEvent(event)
+
     def show_config_dialog(self):
         dialog = ConfigDialog(self)
         if dialog.exec() == QDialog.DialogCode.Accepted:
@@ -487,25 +1026,40 @@ class MainWindow(QMainWindow):
             loading_item = QListWidgetItem("Loading tracks...")
             self.track_list.addItem(loading_item)
             
-            # Fetch tracks
-            results = self.spotify_service.get_playlist_tracks(item.playlist_id)
-            self.track_list.clear()  # Clear loading indicator
+            # Stream tracks into the list as pages arrive
+            self.stop_speculative_matching()
+            self.selected_playlist_id = item.playlist_id
+            self.browsed_tracks = []
+            is_liked_songs = item.playlist_id == SpotifyService.LIKED_SONGS_ID
+            # Liked Songs can hold the whole library, only the latest likes are listed
+            tracks = (self.spotify_service.iter_recent_saved_tracks() if is_liked_songs
+                      else self.spotify_service.iter_tracks(item.playlist_id))
+            for track_index, track in enumerate(tracks):
+                if track_index == 0:
+                    self.track_list.clear()  # Clear loading indicator
+                duration_min = track.duration_ms // 60000
+                duration_sec = (track.duration_ms % 60000) // 1000
+                
+                # Format track info
+                track_info = f"{track.name} - {track.artists} ({duration_min}:{duration_sec:02d})"
+                list_item = QListWidgetItem(track_info)
+                list_item.setToolTip(track_info)  # Show full info on hover
+                self.track_list.addItem(list_item)
+                self.browsed_tracks.append(track)
+                
+                # Keep the window responsive while the rest of the playlist streams in
+                if (track_index + 1) % SpotifyService.PLAYLIST_PAGE_SIZE == 0:
+                    QApplication.processEvents()
+                    if self.selected_playlist_id != item.playlist_id:
+                        return  # Another playlist was selected meanwhile
             
-            # Add tracks to list
-            for track_item in results['items']:
-                track = track_item['track']
-                if track:  # Check if track exists (might be None for unavailable tracks)
-                    artists = ", ".join([artist['name'] for artist in track['artists']])
-                    track_name = track['name']
-                    duration_ms = track['duration_ms']
-                    duration_min = duration_ms // 60000
-                    duration_sec = (duration_ms % 60000) // 1000
-                    
-                    # Format track info
-                    track_info = f"{track_name} - {artists} ({duration_min}:{duration_sec:02d})"
-                    list_item = QListWidgetItem(track_info)
-                    list_item.setToolTip(track_info)  # Show full info on hover
-                    self.track_list.addItem(list_item)
+            if self.track_list.count() == 1 and self.track_list.item(0) is loading_item:
+                self.track_list.clear()
+            if is_liked_songs and item.track_total > len(self.browsed_tracks):
+                more = item.track_total - len(self.browsed_tracks)
+                self.track_list.addItem(QListWidgetItem(f"… {more} earlier liked songs, all are synced"))
+            
+            self.start_speculative_matching()
                     
         except Exception as e:
             print(f"Error loading tracks: {str(e)}")
@@ -518,5 +1072,6 @@ class MainWindow(QMainWindow):
             if os.path.exists('.spotify_cache'):
                 os.remove('.spotify_cache')
                 print("Cleared Spotify cache")
+            self.spotify_service.clear_response_cache()
         except Exception as e:
             print(f"Error clearing cache: {str(e)}")
\ No newline at end of file
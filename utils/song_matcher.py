@@ -0,0 +1,661 @@
+# utils/song_matcher.py
+import mmap
+import os
+import re
+import struct
+import threading
+from array import array
+from collections import Counter
+from difflib import SequenceMatcher
+from pathlib import Path
+
+
+def normalize_string(s):
+    """Normalize a string by removing special characters and extra whitespace"""
+    if s is None:
+        return ""
+    # Handle periods in abbreviations (e.g., "T.N.T")
+    s = s.replace('.', '')  # Remove periods
+    # Remove special characters and replace with space
+    s = re.sub(r'[^\w\s-]', ' ', s)
+    # Replace multiple spaces with single space
+    s = re.sub(r'\s+', ' ', s)
+    # Convert to lowercase and strip
+    return s.lower().strip()
+
+
+def normalize_remix_title(title):
+    """Normalize remix titles to a standard format"""
+    # First normalize the basic string
+    title = normalize_string(title)
+    
+    # Define common remix patterns
+    remix_patterns = [
+        (r'\s*[-–]\s*(.*?mix)', r' \1'),  # Convert "- XXX Mix" to "XXX Mix"
+        (r'\s*[-–]\s*(remix)', r' \1'),    # Convert "- Remix" to "Remix"
+        (r'\s*[-–]\s*(edit)', r' \1'),     # Convert "- Edit" to "Edit"
+        (r'\s*[-–]\s*(version)', r' \1'),  # Convert "- Version" to "Version"
+    ]
+    
+    # Apply each pattern
+    normalized = title
+    for pattern, replacement in remix_patterns:
+        normalized = re.sub(pattern, replacement, normalized, flags=re.IGNORECASE)
+    
+    # Remove parentheses
+    return re.sub(r'[\(\)]', '', normalized)
+
+
+def title_similarity(title1, title2):
+    """Calculate similarity between two titles"""
+    return SequenceMatcher(None, title1, title2).ratio()
+
+
+def is_various_artists_match(track, artists):
+    """Compilation tracks are filed under "Various Artists" with the performer in originalTitle"""
+    original_title = getattr(track, 'originalTitle', None)
+    return (track.grandparentTitle == 'Various Artists' and bool(original_title) and
+            any(artist.lower() in original_title.lower() for artist in artists))
+
+
+# Title + artist similarity (at most 2.0) at which a candidate is accepted without scoring the rest
+CONFIDENT_MATCH_SCORE = 1.9
+# Score reported for a direct title and artist match, above any similarity score
+DIRECT_MATCH_SCORE = 3.0
+# Similarity a title or artist must exceed to count as a match when neither contains the other
+SIMILARITY_MATCH_THRESHOLD = 0.8
+
+
+class ScoringStats:
+    """Thread-safe counters of candidate scoring work, and of the full comparisons pruning avoided"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.candidates = 0
+        # SequenceMatcher.ratio() calls made, and calls the unpruned loop would have made
+        self.comparisons = 0
+        self.comparisons_avoided = 0
+        self.early_exits = 0
+
+    def add(self, candidates, comparisons, baseline, early_exit):
+        with self._lock:
+            self.lookups += 1
+            self.candidates += candidates
+            self.comparisons += comparisons
+            self.comparisons_avoided += max(baseline - comparisons, 0)
+            self.early_exits += 1 if early_exit else 0
+
+    def reset(self):
+        with self._lock:
+            self.lookups = self.candidates = self.comparisons = self.comparisons_avoided = self.early_exits = 0
+
+    def report(self):
+        with self._lock:
+            baseline = self.comparisons + self.comparisons_avoided
+            saved = 100.0 * self.comparisons_avoided / baseline if baseline else 0.0
+            return (f"Candidate scoring: {self.lookups} lookups over {self.candidates} candidates, "
+                    f"{self.comparisons} full comparisons, {self.comparisons_avoided} avoided ({saved:.0f}%), "
+                    f"{self.early_exits} early exits")
+
+
+scoring_stats = ScoringStats()
+
+
+def _ratio_bound(matcher, a, floor):
+    """Cheap upper bound of the similarity of a to the matcher's second sequence: the length
+    bound, tightened with the character-count bound unless the length bound is already <= floor"""
+    matcher.set_seq1(a)
+    bound = matcher.real_quick_ratio()
+    return bound if bound <= floor else matcher.quick_ratio()
+
+
+def match_candidates(title, artists_string, tracks, verbose=False):
+    """Score candidate Plex tracks against a Spotify title and artists, returning the best match"""
+    return best_candidate(title, artists_string, tracks, verbose)[0]
+
+
+def best_candidate(title, artists_string, tracks, verbose=False):
+    """Score candidate Plex tracks against a Spotify title and artists, returning (best match, score).
+
+    The score is DIRECT_MATCH_SCORE for a direct match and 0.0 when nothing matched, so results
+    of several candidate batches can be compared.
+
+    Works on anything with Plex track attributes (plexapi tracks or LibraryTrack records),
+    so the same scorer runs in the GUI process and in matching worker processes.
+
+    Scoring is a cascade: exact title/artist matches are returned before any similarity is
+    computed; length and character-count bounds (real_quick_ratio, quick_ratio) reject
+    candidates that cannot pass the similarity threshold; the rest are scored in descending
+    order of their bound, stopping once no remaining candidate can beat the best score or a
+    candidate reaches CONFIDENT_MATCH_SCORE.
+    """
+    artists = [artist.strip() for artist in artists_string.split(',')]
+    primary_artist = artists[0] if artists else ""
+    normalized_artists = [normalize_string(artist) for artist in artists]
+    normalized_search_title = normalize_string(title)
+    normalized_remix_title = normalize_remix_title(title)
+    normalized_search_artist = normalize_string(primary_artist)
+    lowered_title = title.lower()
+    lowered_artists = [artist.lower() for artist in artists]
+    # Full comparisons per candidate without pruning: title, remix title and every artist
+    comparisons_per_track = 2 + len(normalized_artists)
+
+    prepared = []
+    for position, track in enumerate(tracks):
+        plex_artist = getattr(track, 'grandparentTitle', '') or ''
+        track_title = normalize_string(track.title)
+        track_title_remix = normalize_remix_title(track.title)
+
+        # Direct matches (case-insensitive) win outright and need no similarity scores
+        # Normalized forms of punctuation-only titles are empty and must not equal each other
+        direct_title_match = (
+            lowered_title == track.title.lower() or
+            (normalized_search_title == track_title != '') or
+            (normalized_remix_title == track_title_remix != '')
+        )
+        if direct_title_match and plex_artist.lower() in lowered_artists:
+            if verbose:
+                print(f"  ✓ Direct match found: '{track.title}' by '{plex_artist}'")
+            scoring_stats.add(position + 1, 0, (position + 1) * comparisons_per_track, early_exit=True)
+            return track, DIRECT_MATCH_SCORE
+        prepared.append((position, track, track_title, track_title_remix, normalize_string(plex_artist)))
+
+    if not normalized_search_title:
+        # Only a case-insensitive identical title can match a punctuation-only one
+        scoring_stats.add(len(tracks), 0, len(tracks) * comparisons_per_track, early_exit=False)
+        return None, 0.0
+
+    # Matchers keep their second sequence (the Spotify side) analysed across candidates
+    title_matcher = SequenceMatcher(None, '', normalized_search_title)
+    remix_matcher = SequenceMatcher(None, '', normalized_remix_title)
+    artist_matchers = [SequenceMatcher(None, '', artist) for artist in normalized_artists]
+    search_words = set(normalized_search_title.split())
+    threshold = SIMILARITY_MATCH_THRESHOLD
+
+    shortlist = []
+    for position, track, track_title, track_title_remix, track_artist in prepared:
+        title_contained = bool(normalized_search_title and track_title) and (
+            normalized_search_title in track_title or
+            track_title in normalized_search_title or
+            normalized_remix_title in track_title_remix or
+            track_title_remix in normalized_remix_title
+        )
+        floor = -1.0 if title_contained else threshold
+        remix_bound = _ratio_bound(remix_matcher, track_title_remix, floor)
+        title_bound = max(_ratio_bound(title_matcher, track_title, floor), remix_bound)
+        if title_bound <= floor:
+            if verbose:
+                print(f"  ✗ Pruned '{track.title}': title similarity at most {title_bound:.2f}")
+            continue
+
+        artist_contained = (
+            any(artist in track_artist for artist in normalized_artists) or
+            any(track_artist in artist for artist in normalized_artists) or
+            is_various_artists_match(track, artists)
+        )
+        floor = -1.0 if artist_contained else threshold
+        artist_bounds = [_ratio_bound(matcher, track_artist, floor) for matcher in artist_matchers]
+        artist_bound = max(artist_bounds, default=0.0)
+        if artist_bound <= floor:
+            if verbose:
+                print(f"  ✗ Pruned '{track.title}': artist similarity at most {artist_bound:.2f}")
+            continue
+
+        # Shared title words break ties between equal bounds, so likelier candidates go first
+        word_overlap = len(search_words & set(track_title.split()))
+        shortlist.append((title_bound + artist_bound, word_overlap, position, track, track_title, track_title_remix,
+                          remix_bound, track_artist, title_contained, artist_contained, artist_bounds))
+    shortlist.sort(key=lambda item: (-item[0], -item[1], item[2]))
+
+    best_track, best_score, best_position = None, -1.0, None
+    comparisons = 0
+    early_exit = False
+    for (bound, _, position, track, track_title, track_title_remix, remix_bound, track_artist,
+         title_contained, artist_contained, artist_bounds) in shortlist:
+        if bound < best_score:
+            break  # Sorted by bound, no later candidate can win either
+
+        title_matcher.set_seq1(track_title)
+        title_score = title_matcher.ratio()
+        comparisons += 1
+        if remix_bound > title_score:
+            remix_matcher.set_seq1(track_title_remix)
+            title_score = max(title_score, remix_matcher.ratio())
+            comparisons += 1
+        if not (title_score > threshold or title_contained):
+            continue
+        if title_score + max(artist_bounds) < best_score:
+            continue
+
+        artist_score = 0.0
+        for artist_bound, matcher in sorted(zip(artist_bounds, artist_matchers), key=lambda item: -item[0]):
+            if artist_bound <= artist_score:
+                break
+            matcher.set_seq1(track_artist)
+            artist_score = max(artist_score, matcher.ratio())
+            comparisons += 1
+        if not (artist_score > threshold or artist_contained):
+            continue
+
+        score = title_score + artist_score
+        if verbose:
+            print(f"  Scored '{track.title}' by '{track.grandparentTitle}': "
+                  f"title {title_score:.2f}, artist {artist_score:.2f}")
+        if score > best_score or (score == best_score and position < best_position):
+            best_track, best_score, best_position = track, score, position
+            if best_score >= CONFIDENT_MATCH_SCORE:
+                early_exit = True
+                break
+
+    scoring_stats.add(len(tracks), comparisons, len(tracks) * comparisons_per_track, early_exit)
+    if verbose:
+        print(f"  Spotify: '{title}' by '{normalized_search_artist}', {len(tracks)} candidates, "
+              f"{len(shortlist)} past the bounds, {comparisons} full comparisons")
+        if best_track is not None:
+            print(f"\n✓ Best match found: {best_track.title} by {best_track.grandparentTitle}")
+    return best_track, max(best_score, 0.0)
+
+
+def index_candidates(index, title, artists_string, k, artist_threshold):
+    """Nearest index entries for a title whose artist resembles one of the Spotify artists.
+
+    Shared by the title index strategy and the matching worker processes, so both see the same
+    candidates for a track.
+    """
+    artists = [artist.strip() for artist in artists_string.split(',')]
+    primary_artist = artists[0] if artists else ""
+    normalized_artists = [normalize_string(artist) for artist in artists]
+    search_tracks = [
+        track for track in index.nearest(title, primary_artist, k=k)
+        if any(title_similarity(artist, normalize_string(track.grandparentTitle)) > artist_threshold
+               for artist in normalized_artists)
+    ]
+    # Remove duplicates
+    return list({track.ratingKey: track for track in search_tracks}.values())
+
+
+def exact_candidate(title, artists_string, candidates):
+    """Candidate with exactly the Spotify title by one of its artists, or None"""
+    artists = [artist.strip() for artist in artists_string.split(',')]
+    for track in candidates:
+        if track.title.lower() == title.lower():
+            if (any(artist.lower() in track.grandparentTitle.lower() for artist in artists) or
+                    is_various_artists_match(track, artists)):
+                return track
+    return None
+
+
+def local_match(index, title, artists_string, k, artist_threshold):
+    """Match a track against the library index alone: (ratingKey or None, score, candidate keys).
+
+    The local step of the matching cascade, run before any network search, either in the sync
+    thread or in matching worker processes over a MappedTrackIndex. An exact title and artist
+    scores DIRECT_MATCH_SCORE.
+    """
+    candidates = index_candidates(index, title, artists_string, k, artist_threshold)
+    candidate_keys = [track.ratingKey for track in candidates]
+    match = exact_candidate(title, artists_string, candidates)
+    if match is not None:
+        return match.ratingKey, DIRECT_MATCH_SCORE, candidate_keys
+    match, score = best_candidate(title, artists_string, candidates) if candidates else (None, 0.0)
+    return (match.ratingKey if match else None), score, candidate_keys
+
+
+def trigrams(s):
+    """Character trigrams of an already normalized string, padded so short words still index"""
+    if not s:
+        return frozenset()
+    padded = f"  {s} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class LibraryTrack:
+    """Lightweight copy of the Plex track attributes used for matching"""
+    __slots__ = ('ratingKey', 'title', 'grandparentTitle', 'originalTitle', 'parentTitle',
+                 'parentRatingKey', 'duration', 'index', 'parentIndex')
+
+    def __init__(self, ratingKey, title, grandparentTitle='', originalTitle=None, parentTitle='',
+                 parentRatingKey=None, duration=None, index=None, parentIndex=None):
+        self.ratingKey = ratingKey
+        self.title = title or ''
+        self.grandparentTitle = grandparentTitle or ''
+        self.originalTitle = originalTitle
+        self.parentTitle = parentTitle or ''
+        self.parentRatingKey = parentRatingKey
+        self.duration = duration
+        self.index = index
+        self.parentIndex = parentIndex
+
+    @classmethod
+    def from_plex(cls, track):
+        return cls(
+            ratingKey=track.ratingKey,
+            title=track.title,
+            grandparentTitle=getattr(track, 'grandparentTitle', ''),
+            originalTitle=getattr(track, 'originalTitle', None),
+            parentTitle=getattr(track, 'parentTitle', ''),
+            parentRatingKey=getattr(track, 'parentRatingKey', None),
+            duration=getattr(track, 'duration', None),
+            index=getattr(track, 'index', None),
+            parentIndex=getattr(track, 'parentIndex', None)
+        )
+
+
+def media_part_files(track):
+    """File paths of a Plex track's media parts"""
+    return [part.file for media in getattr(track, 'media', None) or []
+            for part in getattr(media, 'parts', None) or [] if getattr(part, 'file', None)]
+
+
+class FilePathIndex:
+    """Plex tracks by media file basename and normalized stem, for O(1) lookups of local files.
+
+    Stems are also indexed without a leading track number ("01 - Title", "1-02. Title"). A name
+    shared by several tracks never resolves, so a lookup cannot land on the wrong one.
+    """
+
+    def __init__(self):
+        # name -> ratingKey, or a tuple of ratingKeys when the name is ambiguous
+        self._keys = {}
+        self._names = {}
+
+    def __len__(self):
+        return len(self._names)
+
+    @staticmethod
+    def names_for(file_name):
+        basename = re.split(r'[\\/]', file_name)[-1]
+        stem = re.sub(r'\.[A-Za-z0-9]{1,5}$', '', basename)
+        names = {basename.lower(), normalize_string(stem),
+                 normalize_string(re.sub(r'^\d{1,3}(?:[-.]\d{1,3})?[\s._-]+', '', stem))}
+        names.discard('')
+        return names
+
+    def add(self, rating_key, path):
+        for name in self.names_for(path):
+            existing = self._keys.get(name)
+            if existing is None or existing == rating_key:
+                self._keys[name] = rating_key
+            elif isinstance(existing, tuple):
+                if rating_key not in existing:
+                    self._keys[name] = existing + (rating_key,)
+            else:
+                self._keys[name] = (existing, rating_key)
+            self._names.setdefault(rating_key, set()).add(name)
+
+    def remove(self, rating_key):
+        for name in self._names.pop(rating_key, ()):
+            existing = self._keys.get(name)
+            if isinstance(existing, tuple):
+                remaining = tuple(key for key in existing if key != rating_key)
+                self._keys[name] = remaining[0] if len(remaining) == 1 else remaining
+            elif existing == rating_key:
+                del self._keys[name]
+
+    def lookup(self, file_name):
+        """ratingKey of the only track whose file matches file_name (with or without extension), or None"""
+        for name in self.names_for(file_name):
+            key = self._keys.get(name)
+            if key is not None and not isinstance(key, tuple):
+                return key
+        return None
+
+
+class TrackIndex:
+    """Trigram inverted index over normalized Plex track titles for approximate lookups.
+
+    Queries score candidates by trigram overlap (Dice coefficient), so typos, missing
+    punctuation and reordered words still land near the right track. The index may be updated
+    from another thread while it is queried, every method holds its lock.
+    """
+
+    # Trigrams posted on more than this share of the library are skipped when rarer ones exist
+    COMMON_TRIGRAM_RATIO = 0.05
+
+    def __init__(self):
+        self.tracks = {}
+        self._title_grams = {}
+        self._artist_grams = {}
+        self._postings = {}
+        self.files = FilePathIndex()
+        self.lock = threading.RLock()
+        # Bumped by every change, so copies written for worker processes can tell they are stale
+        self.version = 0
+
+    def __len__(self):
+        return len(self.tracks)
+
+    def __contains__(self, rating_key):
+        return rating_key in self.tracks
+
+    def get(self, rating_key):
+        return self.tracks.get(rating_key)
+
+    def find_file(self, file_name):
+        with self.lock:
+            return self.files.lookup(file_name)
+
+    def add(self, track, files=()):
+        """Insert or replace a LibraryTrack, indexing the paths of its media files as well"""
+        with self.lock:
+            self._add(track, files)
+
+    def _add(self, track, files=()):
+        self.version += 1
+        if track.ratingKey in self.tracks:
+            self._remove(track.ratingKey)
+        for path in files:
+            self.files.add(track.ratingKey, path)
+        grams = trigrams(normalize_string(track.title))
+        artist = track.originalTitle or track.grandparentTitle
+        self.tracks[track.ratingKey] = track
+        self._title_grams[track.ratingKey] = grams
+        self._artist_grams[track.ratingKey] = trigrams(normalize_string(artist))
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(track.ratingKey)
+
+    def remove(self, rating_key):
+        with self.lock:
+            return self._remove(rating_key)
+
+    def _remove(self, rating_key):
+        self.version += 1
+        self.files.remove(rating_key)
+        track = self.tracks.pop(rating_key, None)
+        if track is None:
+            return None
+        for gram in self._title_grams.pop(rating_key, ()):
+            posting = self._postings.get(gram)
+            if posting is not None:
+                posting.discard(rating_key)
+                if not posting:
+                    del self._postings[gram]
+        self._artist_grams.pop(rating_key, None)
+        return track
+
+    def nearest(self, title, artist=None, k=10):
+        """Return up to k tracks whose titles (and artist, if given) are closest to the query"""
+        with self.lock:
+            return self._nearest(title, artist, k)
+
+    def _nearest(self, title, artist, k):
+        query = trigrams(normalize_string(title))
+        if not query or not self.tracks:
+            return []
+
+        postings = [self._postings[gram] for gram in query if gram in self._postings]
+        common_limit = max(1000, int(len(self.tracks) * self.COMMON_TRIGRAM_RATIO))
+        rare = [posting for posting in postings if len(posting) <= common_limit]
+        hits = Counter()
+        for posting in (rare or postings):
+            hits.update(posting)
+        if not hits:
+            return []
+
+        query_size = len(query)
+        title_scores = [
+            (2.0 * count / (query_size + len(self._title_grams[key])), key)
+            for key, count in hits.items()
+        ]
+        # Re-rank a generous shortlist by artist overlap
+        title_scores.sort(reverse=True)
+        shortlist = title_scores[:k * 4]
+        if artist:
+            artist_query = trigrams(normalize_string(artist))
+            ranked = []
+            for score, key in shortlist:
+                artist_grams = self._artist_grams[key]
+                overlap = len(artist_query & artist_grams)
+                artist_score = 2.0 * overlap / (len(artist_query) + len(artist_grams) or 1)
+                ranked.append((score + 0.5 * artist_score, key))
+            ranked.sort(reverse=True)
+            shortlist = ranked
+        return [self.tracks[key] for _, key in shortlist[:k]]
+
+
+# Binary layout of a shared index file: header, then uint32 arrays (record offsets, title
+# trigram counts, posting offsets per trigram, postings), the trigram table and the record blob.
+# Records are stored in ratingKey order so ties rank exactly as in TrackIndex.
+SHARED_INDEX_MAGIC = b'SPTIDX02'
+_SHARED_HEADER = struct.Struct('<8sIIIII')
+_FIELD_SEPARATOR = '\x1f'
+
+
+def write_shared_index(index, path):
+    """Serialize a TrackIndex into a flat file that worker processes can memory-map"""
+    with index.lock:
+        return _write_shared_index(index, path)
+
+
+def _write_shared_index(index, path):
+    keys = sorted(index.tracks)
+    record_ids = {key: i for i, key in enumerate(keys)}
+
+    blob = bytearray()
+    record_offsets = array('I', [0])
+    gram_counts = array('I')
+    for key in keys:
+        track = index.tracks[key]
+        fields = (key, track.title, track.grandparentTitle, track.originalTitle or '', track.parentTitle,
+                  track.parentRatingKey or '', track.duration or '', track.index or '', track.parentIndex or '')
+        blob += _FIELD_SEPARATOR.join(str(field) for field in fields).encode('utf-8')
+        record_offsets.append(len(blob))
+        gram_counts.append(len(index._title_grams[key]))
+
+    # Exact trigrams rather than hashed buckets, colliding grams would change the Dice scores
+    grams = sorted(index._postings)
+    posting_offsets = array('I', [0])
+    postings = array('I')
+    for gram in grams:
+        postings.extend(sorted(record_ids[key] for key in index._postings[gram]))
+        posting_offsets.append(len(postings))
+    gram_table = _FIELD_SEPARATOR.join(grams).encode('utf-8')
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(_SHARED_HEADER.pack(SHARED_INDEX_MAGIC, len(keys), len(grams), len(postings),
+                                    len(gram_table), len(blob)))
+        for values in (record_offsets, gram_counts, posting_offsets, postings):
+            f.write(values.tobytes())
+        f.write(gram_table)
+        f.write(bytes(blob))
+    os.replace(tmp_path, path)
+    return path
+
+
+class MappedTrackIndex:
+    """Read-only TrackIndex backed by a memory-mapped file written by write_shared_index.
+
+    All processes mapping the same file share its pages, so the index is not copied per worker;
+    only the trigram table is decoded into a per-process dict. nearest() ranks exactly like
+    TrackIndex.nearest over the same tracks.
+    """
+
+    COMMON_TRIGRAM_RATIO = TrackIndex.COMMON_TRIGRAM_RATIO
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, n_tracks, n_grams, n_postings, table_size, blob_size = _SHARED_HEADER.unpack_from(self._mmap, 0)
+        if magic != SHARED_INDEX_MAGIC:
+            raise ValueError(f"{path} is not a shared track index")
+        self.n_tracks = n_tracks
+
+        view = self._view = memoryview(self._mmap)
+        offset = _SHARED_HEADER.size
+        sections = []
+        for length in (n_tracks + 1, n_tracks, n_grams + 1, n_postings):
+            sections.append(view[offset:offset + length * 4].cast('I'))
+            offset += length * 4
+        self._record_offsets, self._gram_counts, self._posting_offsets, self._postings = sections
+        table = bytes(view[offset:offset + table_size]).decode('utf-8')
+        self._gram_ids = {gram: i for i, gram in enumerate(table.split(_FIELD_SEPARATOR))} if n_grams else {}
+        offset += table_size
+        self._blob = view[offset:offset + blob_size]
+
+    def __len__(self):
+        return self.n_tracks
+
+    def record(self, record_id):
+        start, end = self._record_offsets[record_id], self._record_offsets[record_id + 1]
+        fields = bytes(self._blob[start:end]).decode('utf-8').split(_FIELD_SEPARATOR)
+        rating_key, title, artist, original_title, album, album_key, duration, index, parent_index = fields
+        return LibraryTrack(
+            ratingKey=int(rating_key) if rating_key.isdigit() else rating_key,
+            title=title,
+            grandparentTitle=artist,
+            originalTitle=original_title or None,
+            parentTitle=album,
+            parentRatingKey=int(album_key) if album_key.isdigit() else None,
+            duration=int(duration) if duration.isdigit() else None,
+            index=int(index) if index.isdigit() else None,
+            parentIndex=int(parent_index) if parent_index.isdigit() else None
+        )
+
+    def nearest(self, title, artist=None, k=10):
+        """Same ranking as TrackIndex.nearest, computed over the mapped postings"""
+        query = trigrams(normalize_string(title))
+        if not query or not self.n_tracks:
+            return []
+
+        postings = []
+        for gram in query:
+            gram_id = self._gram_ids.get(gram)
+            if gram_id is not None:
+                postings.append(self._postings[self._posting_offsets[gram_id]:self._posting_offsets[gram_id + 1]])
+        common_limit = max(1000, int(self.n_tracks * self.COMMON_TRIGRAM_RATIO))
+        rare = [posting for posting in postings if len(posting) <= common_limit]
+        hits = Counter()
+        for posting in (rare or postings):
+            hits.update(posting)
+        if not hits:
+            return []
+
+        query_size = len(query)
+        title_scores = sorted(
+            ((2.0 * count / (query_size + self._gram_counts[record_id]), record_id)
+             for record_id, count in hits.items()),
+            reverse=True
+        )[:k * 4]
+        candidates = [(score, record_id, self.record(record_id)) for score, record_id in title_scores]
+        if artist:
+            artist_query = trigrams(normalize_string(artist))
+            ranked = []
+            for score, record_id, track in candidates:
+                artist_grams = trigrams(normalize_string(track.originalTitle or track.grandparentTitle))
+                overlap = len(artist_query & artist_grams)
+                artist_score = 2.0 * overlap / (len(artist_query) + len(artist_grams) or 1)
+                ranked.append((score + 0.5 * artist_score, record_id, track))
+            ranked.sort(key=lambda x: x[:2], reverse=True)
+            candidates = ranked
+        return [track for _, _, track in candidates[:k]]
+
+    def close(self):
+        for section in (self._record_offsets, self._gram_counts, self._posting_offsets, self._postings, self._blob):
+            section.release()
+        self._view.release()
+        self._mmap.close()
+        self._file.close()
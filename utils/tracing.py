@@ -0,0 +1,166 @@
+# utils/tracing.py
+import cProfile
+import json
+import os
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+
+class _NullSpan:
+    """Shared no-op span returned while tracing is disabled"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'args', 'start_ns')
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.start_ns = 0
+
+    def __enter__(self):
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end_ns = time.perf_counter_ns()
+        self.tracer._record(self.name, self.start_ns, end_ns - self.start_ns, self.args)
+        return False
+
+
+class Tracer:
+    """Collects nestable timing spans for a sync run and exports them as a Chrome trace"""
+
+    def __init__(self, enabled=None, profile=None):
+        self.enabled = os.getenv('SYNC_TRACE') == '1' if enabled is None else enabled
+        # cProfile and tracemalloc are expensive, so they need their own switch
+        self.profile = os.getenv('SYNC_TRACE_PROFILE') == '1' if profile is None else profile
+        self.events = []
+        self._lock = threading.Lock()
+        self._run_start_ns = time.perf_counter_ns()
+        self._profiler = None
+
+    def span(self, name, **args):
+        """Time a block: ``with tracer.span('plex.search', query=title): ...``"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, args)
+
+    def _record(self, name, start_ns, duration_ns, args):
+        event = (name, start_ns, duration_ns, threading.get_ident(), threading.current_thread().name, args)
+        # list.append is atomic, the lock only guards swapping the list out in end_run
+        self.events.append(event)
+
+    def begin_run(self):
+        """Start a fresh run, optionally with cProfile and tracemalloc capture"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.events = []
+        self._run_start_ns = time.perf_counter_ns()
+        if self.profile:
+            # cProfile only sees the thread that calls begin_run, i.e. the sync worker
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+            tracemalloc.start()
+
+    def end_run(self, label='sync'):
+        """Stop capture and write the trace, summary and profiles to the logs directory"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            events, self.events = self.events, []
+
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        Path('logs').mkdir(exist_ok=True)
+        trace_file = f'logs/trace_{label}_{timestamp}.json'
+        self.export_chrome_trace(trace_file, events)
+        print(f"Trace written to: {trace_file} (open in chrome://tracing or Perfetto)")
+        print(self.format_summary(events))
+
+        if self._profiler:
+            self._profiler.disable()
+            profile_file = f'logs/profile_{label}_{timestamp}.prof'
+            self._profiler.dump_stats(profile_file)
+            self._profiler = None
+            print(f"cProfile stats written to: {profile_file}")
+        if tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            memory_file = f'logs/tracemalloc_{label}_{timestamp}.txt'
+            with open(memory_file, 'w', encoding='utf-8') as f:
+                f.write(f"Current: {current / 1024 / 1024:.1f} MiB, Peak: {peak / 1024 / 1024:.1f} MiB\n\n")
+                for stat in snapshot.statistics('lineno')[:50]:
+                    f.write(f"{stat}\n")
+            print(f"tracemalloc report written to: {memory_file}")
+        return trace_file
+
+    def export_chrome_trace(self, path, events=None):
+        """Write events in the Chrome trace event format ("X" complete events)"""
+        events = self.events if events is None else events
+        pid = os.getpid()
+        trace_events = []
+        thread_names = {}
+        for name, start_ns, duration_ns, tid, thread_name, args in events:
+            thread_names[tid] = thread_name
+            trace_events.append({
+                'name': name,
+                'cat': name.split('.', 1)[0],
+                'ph': 'X',
+                'ts': (start_ns - self._run_start_ns) / 1000,
+                'dur': duration_ns / 1000,
+                'pid': pid,
+                'tid': tid,
+                'args': {key: str(value) for key, value in args.items()}
+            })
+        for tid, thread_name in thread_names.items():
+            trace_events.append({
+                'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                'args': {'name': thread_name}
+            })
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, f)
+
+    def summarize(self, events=None):
+        """Aggregate span durations per phase name"""
+        events = self.events if events is None else events
+        phases = {}
+        for name, _, duration_ns, _, _, _ in events:
+            phase = phases.setdefault(name, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            duration_ms = duration_ns / 1_000_000
+            phase['count'] += 1
+            phase['total_ms'] += duration_ms
+            phase['max_ms'] = max(phase['max_ms'], duration_ms)
+        return phases
+
+    def format_summary(self, events=None):
+        phases = self.summarize(events)
+        lines = [
+            f"{'Phase':<28}{'Count':>8}{'Total ms':>12}{'Mean ms':>10}{'Max ms':>10}",
+            "-" * 68
+        ]
+        for name, phase in sorted(phases.items(), key=lambda item: item[1]['total_ms'], reverse=True):
+            mean_ms = phase['total_ms'] / phase['count']
+            lines.append(
+                f"{name:<28}{phase['count']:>8}{phase['total_ms']:>12.1f}{mean_ms:>10.2f}{phase['max_ms']:>10.2f}"
+            )
+        return "\n".join(lines)
+
+
+# Process-wide tracer shared by the services and the sync worker
+tracer = Tracer()